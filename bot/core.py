@@ -3,12 +3,20 @@ from bot.handlers.added_to_group_chat_handler import added_to_group_chat_handler
 from telegram.ext.filters import StatusUpdate
 from telegram.ext.filters import TEXT, PHOTO, CAPTION
 from bot.handlers.scam_handler import handle_scam
+from bot.handlers.verdict_queue import start_verdict_worker, stop_verdict_worker
+from bot.update_processor import ChatOrderedUpdateProcessor
+from bot.services.worker_pool import worker_pool
+from bot.services.local_classifier import local_classifier
+from bot.services.rule_engine import rule_engine
+from bot.services.link_reputation import link_reputation
+from bot.services.scammer_registry import scammer_registry
 from bot.handlers.start import start_command
 from bot.handlers.join_handler import join_handler
 from bot.handlers.admin import (
     unban_user_command,
     ban_user_command,
     remove_thread_command,
+    metrics_command,
 )
 
 import logging
@@ -23,8 +31,17 @@ from config import (
     CLEANUP_CHAT_ID,
     CLEANUP_MESSAGE_ID,
     CLEANUP_USER_ID,
+    MAX_CONCURRENT_UPDATES,
+    MAX_CHAT_QUEUE_DEPTH,
+    MAX_PENDING_UPDATES,
+)
+from db.async_core import (
+    increment_blocked_count,
+    shutdown_executor,
+    start_counter_flusher,
+    stop_counter_flusher,
+    warm_up_trust_index,
 )
-from db.core import increment_blocked_count
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +51,18 @@ async def post_init(application: Application):
     Runs after the bot application is initialized.
     Used for one-time startup tasks like cleaning up a specific message.
     """
+    start_counter_flusher()
+    await worker_pool.warm_up()
+    local_classifier.load()
+    rule_engine.load()
+    rule_engine.start_reloader()
+    await link_reputation.warm_up()
+    await scammer_registry.warm_up()
+    await warm_up_trust_index()
+    # Always drained, so analyses queued before a restart (or before
+    # ASYNC_VERDICTS was switched off) still get their verdict
+    start_verdict_worker(application.bot)
+
     if (CLEANUP_CHAT_ID and CLEANUP_CHAT_ID.strip() != "") and (
         CLEANUP_MESSAGE_ID and CLEANUP_MESSAGE_ID.strip() != ""
     ):
@@ -55,19 +84,42 @@ async def post_init(application: Application):
                 await application.bot.ban_chat_member(
                     chat_id=CLEANUP_CHAT_ID, user_id=CLEANUP_USER_ID
                 )
-                increment_blocked_count(chat_id=int(CLEANUP_CHAT_ID))
+                await increment_blocked_count(chat_id=int(CLEANUP_CHAT_ID))
                 logger.info(f"Startup cleanup: User {CLEANUP_USER_ID} banned.")
             except Exception as e:
                 logger.error(f"Startup cleanup: Failed to ban user: {e}")
 
 
+async def post_shutdown(application: Application):
+    """
+    Runs after the bot application is shut down.
+    Stops the verdict queue worker and rules reloader, flushes buffered counters,
+    then stops the DB and CPU worker pools.
+    """
+    await stop_verdict_worker()
+    await rule_engine.stop_reloader()
+    await stop_counter_flusher()
+    shutdown_executor()
+    worker_pool.shutdown()
+
+
 def run_bot():
     if not TELEGRAM_BOT_TOKEN:
         logger.error("Error: TELEGRAM_BOT_TOKEN not found. Please set it in .env file.")
         exit(1)
 
+    update_processor = ChatOrderedUpdateProcessor(
+        max_concurrent_updates=MAX_CONCURRENT_UPDATES,
+        max_chat_queue_depth=MAX_CHAT_QUEUE_DEPTH,
+        max_pending_updates=MAX_PENDING_UPDATES,
+    )
     application = (
-        ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).post_init(post_init).build()
+        ApplicationBuilder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .concurrent_updates(update_processor)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
     )
 
     application.add_handler(
@@ -86,6 +138,10 @@ def run_bot():
         CommandHandler("remove_thread", remove_thread_command),
     )
 
+    application.add_handler(
+        CommandHandler("metrics", metrics_command),
+    )
+
     # Handle new members
     application.add_handler(
         MessageHandler(StatusUpdate.NEW_CHAT_MEMBERS, callback=join_handler)
@@ -3,7 +3,14 @@ import datetime
 from telegram import Update
 from telegram.ext import ContextTypes
 from config import ADMIN_ID
-from db.core import add_user, increment_blocked_count, update_excluded_threads
+from db.async_core import (
+    add_user,
+    increment_blocked_count,
+    update_excluded_threads,
+    label_verdicts,
+)
+from bot.services.metrics import metrics
+from bot.services.scammer_registry import scammer_registry
 
 # ... existing code ...
 
@@ -49,7 +56,9 @@ async def remove_thread_command(update: Update, context: ContextTypes.DEFAULT_TY
             return
 
         # 4. Execute Logic
-        success = update_excluded_threads(chat_id=target_chat_id, thread_ids=thread_ids)
+        success = await update_excluded_threads(
+            chat_id=target_chat_id, thread_ids=thread_ids
+        )
 
         if success:
             await update.message.reply_text(
@@ -112,12 +121,16 @@ async def unban_user_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
             msg_action = "processed (unban skipped/failed) for"
 
         # 5. DB Action: Mark Safe
-        add_user(
+        await add_user(
             user_id=target_user_id,
             chat_id=target_chat_id,
             join_date=datetime.datetime.now(datetime.timezone.utc),
             is_safe=True,
         )
+        # Their logged messages were false positives (classifier training data)
+        await label_verdicts(target_user_id, target_chat_id, 0)
+        # No longer banned on sight in the other chats
+        await scammer_registry.remove(target_user_id)
 
         await update.message.reply_text(
             f"✅ User {target_user_id} {msg_action} Chat {target_chat_id}, and marked as SAFE."
@@ -170,15 +183,19 @@ async def ban_user_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             msg_action = "processed (ban failed) for"
 
         # 5. DB Action: Mark Unsafe
-        add_user(
+        await add_user(
             user_id=target_user_id,
             chat_id=target_chat_id,
             join_date=datetime.datetime.now(datetime.timezone.utc),
             is_safe=False,
         )
+        # Their logged messages were scams (classifier training data)
+        await label_verdicts(target_user_id, target_chat_id, 1)
+        # Banned on join or first message in every other chat too
+        await scammer_registry.add(target_user_id, target_chat_id, "Manual ban")
 
         # 6. Update Stats
-        increment_blocked_count(chat_id=target_chat_id)
+        await increment_blocked_count(chat_id=target_chat_id)
 
         await update.message.reply_text(
             f"🚫 User {target_user_id} {msg_action} Chat {target_chat_id}, and marked as UNSAFE."
@@ -192,3 +209,23 @@ async def ban_user_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         logger.error(f"Error in ban_user_command: {e}")
         await update.message.reply_text(f"❌ Error: {e}")
+
+
+async def metrics_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Admin only command to show in-process performance metrics
+    (verdict cache hits/misses, timings, queue depths).
+    Usage: /metrics
+    """
+    # 1. Private Chat Check
+    if update.effective_chat.type != "private":
+        return
+
+    user = update.effective_user
+
+    # 2. Admin ID Check
+    if not ADMIN_ID or str(user.id) != str(ADMIN_ID):
+        logger.warning(f"Unauthorized access attempt to /metrics by {user.id}")
+        return
+
+    await update.message.reply_text(metrics.format())
@@ -2,7 +2,8 @@ import logging
 from datetime import datetime, timezone
 from telegram import Update, ChatMember
 from telegram.ext import ContextTypes
-from db.core import add_user
+from db.async_core import add_user, increment_blocked_count
+from bot.services.scammer_registry import scammer_registry
 
 logger = logging.getLogger(__name__)
 
@@ -39,8 +40,17 @@ async def join_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if adder and adder.id != user_id and adder_is_admin:
             is_safe = True
             logger.info(f"User {user_id} added by admin {adder.id}. Marking as safe.")
-
-        add_user(
+        elif await scammer_registry.is_scammer(user_id):
+            # Banned as a scammer in another chat -> banned before posting anything
+            logger.warning(f"Known scammer {user_id} joined {chat_id}. Banning.")
+            try:
+                await context.bot.ban_chat_member(chat_id=chat_id, user_id=user_id)
+                await increment_blocked_count(chat_id=chat_id)
+            except Exception as e:
+                logger.error(f"Failed to ban known scammer {user_id}: {e}")
+            continue
+
+        await add_user(
             user_id, chat_id, join_date=datetime.now(timezone.utc), is_safe=is_safe
         )
         logger.info(f"Added successfully {user_id} in {chat_id} (Safe: {is_safe})")
@@ -1,147 +1,716 @@
+import asyncio
 import logging
-from telegram import Update
+from telegram import Bot, Update
 from telegram.ext import ContextTypes
-from config import SCAM_THRESHOLD
+from config import (
+    SCAM_THRESHOLD,
+    SPECULATIVE_PREFETCH,
+    MEDIA_GROUP_WINDOW_SECONDS,
+    MEDIA_GROUP_MAX_DELAY_SECONDS,
+    MEDIA_GROUP_MAX_SIZE,
+    BURST_COALESCING,
+    BURST_WINDOW_SECONDS,
+    BURST_MAX_DELAY_SECONDS,
+    BURST_MAX_SIZE,
+    ASYNC_VERDICTS,
+    LOCAL_CLASSIFIER_SCAM_CONFIDENCE,
+    LOCAL_CLASSIFIER_SAFE_CONFIDENCE,
+    TRUSTED_MESSAGE_COUNT,
+)
+from bot.handlers.scam_pipeline import MessageCheck, run_pipeline
 from bot.services.gemini_service import GeminiService
 from bot.services.user_service import UserService
 from bot.services.language_service import LanguageService
-from db.core import (
-    get_user,
+from bot.services.worker_pool import worker_pool, detect_russian
+from bot.services.similarity_index import ScamTemplateIndex
+from bot.services.content_preprocessor import select_photo
+from bot.services.image_index import ImageVerdictIndex, dhash
+from bot.services.coalescer import Coalescer
+from bot.services.metrics import metrics
+from bot.services.rate_scheduler import PRIORITY_NEW_USER, PRIORITY_TRUSTED
+from bot.services.local_classifier import local_classifier
+from bot.services.rule_engine import rule_engine
+from bot.services.link_reputation import link_reputation, extract_link_keys
+from bot.services.scammer_registry import scammer_registry
+from db.async_core import (
+    is_trusted_member,
     increment_message_count,
     increment_blocked_count,
-    get_excluded_threads,
+    is_thread_excluded,
+    enqueue_analysis,
+    record_verdict,
 )
+from db.trust_index import trust_index
 
 logger = logging.getLogger(__name__)
 
 gemini_service = GeminiService()
 user_service = UserService()
-language_service = LanguageService()
+scam_index = ScamTemplateIndex()
+image_index = ImageVerdictIndex()
 
 
 async def _get_image_data(update: Update):
     if update.message.photo:
-        photo = update.message.photo[-1]
+        # The smallest size that is still detailed enough for the model
+        photo = select_photo(update.message.photo)
         photo_file = await photo.get_file()
         image_byte_array = await photo_file.download_as_bytearray()
         return bytes(image_byte_array)
     return None
 
 
+def _get_image_id(update: Update):
+    if update.message.photo:
+        return select_photo(update.message.photo).file_unique_id
+    return None
+
+
+async def _is_russian(text: str) -> bool:
+    # Script-only decisions are cheaper than a trip to the worker pool
+    result = LanguageService.fast_path(text)
+    if result is None:
+        result = await worker_pool.run(detect_russian, text)
+    return result
+
+
+async def _priority(check: MessageCheck) -> int:
+    # New users' messages are the likely scams, they go before trusted members'
+    # language checks and messages whose links are all known-good. Links that
+    # scams used (bad handles don't ban on their own) always go first
+    link_keys = await check.get("link_keys")
+    if link_reputation.any_bad(link_keys):
+        return PRIORITY_NEW_USER
+    if check.trusted or link_reputation.all_good(link_keys):
+        return PRIORITY_TRUSTED
+    return PRIORITY_NEW_USER
+
+
 async def _ban_and_delete(
-    update: Update, context: ContextTypes.DEFAULT_TYPE, chat, user, reason: str
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat,
+    user,
+    reason: str,
+    verdict_source: str = "ban",
+    learn: bool = True,
 ):
+    """
+    Deletes the message and bans its sender. Only a successful ban of a
+    confirmed verdict registers the sender as a scammer and counts against
+    the message's links; pass learn=False for guesses (local fallback, local
+    classifier).
+    """
     logger.warning(f"{reason}. Deleting and Banning.")
+    banned = False
     try:
         await update.message.delete()
         await context.bot.ban_chat_member(chat_id=chat.id, user_id=user.id)
-        increment_blocked_count(chat_id=update.effective_chat.id)
+        banned = True
+        await increment_blocked_count(chat_id=update.effective_chat.id)
         logger.info(f"User {user.id} banned.")
     except Exception as e:
         logger.error(f"Failed to delete/ban: {e}")
 
+    if banned and learn:
+        await scammer_registry.add(user.id, chat.id, reason)
+        await link_reputation.learn(extract_link_keys(update.message), banned=True, user_id=user.id)
+    # Text-only bans are training data for the local classifier
+    text = update.message.text or update.message.caption
+    if verdict_source and text and not update.message.photo:
+        await record_verdict(chat.id, user.id, text, None, verdict_source, label=1)
 
-async def handle_scam(update: Update, context: ContextTypes.DEFAULT_TYPE):
+
+async def _ban_and_delete_messages(
+    bot: Bot,
+    chat_id: int,
+    user_id: int,
+    message_ids: list[int],
+    reason: str,
+    text: str = None,
+    link_keys: set[str] = None,
+    learn: bool = True,
+):
     """
-    Handles incoming messages and checks for scams if the user is new.
+    Bans and deletes by ids. Pass text to log it as a scam verdict (text-only
+    messages) and link_keys to count the ban against the messages' links.
+    As in _ban_and_delete, only a successful ban with learn=True registers the
+    sender and counts against the links.
     """
-    if not update.message or not update.message.from_user or not update.message.chat:
-        logger.info("No message or user or chat. Returning.")
-        return
+    logger.warning(f"{reason}. Deleting {len(message_ids)} messages and Banning.")
+    banned = False
+    try:
+        await bot.delete_messages(chat_id=chat_id, message_ids=message_ids)
+        await bot.ban_chat_member(chat_id=chat_id, user_id=user_id)
+        banned = True
+        await increment_blocked_count(chat_id=chat_id)
+        logger.info(f"User {user_id} banned.")
+    except Exception as e:
+        logger.error(f"Failed to delete/ban: {e}")
+
+    if banned and learn:
+        await scammer_registry.add(user_id, chat_id, reason)
+        await link_reputation.learn(link_keys, banned=True, user_id=user_id)
+    if text:
+        await record_verdict(chat_id, user_id, text, None, "ban", label=1)
+
+
+# Pipeline inputs, loaded on first use by MessageCheck.get()
+
+
+async def _load_trusted(check: MessageCheck) -> bool:
+    return await is_trusted_member(check.user.id, check.chat.id)
+
+
+async def _load_is_russian(check: MessageCheck) -> bool:
+    return bool(check.text) and await _is_russian(check.text)
+
+
+async def _load_link_keys(check: MessageCheck) -> set[str]:
+    return extract_link_keys(check.message)
+
+
+async def _load_known_image_score(check: MessageCheck) -> float | None:
+    image_id = _get_image_id(check.update)
+    return image_index.get(image_id) if image_id else None
+
+
+async def _image_needs_analysis(check: MessageCheck) -> bool:
+    # An exact repost of an image already scored on its own is not analyzed
+    # again, unless it is a scam image with text that still needs the full analysis
+    if not check.message.photo:
+        return False
+    known_score = await check.get("known_image_score")
+    return known_score is None or (known_score > SCAM_THRESHOLD and bool(check.text))
 
-    user = update.message.from_user
-    chat = update.message.chat
-
-    # Check Thread Exclusion
-    message_thread_id = update.message.message_thread_id
-    if message_thread_id:
-        logger.info(f"Message received in thread {message_thread_id}")
-        excluded_threads = get_excluded_threads(chat.id)
-        if message_thread_id in excluded_threads:
-            logger.info(
-                f"Skipping scam check for Thread {message_thread_id} in Chat {chat.id} (Excluded)"
-            )
-            return
 
+async def _load_image_data(check: MessageCheck) -> bytes | None:
+    if not await _image_needs_analysis(check):
+        return None
+    return await _get_image_data(check.update)
+
+
+INPUT_LOADERS = {
+    "trusted": _load_trusted,
+    "is_russian": _load_is_russian,
+    "link_keys": _load_link_keys,
+    "known_image_score": _load_known_image_score,
+    "image_data": _load_image_data,
+}
+
+
+# Pipeline stages, cheapest first. Each returns True when the message is fully handled.
+
+
+async def _chat_type(check: MessageCheck) -> bool:
     # Only check in groups/supergroups
-    if chat.type not in ["group", "supergroup"]:
+    if check.chat.type not in ["group", "supergroup"]:
         logger.info("Not a group or supergroup. Returning.")
-        return
+        return True
+    return False
+
+
+async def _known_scammer(check: MessageCheck) -> bool:
+    # Banned as a scammer in another chat (or earlier in this one)
+    if not await scammer_registry.is_scammer(check.user.id):
+        return False
+    # Members this chat trusts (added by an admin, or active) keep their trust;
+    # their messages go through the usual checks
+    if trust_index.is_safe(check.user.id, check.chat.id) or trust_index.is_active(
+        check.user.id, check.chat.id
+    ):
+        logger.info(f"Known scammer {check.user.id} is trusted in chat {check.chat.id}. Not banning.")
+        return False
+
+    reason = f"Known scammer {check.user.id}"
+    await _ban_and_delete(
+        check.update, check.context, check.chat, check.user, reason, verdict_source=None
+    )
+    return True
+
+
+async def _prefetch(check: MessageCheck) -> bool:
+    # Start trust and language together; the stages below await them
+    # and the handler cancels whatever is left once the outcome is decided
+    if SPECULATIVE_PREFETCH:
+        check.prefetch(["trusted", "is_russian"])
+    return False
+
+
+async def _thread_exclusion(check: MessageCheck) -> bool:
+    message_thread_id = check.message.message_thread_id
+    if not message_thread_id:
+        return False
+
+    logger.info(f"Message received in thread {message_thread_id}")
+    if await is_thread_excluded(check.chat.id, message_thread_id):
+        logger.info(
+            f"Skipping scam check for Thread {message_thread_id} in Chat {check.chat.id} (Excluded)"
+        )
+        return True
+    return False
+
+
+async def _trust(check: MessageCheck) -> bool:
+    check.trusted = await check.get("trusted")
+    logger.info(f"User trusted: {check.trusted} (Threshold: {TRUSTED_MESSAGE_COUNT} messages).")
+    return False
+
+
+async def _language(check: MessageCheck) -> bool:
+    # Untrusted users are analyzed regardless of language, so only
+    # trusted users need the language before the analysis
+    if not check.trusted:
+        return False
+
+    if await check.get("is_russian"):
+        logger.info("Russian message detected. Analyzing...")
+        return False
+
+    logger.info("Trusted. Skipping check.")
+    await increment_message_count(check.user.id, check.chat.id)
+    return True
+
+
+async def _prefetch_media(check: MessageCheck) -> bool:
+    # The message will be analyzed (untrusted user or Russian text): start the
+    # photo download while the cheap text checks run
+    # With ASYNC_VERDICTS the verdict queue worker downloads the photo instead
+    if SPECULATIVE_PREFETCH and not ASYNC_VERDICTS:
+        check.prefetch(["known_image_score", "image_data"])
+    return False
+
+
+async def _known_scam(check: MessageCheck) -> bool:
+    # Near-duplicate of an already detected scam -> no Gemini call
+    template_score = scam_index.match(check.text) if check.text else None
+    if template_score is None:
+        return False
+
+    reason = f"Near-duplicate of known scam (Score: {template_score})"
+    await _ban_and_delete(check.update, check.context, check.chat, check.user, reason)
+    return True
+
+
+async def _rules(check: MessageCheck) -> bool:
+    # Hard rules (phrases, wallet/invite formats) from the rules file
+    if not check.text:
+        return False
+
+    with metrics.timer("rules.match"):
+        rule = rule_engine.match(check.text)
+    if rule is None:
+        return False
+
+    check.scam_score = rule.score
+    reason = f"Matched scam rule {rule} (Score: {rule.score})"
+    await _ban_and_delete(check.update, check.context, check.chat, check.user, reason)
+    return True
+
+
+async def _links(check: MessageCheck) -> bool:
+    # Domains or invite links that scams of several users already used
+    bad_links = link_reputation.bad_links(await check.get("link_keys"))
+    if not bad_links:
+        return False
+
+    metrics.incr("link_reputation.ban")
+    reason = f"Known scam links {', '.join(bad_links)}"
+    await _ban_and_delete(check.update, check.context, check.chat, check.user, reason)
+    return True
+
 
+async def _known_image(check: MessageCheck) -> bool:
+    # Image-only exact repost (same file_unique_id) of an image scored as scam;
+    # text with it was never scored, so such messages go to the full analysis
+    if check.text:
+        return False
+    known_score = await check.get("known_image_score")
+    if known_score is None or known_score <= SCAM_THRESHOLD:
+        return False
+
+    reason = f"Known scam image (Score: {known_score})"
+    await _ban_and_delete(
+        check.update, check.context, check.chat, check.user, reason, verdict_source=None
+    )
+    return True
+
+
+async def _media(check: MessageCheck) -> bool:
+    # Image verdicts are only kept for image-only messages (see _llm). With
+    # ASYNC_VERDICTS the verdict queue worker downloads, hashes and matches instead
+    if check.text or ASYNC_VERDICTS:
+        return False
+    image_data = await check.get("image_data")
+    if not image_data:
+        return False
+
+    # Re-encoded copies of known scam images are caught by perceptual hash
     try:
-        text = update.message.text or update.message.caption
-        msg_id = update.message.message_id
-        chat_id = update.message.chat.id
+        check.image_hash = await worker_pool.run(dhash, image_data)
+    except Exception as e:
+        logger.error(f"Error hashing image: {e}")
+        return False
 
-        logger.info(f"Processing message {msg_id} in chat {chat_id}")
+    hash_score = image_index.match_scam(check.image_hash)
+    if hash_score is None:
+        return False
 
-        image_data = await _get_image_data(update)
+    reason = f"Image similar to known scam image (Score: {hash_score})"
+    await _ban_and_delete(
+        check.update, check.context, check.chat, check.user, reason, verdict_source=None
+    )
+    return True
 
-        # Logic 1: Language Detection
-        is_russian = False
-        if text and language_service.is_russian(text):
-            is_russian = True
 
-        # Logic 2: Determine if we need to analyze
-        should_analyze = False
+async def _local_model(check: MessageCheck) -> bool:
+    # Confident local verdicts skip Gemini; albums are left to the group analysis
+    if not local_classifier.loaded or not check.text or check.message.media_group_id:
+        return False
 
-        if is_russian:
-            should_analyze = True
-            logger.info("Russian message detected. Analyzing...")
-        else:
-            # Check message count for non-Russian
-            user_record = get_user(user.id, chat.id)
-            msg_count = user_record.messages_count if user_record else 0
+    with metrics.timer("local_classifier.predict"):
+        local_score = local_classifier.predict(check.text)
+    if local_score >= LOCAL_CLASSIFIER_SCAM_CONFIDENCE:
+        metrics.incr("local_classifier.scam")
+        check.scam_score = local_score
+        # Not indexed as a template: near-duplicates reach this stage again and
+        # are logged as local verdicts, not as source "ban"
+        reason = f"Local classifier scam (Score: {local_score:.3f})"
+        await _ban_and_delete(
+            check.update,
+            check.context,
+            check.chat,
+            check.user,
+            reason,
+            verdict_source="local",
+            learn=False,
+        )
+        return True
 
-            logger.info(f"User has sent {msg_count} messages.")
+    # The model only sees the text, an image may still be a scam
+    if local_score <= LOCAL_CLASSIFIER_SAFE_CONFIDENCE and not check.message.photo:
+        metrics.incr("local_classifier.safe")
+        check.scam_score = local_score
+        logger.info(f"Local classifier Scam Score: {local_score:.3f}. Skipping Gemini.")
+        return await _post_analysis(check)
 
-            if msg_count >= 2:
-                logger.info("Trusted. Skipping check.")
-                increment_message_count(user.id, chat.id)
-                return
+    return False
 
-            logger.info(
-                f"User has sent {msg_count} messages (Threshold: 2). Analyzing non-Russian message..."
-            )
-            should_analyze = True
 
-        if not should_analyze:
-            logger.info("Not analyzing. Returning.")
-            return
+async def _defer(check: MessageCheck, coalescer: Coalescer, key):
+    # Settle every input the group analysis reads: handle_scam's cancel_pending()
+    # would otherwise cancel a prefetched download the group still awaits.
+    # With ASYNC_VERDICTS the verdict queue worker downloads the photo instead
+    names = ["is_russian", "link_keys", "known_image_score"]
+    if not ASYNC_VERDICTS:
+        names.append("image_data")
+    await asyncio.gather(*(check.get(name) for name in names))
+    coalescer.add(key, check)
 
-        # Logic 3: Analysis
-        scam_score = await gemini_service.analyze_content(text, image_data)
-        logger.info(f"Gemini Scam Score: {scam_score}")
 
-        if scam_score > SCAM_THRESHOLD:
-            logger.info(f"SCAM DETECTED TEXT: {text}")
-            reason = f"Scam detected (Score: {scam_score}) in {'Russian' if is_russian else 'non-Russian'} message"
-            await _ban_and_delete(update, context, chat, user, reason)
-            return
+async def _media_group(check: MessageCheck) -> bool:
+    # Album parts arrive as separate updates; they are analyzed together once
+    # the whole group is in (see _analyze_group)
+    if not check.message.media_group_id:
+        return False
+
+    logger.info(f"Message is part of media group {check.message.media_group_id}. Deferring analysis.")
+    await _defer(check, media_groups, ("media_group", check.chat.id, check.message.media_group_id))
+    return True
+
+
+async def _burst(check: MessageCheck) -> bool:
+    # Rapid consecutive messages of one user are analyzed together
+    if not BURST_COALESCING:
+        return False
+
+    await _defer(check, bursts, ("burst", check.chat.id, check.user.id))
+    return True
+
+
+async def _enqueue(check: MessageCheck) -> bool:
+    # Allow-then-retract: the verdict queue worker analyzes the message later
+    if not ASYNC_VERDICTS:
+        return False
+    return await _enqueue_checks([check])
+
+
+async def _enqueue_checks(checks: list[MessageCheck]) -> bool:
+    """
+    Persists messages for the verdict queue worker (bot/handlers/verdict_queue.py).
+    Only images that still need analysis are queued, by file_id: the worker
+    downloads and hashes them, the handler never does.
+    Returns False if the queue could not be written (analyze inline instead).
+    """
+    first = checks[0]
+    messages, images = [], []
+    for check in checks:
+        messages.append(
+            {"id": check.message.message_id, "russian": await check.get("is_russian")}
+        )
+        if await _image_needs_analysis(check):
+            photo = select_photo(check.message.photo)
+            images.append({"file_id": photo.file_id, "image_id": photo.file_unique_id})
+    text = "\n".join(check.text for check in checks if check.text)
+
+    queued = await enqueue_analysis(
+        first.chat.id,
+        first.user.id,
+        first.user.username or first.user.first_name,
+        messages,
+        text,
+        images,
+    )
+    if queued:
+        logger.info(f"Queued {len(checks)} messages for analysis.")
+    return queued
 
-        # Logic 4: Post-Analysis Actions (if not banned)
-        if not is_russian:
-            # Safe non-Russian message -> Increment count
-            increment_message_count(user.id, chat.id)
+
+async def _llm(check: MessageCheck) -> bool:
+    image_id = _get_image_id(check.update)
+    image_data = await check.get("image_data")
+    known_image_score = await check.get("known_image_score")
+
+    source = "image_index"
+    if known_image_score is not None and not check.text:
+        # Image-only repost of an image already scored as safe
+        check.scam_score = known_image_score
+    else:
+        check.scam_score, source = await gemini_service.analyze_content(
+            check.text,
+            image_data,
+            image_id=image_id,
+            chat_id=check.chat.id,
+            priority=await _priority(check),
+            user_id=check.user.id,
+        )
+        if check.scam_score is None:
+            return await _defer_unscored([check])
+    logger.info(f"Gemini Scam Score: {check.scam_score} ({source})")
+    # Fallback scores are guesses, only Gemini verdicts are learned from
+    learn = source != "fallback"
+
+    if learn and image_data and not check.text:
+        # A score of image and text says nothing about the image alone
+        image_index.record(image_id, check.image_hash, check.scam_score)
+    if check.scam_score <= SCAM_THRESHOLD:
+        if learn:
+            await link_reputation.learn(await check.get("link_keys"), banned=False)
+        return False
+
+    logger.info(f"SCAM DETECTED TEXT: {check.text}")
+    if learn and check.text:
+        scam_index.add(check.text, check.scam_score)
+    is_russian = await check.get("is_russian")
+    reason = f"Scam detected (Score: {check.scam_score}) in {'Russian' if is_russian else 'non-Russian'} message"
+    await _ban_and_delete(
+        check.update,
+        check.context,
+        check.chat,
+        check.user,
+        reason,
+        verdict_source="ban" if learn else None,
+        learn=learn,
+    )
+    return True
+
+
+async def _defer_unscored(checks: list[MessageCheck]) -> bool:
+    """
+    Neither Gemini nor the fallback could score the messages (images during an
+    outage): they stay up and the verdict queue worker retries the analysis.
+    """
+    metrics.incr("scam_handler.unscored", len(checks))
+    if not await _enqueue_checks(checks):
+        logger.error(f"Could not queue {len(checks)} unscored messages. Leaving them up.")
+    return True
+
+
+async def _post_analysis(check: MessageCheck) -> bool:
+    user = check.user
+    await _allow_message(
+        check.context.bot,
+        check.chat.id,
+        user.id,
+        user.username or user.first_name,
+        check.message.message_id,
+        await check.get("is_russian"),
+    )
+    return True
+
+
+async def _allow_message(
+    bot: Bot, chat_id: int, user_id: int, user_name: str, message_id: int, is_russian: bool
+):
+    """Post-analysis of a message that is not scam (also used by the verdict queue)."""
+    if not is_russian:
+        # Safe non-Russian message -> Increment count
+        await increment_message_count(user_id, chat_id)
+        return
+
+    # Safe Russian message -> Check Age
+    logger.info(f"Russian message detected but not scam. Checking user age...")
+    is_new = await user_service.is_new_user(user_id, chat_id, None)
+
+    if not is_new:
+        logger.info("User is OLD. Allowing Russian message.")
+        return
+
+    # User is NEW -> Delete & Warn
+    logger.info("User is NEW. Deleting and Warning.")
+    try:
+        await bot.send_message(
+            chat_id=chat_id,
+            text=f"@{user_name} Будь ласка, спілкуйтеся Українською🇺🇦, Англійською🇬🇧 або Івритом🇮🇱!",
+            reply_to_message_id=message_id,
+        )
+        await bot.delete_message(chat_id=chat_id, message_id=message_id)
+    except Exception as e:
+        logger.error(f"Failed to delete/warn: {e}")
+
+
+SCAM_PIPELINE = [
+    _chat_type,
+    _known_scammer,
+    _prefetch,
+    _thread_exclusion,
+    _trust,
+    _language,
+    _prefetch_media,
+    _known_scam,
+    _rules,
+    _links,
+    _known_image,
+    _media,
+    _local_model,
+    _media_group,
+    _burst,
+    _enqueue,
+    _llm,
+    _post_analysis,
+]
+
+
+async def _analyze_group(key, checks: list[MessageCheck]):
+    """
+    Scores deferred messages (an album or a burst of one user) with one Gemini request.
+    A scam verdict bans the sender and deletes every message with one batched delete.
+    With ASYNC_VERDICTS, the group goes to the verdict queue instead.
+    """
+    if ASYNC_VERDICTS and await _enqueue_checks(checks):
+        return
+
+    if len(checks) == 1:
+        # Nothing to combine, finish the pipeline as usual
+        check = checks[0]
+        if not await _llm(check):
+            await _post_analysis(check)
+        return
+
+    first = checks[0]
+    label = key[0]
+    text = "\n".join(check.text for check in checks if check.text)
+    images, image_ids, known_scores = [], [], []
+    for check in checks:
+        image_data = await check.get("image_data")
+        if image_data:
+            images.append(image_data)
+            image_ids.append(_get_image_id(check.update))
+        known_image_score = await check.get("known_image_score")
+        if known_image_score is not None:
+            known_scores.append(known_image_score)
+
+    source = "image_index"
+    if not text and not images:
+        # Only reposts of images already scored as safe
+        scam_score = max(known_scores, default=0.0)
+    else:
+        scam_score, source = await gemini_service.analyze_content(
+            text,
+            images,
+            image_id=",".join(image_ids) if image_ids else None,
+            chat_id=first.chat.id,
+            priority=await _priority(first),
+            user_id=first.user.id,
+        )
+        if scam_score is None:
+            await _defer_unscored(checks)
             return
-        else:
-            # Safe Russian message -> Check Age
-            logger.info(f"Russian message detected but not scam. Checking user age...")
-            is_new = await user_service.is_new_user(user.id, chat.id, context)
-
-            if not is_new:
-                logger.info("User is OLD. Allowing Russian message.")
-                return
-
-            # User is NEW -> Delete & Warn
-            logger.info("User is NEW. Deleting and Warning.")
-            try:
-                await update.message.reply_text(
-                    f"@{user.username or user.first_name} Будь ласка, спілкуйтеся Українською🇺🇦, Англійською🇬🇧 або Івритом🇮🇱!"
-                )
-                await update.message.delete()
-            except Exception as e:
-                logger.error(f"Failed to delete/warn: {e}")
+    logger.info(
+        f"Gemini Scam Score for {label} of {len(checks)} messages: {scam_score} ({source})"
+    )
+    metrics.incr(f"scam_handler.coalesced.{label}", len(checks) - 1)
+    # Fallback scores are guesses, only Gemini verdicts are learned from
+    learn = source != "fallback"
+
+    for check in checks:
+        check.scam_score = scam_score
+        # Only a single image scored without text has a verdict of its own
+        if learn and not text and len(images) == 1 and await check.get("image_data"):
+            image_index.record(_get_image_id(check.update), check.image_hash, scam_score)
+
+    link_keys = set()
+    for check in checks:
+        link_keys |= await check.get("link_keys")
+
+    if scam_score <= SCAM_THRESHOLD:
+        if learn:
+            await link_reputation.learn(link_keys, banned=False)
+        for check in checks:
+            await _post_analysis(check)
+        return
+
+    logger.info(f"SCAM DETECTED TEXT: {text}")
+    # Only the combined text was scored; a part alone (often a greeting) may be harmless
+    if learn and text:
+        scam_index.add(text, scam_score)
+    message_ids = [check.message.message_id for check in checks]
+    reason = f"Scam detected (Score: {scam_score}) in {label}"
+    await _ban_and_delete_messages(
+        first.context.bot,
+        first.chat.id,
+        first.user.id,
+        message_ids,
+        reason,
+        text=None if images or not learn else text,
+        link_keys=link_keys,
+        learn=learn,
+    )
+
 
+media_groups = Coalescer(
+    "media_group",
+    _analyze_group,
+    MEDIA_GROUP_WINDOW_SECONDS,
+    MEDIA_GROUP_MAX_DELAY_SECONDS,
+    MEDIA_GROUP_MAX_SIZE,
+)
+bursts = Coalescer(
+    "burst",
+    _analyze_group,
+    BURST_WINDOW_SECONDS,
+    BURST_MAX_DELAY_SECONDS,
+    BURST_MAX_SIZE,
+)
+
+
+async def handle_scam(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handles incoming messages and checks for scams if the user is new.
+    Runs SCAM_PIPELINE, ordered from the cheapest check to the Gemini call.
+    """
+    if not update.message or not update.message.from_user or not update.message.chat:
+        logger.info("No message or user or chat. Returning.")
+        return
+
+    check = MessageCheck(update, context, INPUT_LOADERS)
+    logger.info(f"Processing message {check.message.message_id} in chat {check.chat.id}")
+
+    try:
+        finished_at = await run_pipeline(check, SCAM_PIPELINE)
+        total_ms = sum(check.timings.values()) * 1000
+        logger.info(f"Scam pipeline finished at '{finished_at}' in {total_ms:.1f}ms")
     except Exception as e:
         logger.error(f"Error in scam_handler: {e}")
+    finally:
+        check.cancel_pending()
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import time
+from telegram import Update
+from telegram.ext import ContextTypes
+from bot.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class MessageCheck:
+    """
+    State of one message going through the scam pipeline.
+    Expensive inputs (trust lookup, language, image download) are loaded on
+    first use and memoized, so a stage that stops the pipeline early never
+    pays for inputs only later stages need. Inputs can also be prefetched
+    concurrently; whatever is still in flight when the pipeline stops is cancelled.
+    """
+
+    def __init__(
+        self, update: Update, context: ContextTypes.DEFAULT_TYPE, loaders: dict
+    ):
+        self.update = update
+        self.context = context
+        self.message = update.message
+        self.user = update.message.from_user
+        self.chat = update.message.chat
+        self.text = update.message.text or update.message.caption
+        self.trusted = False
+        self.image_hash: int = None
+        self.scam_score: float = None
+        self.timings: dict[str, float] = {}
+        # input name -> coroutine function taking this MessageCheck
+        self._loaders = loaders
+        self._inputs: dict[str, asyncio.Future] = {}
+
+    def load(self, name: str) -> asyncio.Future:
+        """Starts loading an input (if not already started) and returns its future."""
+        future = self._inputs.get(name)
+        if future is None:
+            future = asyncio.ensure_future(self._loaders[name](self))
+            future.add_done_callback(_retrieve_exception)
+            self._inputs[name] = future
+        return future
+
+    async def get(self, name: str):
+        return await self.load(name)
+
+    def prefetch(self, names: list[str]):
+        """Starts loading the given inputs concurrently without waiting for them."""
+        for name in names:
+            self.load(name)
+
+    def cancel_pending(self):
+        """Cancels inputs that are still loading (their result is no longer needed)."""
+        for name, future in self._inputs.items():
+            if not future.done():
+                future.cancel()
+                metrics.incr(f"scam_pipeline.cancelled.{name}")
+
+
+def _retrieve_exception(future: asyncio.Future):
+    # Prefetched inputs may fail without anyone awaiting them; mark the error
+    # as retrieved so asyncio doesn't log "exception was never retrieved"
+    if not future.cancelled():
+        future.exception()
+
+
+async def run_pipeline(check: MessageCheck, stages: list) -> str | None:
+    """
+    Runs stages in order until one returns True (message fully handled).
+    Each stage's duration is recorded as the scam_pipeline.<stage> timing.
+    Returns the name of the stage that finished the message, if any.
+    """
+    for stage in stages:
+        name = stage.__name__.lstrip("_")
+        start = time.perf_counter()
+        try:
+            done = await stage(check)
+        finally:
+            elapsed = time.perf_counter() - start
+            check.timings[name] = elapsed
+            metrics.observe(f"scam_pipeline.{name}", elapsed)
+        if done:
+            return name
+    return None
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta
+from telegram import Bot
+from config import (
+    SCAM_THRESHOLD,
+    ANALYSIS_QUEUE_POLL_SECONDS,
+    ANALYSIS_QUEUE_BATCH_SIZE,
+    ANALYSIS_QUEUE_MAX_ATTEMPTS,
+    ANALYSIS_QUEUE_RETRY_SECONDS,
+)
+from bot.handlers.scam_handler import (
+    gemini_service,
+    scam_index,
+    image_index,
+    _ban_and_delete_messages,
+    _allow_message,
+)
+from bot.services.metrics import metrics
+from bot.services.image_index import dhash
+from bot.services.worker_pool import worker_pool
+from db.async_core import get_due_analyses, delete_analysis, reschedule_analysis
+
+logger = logging.getLogger(__name__)
+
+# Background worker for ASYNC_VERDICTS mode: analyzes messages that handle_scam
+# already allowed and retracts them (delete + ban) when they turn out to be scam.
+# The queue lives in the database, so pending analyses survive restarts.
+
+_worker_task: asyncio.Task = None
+
+
+async def _download(bot: Bot, file_id: str) -> bytes:
+    photo_file = await bot.get_file(file_id)
+    return bytes(await photo_file.download_as_bytearray())
+
+
+async def _hash(image_data: bytes) -> int | None:
+    try:
+        return await worker_pool.run(dhash, image_data)
+    except Exception as e:
+        logger.error(f"Error hashing queued image: {e}")
+        return None
+
+
+async def process_analysis(bot: Bot, analysis) -> bool:
+    """
+    Analyzes one queued PendingAnalysis and applies the verdict.
+    The images are downloaded and hashed here, not in the handler.
+    Returns False if it has to be retried (download or Gemini failure).
+    """
+    messages = json.loads(analysis.messages)
+    images = json.loads(analysis.images)
+
+    try:
+        image_data = [await _download(bot, image["file_id"]) for image in images]
+    except Exception as e:
+        logger.error(f"Failed to download queued image: {e}")
+        return False
+    image_hashes = [await _hash(data) for data in image_data]
+
+    # Re-encoded copies of known scam images need no Gemini call (image-only, see _media)
+    hash_score = None
+    if not analysis.text:
+        matches = [image_index.match_scam(h) for h in image_hashes if h is not None]
+        hash_score = max((score for score in matches if score is not None), default=None)
+
+    if hash_score is not None:
+        scam_score = hash_score
+    elif analysis.text or image_data:
+        image_id = ",".join(image["image_id"] for image in images) or None
+        # Without the local fallback every score is a Gemini verdict
+        scam_score, _ = await gemini_service.analyze_content(
+            analysis.text,
+            image_data,
+            image_id=image_id,
+            local_fallback=False,
+            chat_id=analysis.chat_id,
+            user_id=analysis.user_id,
+        )
+        if scam_score is None:
+            return False
+    else:
+        # Only reposts of images already scored as safe
+        scam_score = 0.0
+    logger.info(f"Queued analysis {analysis.id} Gemini Scam Score: {scam_score}")
+
+    # Only a single image scored without text has a verdict of its own
+    if not analysis.text and len(images) == 1:
+        image_index.record(images[0]["image_id"], image_hashes[0], scam_score)
+
+    if scam_score <= SCAM_THRESHOLD:
+        for message in messages:
+            await _allow_message(
+                bot,
+                analysis.chat_id,
+                analysis.user_id,
+                analysis.user_name,
+                message["id"],
+                message["russian"],
+            )
+        return True
+
+    logger.info(f"SCAM DETECTED TEXT: {analysis.text}")
+    if analysis.text:
+        scam_index.add(analysis.text, scam_score)
+    metrics.incr("verdict_queue.retracted", len(messages))
+    reason = f"Scam detected (Score: {scam_score}) after the message was allowed"
+    await _ban_and_delete_messages(
+        bot,
+        analysis.chat_id,
+        analysis.user_id,
+        [message["id"] for message in messages],
+        reason,
+        text=None if images else analysis.text,
+    )
+    return True
+
+
+async def _finish(bot: Bot, analysis):
+    try:
+        done = await process_analysis(bot, analysis)
+    except Exception as e:
+        logger.error(f"Error processing queued analysis {analysis.id}: {e}")
+        done = False
+
+    if done:
+        await delete_analysis(analysis.id)
+        metrics.observe(
+            "verdict_queue.delay", (datetime.now() - analysis.created_at).total_seconds()
+        )
+        return
+
+    attempts = analysis.attempts + 1
+    if attempts >= ANALYSIS_QUEUE_MAX_ATTEMPTS:
+        logger.error(
+            f"Giving up on queued analysis {analysis.id} after {attempts} attempts."
+        )
+        metrics.incr("verdict_queue.dropped")
+        await delete_analysis(analysis.id)
+        return
+
+    delay = ANALYSIS_QUEUE_RETRY_SECONDS * 2 ** (attempts - 1)
+    metrics.incr("verdict_queue.retries")
+    await reschedule_analysis(
+        analysis.id, attempts, datetime.now() + timedelta(seconds=delay)
+    )
+
+
+async def process_due(bot: Bot, limit: int = ANALYSIS_QUEUE_BATCH_SIZE) -> int:
+    """Processes the analyses that are due, concurrently. Returns how many ran."""
+    analyses = await get_due_analyses(limit)
+    if analyses:
+        await asyncio.gather(*(_finish(bot, analysis) for analysis in analyses))
+    return len(analyses)
+
+
+async def _run_worker(bot: Bot, interval: float):
+    while True:
+        try:
+            # A full batch means more work is probably waiting
+            if await process_due(bot) >= ANALYSIS_QUEUE_BATCH_SIZE:
+                continue
+        except Exception as e:
+            logger.error(f"Error in verdict queue worker: {e}")
+        await asyncio.sleep(interval)
+
+
+def start_verdict_worker(bot: Bot, interval: float = ANALYSIS_QUEUE_POLL_SECONDS):
+    """Starts the background task that drains the persistent analysis queue."""
+    global _worker_task
+    if _worker_task is None or _worker_task.done():
+        _worker_task = asyncio.create_task(_run_worker(bot, interval))
+
+
+async def stop_verdict_worker():
+    """Stops the worker; unfinished analyses stay queued for the next start."""
+    global _worker_task
+    if _worker_task is not None:
+        _worker_task.cancel()
+        try:
+            await _worker_task
+        except asyncio.CancelledError:
+            pass
+        _worker_task = None
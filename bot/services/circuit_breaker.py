@@ -0,0 +1,108 @@
+import logging
+import time
+from collections import deque
+from config import (
+    BREAKER_WINDOW,
+    BREAKER_MIN_CALLS,
+    BREAKER_FAILURE_RATE,
+    BREAKER_SLOW_CALL_SECONDS,
+    BREAKER_SLOW_CALL_RATE,
+    BREAKER_OPEN_SECONDS,
+)
+from bot.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Tracks the outcome of recent calls to a dependency. Opens when the share
+    of failed or slow calls in the window is too high; while open, callers
+    use their fallback. After open_seconds one probe call is let through
+    (half-open): success closes the breaker, failure opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = BREAKER_WINDOW,
+        min_calls: int = BREAKER_MIN_CALLS,
+        failure_rate: float = BREAKER_FAILURE_RATE,
+        slow_call_seconds: float = BREAKER_SLOW_CALL_SECONDS,
+        slow_call_rate: float = BREAKER_SLOW_CALL_RATE,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        # (failed, slow) per recent call
+        self._calls: deque[tuple[bool, bool]] = deque(maxlen=window)
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                return False
+            self._set_state(HALF_OPEN)
+        # Half-open: a single probe at a time
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def record_success(self, seconds: float):
+        self._record(False, seconds >= self.slow_call_seconds)
+
+    def record_failure(self):
+        self._record(True, False)
+
+    def record_cancelled(self):
+        """The caller gave up; says nothing about the dependency, but frees the probe."""
+        if self.state == HALF_OPEN:
+            self._probe_in_flight = False
+
+    def _record(self, failed: bool, slow: bool):
+        if self.state == HALF_OPEN:
+            self._probe_in_flight = False
+            if failed or slow:
+                self._open()
+            else:
+                self._calls.clear()
+                self._set_state(CLOSED)
+            return
+
+        self._calls.append((failed, slow))
+        if self.state == OPEN or len(self._calls) < self.min_calls:
+            return
+        failures = sum(1 for failed, _ in self._calls if failed)
+        slow_calls = sum(1 for _, slow in self._calls if slow)
+        if (
+            failures / len(self._calls) >= self.failure_rate
+            or slow_calls / len(self._calls) >= self.slow_call_rate
+        ):
+            logger.warning(
+                f"Circuit breaker {self.name} opened: {failures} failed and "
+                f"{slow_calls} slow of {len(self._calls)} calls."
+            )
+            self._open()
+
+    def _open(self):
+        self._opened_at = time.monotonic()
+        self._set_state(OPEN)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            metrics.incr(f"circuit_breaker.{self.name}.{state}")
+        self.state = state
+        metrics.set_gauge(f"circuit_breaker.{self.name}.open", state != CLOSED)
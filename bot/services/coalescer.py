@@ -0,0 +1,76 @@
+import asyncio
+import logging
+from bot.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Coalescer:
+    """
+    Groups items by key and hands each group to flush_group(key, items) in a
+    background task once the key has been quiet for window_seconds, max_delay
+    seconds after its first item, or when it reaches max_size items.
+    add() never waits, so callers processed one after another (e.g. updates
+    of the same chat) can all join the group before it is flushed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush_group,
+        window_seconds: float,
+        max_delay_seconds: float,
+        max_size: int,
+    ):
+        self.name = name
+        self._flush_group = flush_group
+        self.window_seconds = window_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.max_size = max_size
+        # key -> (items, first item loop time, flush timer)
+        self._groups: dict = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def add(self, key, item):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        group = self._groups.get(key)
+        if group is None:
+            items, started, timer = [], now, None
+        else:
+            items, started, timer = group
+            timer.cancel()
+        items.append(item)
+
+        if len(items) >= self.max_size:
+            self._groups.pop(key, None)
+            self._start(key, items)
+            return
+
+        delay = min(self.window_seconds, started + self.max_delay_seconds - now)
+        timer = loop.call_later(max(delay, 0), self._flush, key)
+        self._groups[key] = (items, started, timer)
+
+    def pending(self) -> int:
+        return len(self._groups)
+
+    def _flush(self, key):
+        group = self._groups.pop(key, None)
+        if group is not None:
+            self._start(key, group[0])
+
+    def _start(self, key, items: list):
+        metrics.observe(f"{self.name}.group_size", len(items))
+        task = asyncio.create_task(self._run(key, items))
+        # Keep a reference so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key, items: list):
+        try:
+            await self._flush_group(key, items)
+        except asyncio.CancelledError:
+            logger.error(f"Flushing {self.name} group {key} was cancelled.")
+            raise
+        except Exception as e:
+            logger.error(f"Error flushing {self.name} group {key}: {e}")
@@ -0,0 +1,59 @@
+import io
+import re
+from PIL import Image
+from config import (
+    IMAGE_TARGET_SIDE,
+    IMAGE_JPEG_QUALITY,
+    GEMINI_MAX_TEXT_CHARS,
+)
+
+# Links and @handles carry most of the scam signal, so they survive truncation
+_LINKS_AND_HANDLES = re.compile(
+    r"(?:https?://|www\.)\S+|\b[\w-]+\.(?:me|com|org|net|io|ru|ua|xyz|top|link)/\S*|@\w{4,}",
+    re.IGNORECASE,
+)
+
+
+def select_photo(photos):
+    """
+    Picks the smallest Telegram PhotoSize whose longest side still reaches
+    IMAGE_TARGET_SIDE (falls back to the largest one available).
+    """
+    if not photos:
+        return None
+    for photo in sorted(photos, key=lambda p: p.width * p.height):
+        if max(photo.width, photo.height) >= IMAGE_TARGET_SIDE:
+            return photo
+    return photos[-1]
+
+
+def prepare_image(image_data: bytes) -> tuple[bytes, str]:
+    """
+    Decodes an image, downscales it to IMAGE_TARGET_SIDE and re-encodes it as
+    compact JPEG. Returns (bytes, mime_type). CPU-bound, run it in the worker pool.
+    """
+    with Image.open(io.BytesIO(image_data)) as image:
+        image = image.convert("RGB")
+        image.thumbnail((IMAGE_TARGET_SIDE, IMAGE_TARGET_SIDE))
+        output = io.BytesIO()
+        image.save(output, "JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+    return output.getvalue(), "image/jpeg"
+
+
+def truncate_text(text: str, max_chars: int = GEMINI_MAX_TEXT_CHARS) -> str:
+    """
+    Shortens very long texts to roughly max_chars, keeping the beginning and
+    the end. Links and @handles from the dropped middle are appended.
+    """
+    if not text or len(text) <= max_chars:
+        return text
+
+    head = text[: max_chars * 2 // 3]
+    tail = text[-(max_chars // 3) :]
+    middle = text[len(head) : len(text) - len(tail)]
+    links = list(dict.fromkeys(_LINKS_AND_HANDLES.findall(middle)))
+
+    truncated = f"{head} […] {tail}"
+    if links:
+        truncated += "\nLinks and handles in the omitted part: " + " ".join(links)
+    return truncated
@@ -0,0 +1,37 @@
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Weighted scam signals (English, Russian, Ukrainian). Matched weights are
+# combined as independent evidence: score = 1 - prod(1 - weight).
+SCAM_SIGNALS = [
+    (r"\b(usdt|btc|bitcoin|crypto\w*|airdrop|binance|крипт\w*|биткоин\w*|біткоїн\w*)\b", 0.35),
+    (r"\b(earn\w*|profit\w*|income|заработ\w*|заробіт\w*|заробля\w*|доход\w*|прибут\w*)\b", 0.3),
+    (r"(\$\s?\d+|\d+\s?\$|\b\d+\s?(usd|usdt|грн|руб\w*)\b)", 0.25),
+    (r"\b(giveaway|prize|winner|you won|розыгрыш\w*|выигр\w*|приз\w*|виграш\w*|розіграш\w*)\b", 0.35),
+    (r"(write (to )?me|dm me|\bin (the )?pm\b|пиш\w*( мне)? в (лс|личк\w*)|пишіть( мені)? в (пп|особист\w*)|\bв лс\b)", 0.35),
+    (r"\b(remote work|no experience|удал[её]нн\w* работ\w*|подработ\w*|без опыта|віддален\w* робот\w*|без досвіду)\b", 0.35),
+    (r"\b(urgent\w*|only today|limited|срочно|только сегодня|терміново|тільки сьогодні)\b", 0.2),
+    (r"(https?://|t\.me/|bit\.ly/|@\w+bot\b)", 0.25),
+]
+
+_COMPILED_SIGNALS = [(re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in SCAM_SIGNALS]
+
+
+class FallbackClassifier:
+    """
+    Local scam scorer used while Gemini is unavailable (circuit breaker open
+    or all model tiers failed). Much less accurate than the LLM, but it keeps
+    the obvious scams out instead of letting everything through.
+    """
+
+    def score(self, text: str) -> float:
+        if not text:
+            # Nothing to judge without the model (image-only message)
+            return 0.0
+        safe_probability = 1.0
+        for pattern, weight in _COMPILED_SIGNALS:
+            if pattern.search(text):
+                safe_probability *= 1 - weight
+        return round(1 - safe_probability, 2)
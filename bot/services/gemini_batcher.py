@@ -0,0 +1,67 @@
+import asyncio
+import logging
+from config import GEMINI_BATCH_MAX_SIZE, GEMINI_BATCH_WINDOW_SECONDS
+from bot.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class GeminiBatcher:
+    """
+    Collects analysis requests for a short window (or until max_size items)
+    and scores them with a single Gemini call.
+    analyze_batch takes a list of (text, image_data) and returns one score
+    (or None on failure) per item; each score is routed back to its caller.
+    """
+
+    def __init__(
+        self,
+        analyze_batch,
+        max_size: int = GEMINI_BATCH_MAX_SIZE,
+        window_seconds: float = GEMINI_BATCH_WINDOW_SECONDS,
+    ):
+        self._analyze_batch = analyze_batch
+        self.max_size = max_size
+        self.window_seconds = window_seconds
+        self._pending: list[tuple[str, bytes, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, text: str, image_data: bytes = None) -> float | None:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, image_data, future))
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._run(batch))
+        # Keep a reference so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[str, bytes, asyncio.Future]]):
+        metrics.observe("gemini.batch_size", len(batch))
+        try:
+            scores = await self._analyze_batch(
+                [(text, image_data) for text, image_data, _ in batch]
+            )
+        except Exception as e:
+            logger.error(f"Error analyzing batch: {e}")
+            scores = [None] * len(batch)
+
+        for (_, _, future), score in zip(batch, scores):
+            if not future.done():
+                future.set_result(score)
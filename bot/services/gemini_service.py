@@ -1,118 +1,499 @@
+import asyncio
 import logging
 import json
-import io
-from PIL import Image
+import hashlib
+import time
 from google import genai
-from google.genai import types
-from config import GEMINI_API_KEY
+from google.genai import errors, types
+from config import (
+    GEMINI_API_KEY,
+    GEMINI_BATCHING_ENABLED,
+    GEMINI_MODEL_TIERS,
+    GEMINI_ESCALATION_BAND,
+    GEMINI_MAX_OUTPUT_TOKENS,
+    GEMINI_BATCH_MAX_SIZE,
+    GEMINI_RATE_LIMIT_RETRIES,
+    GEMINI_RATE_LIMIT_BACKOFF_SECONDS,
+    GEMINI_HEDGING_ENABLED,
+    GEMINI_HEDGE_MIN_SAMPLES,
+    GEMINI_HEDGE_MIN_DELAY_SECONDS,
+    SCAM_THRESHOLD,
+)
+from bot.services.metrics import metrics
+from bot.services.gemini_batcher import GeminiBatcher
+from bot.services.rate_scheduler import RateScheduler, PRIORITY_DEFAULT
+from bot.services.circuit_breaker import CircuitBreaker
+from bot.services.fallback_classifier import FallbackClassifier
+from bot.services.local_classifier import local_classifier
+from db.async_core import record_verdict
+from bot.services.verdict_cache import VerdictCache
+from bot.services.worker_pool import worker_pool
+from bot.services.content_preprocessor import prepare_image, truncate_text
 
 logger = logging.getLogger(__name__)
 
+SCAM_INSTRUCTION = """
+You are a scam detection expert. Analyze the user's message (and image if provided) to determine if it is a scam, fraud, or spam.
+
+Answer with the JSON object {"scam": <double between 0.0 and 1.0>}.
+"scam" indicates the possibility of this message being a scam.
+0.0 means definitely safe.
+1.0 means definitely a scam.
+
+Consider:
+- Crypto giveaways
+- Phishing links
+- "You won a prize" messages
+- Urgent requests for money
+- Suspicious investment opportunities
+"""
+
+BATCH_INSTRUCTION = """
+You are a scam detection expert. The user sends several independent messages, each labeled with a numeric id (some have an image).
+Analyze each message on its own to determine if it is a scam, fraud, or spam.
+
+Answer with a JSON array containing {"id": <message id>, "scam": <double between 0.0 and 1.0>} for every message.
+"scam" indicates the possibility of this message being a scam.
+0.0 means definitely safe.
+1.0 means definitely a scam.
+
+Consider:
+- Crypto giveaways
+- Phishing links
+- "You won a prize" messages
+- Urgent requests for money
+- Suspicious investment opportunities
+"""
+
+SCAM_SCHEMA = types.Schema(
+    type=types.Type.OBJECT,
+    properties={"scam": types.Schema(type=types.Type.NUMBER)},
+    required=["scam"],
+)
+
+BATCH_SCHEMA = types.Schema(
+    type=types.Type.ARRAY,
+    items=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "id": types.Schema(type=types.Type.INTEGER),
+            "scam": types.Schema(type=types.Type.NUMBER),
+        },
+        required=["id", "scam"],
+    ),
+)
+
+# Safety filters would otherwise block the very scams we need to score
+SAFETY_SETTINGS = [
+    types.SafetySetting(
+        category=types.HarmCategory.HARM_CATEGORY_HARASSMENT,
+        threshold=types.HarmBlockThreshold.BLOCK_NONE,
+    ),
+    types.SafetySetting(
+        category=types.HarmCategory.HARM_CATEGORY_HATE_SPEECH,
+        threshold=types.HarmBlockThreshold.BLOCK_NONE,
+    ),
+    types.SafetySetting(
+        category=types.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
+        threshold=types.HarmBlockThreshold.BLOCK_NONE,
+    ),
+    types.SafetySetting(
+        category=types.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
+        threshold=types.HarmBlockThreshold.BLOCK_NONE,
+    ),
+]
+
+
+def _build_config(
+    tier: dict, instruction: str, schema: types.Schema, max_output_tokens: int
+) -> types.GenerateContentConfig:
+    thinking_config = None
+    if tier.get("thinking_budget") is not None:
+        thinking_config = types.ThinkingConfig(thinking_budget=tier["thinking_budget"])
+    return types.GenerateContentConfig(
+        system_instruction=instruction,
+        safety_settings=SAFETY_SETTINGS,
+        response_mime_type="application/json",
+        response_schema=schema,
+        max_output_tokens=max_output_tokens,
+        temperature=0.0,
+        thinking_config=thinking_config,
+    )
+
+
+def _extract_json(response_text: str, open_char: str, close_char: str):
+    """Robust JSON extraction (strips markdown fences and surrounding text)."""
+    start_index = response_text.find(open_char)
+    end_index = response_text.rfind(close_char)
+
+    if start_index != -1 and end_index != -1:
+        response_text = response_text[start_index : end_index + 1]
+
+    return json.loads(response_text)
+
+
+def _as_image_list(image_data: bytes | list[bytes] | None) -> list[bytes]:
+    if not image_data:
+        return []
+    if isinstance(image_data, (bytes, bytearray)):
+        return [image_data]
+    return [image for image in image_data if image]
+
+
+def _retrieve_exception(future: asyncio.Future):
+    # The losing hedged request may fail after the winner returned
+    if not future.cancelled():
+        future.exception()
+
 
 class GeminiService:
-    def __init__(self):
+    def __init__(self, model_tiers: list[dict] = GEMINI_MODEL_TIERS):
         if GEMINI_API_KEY:
             self.client = genai.Client(api_key=GEMINI_API_KEY)
-            self.model_name = "gemini-flash-latest"
         else:
             logger.error("GEMINI_API_KEY not found in environment variables.")
             self.client = None
-            self.model_name = None
+        self.model_tiers = model_tiers
+        # Request configs are constant, so they are built once per tier:
+        # model -> {"single": config, "batch": config}
+        batch_tokens = GEMINI_MAX_OUTPUT_TOKENS * GEMINI_BATCH_MAX_SIZE
+        self.configs = {
+            tier["model"]: {
+                "single": _build_config(
+                    tier, SCAM_INSTRUCTION, SCAM_SCHEMA, GEMINI_MAX_OUTPUT_TOKENS
+                ),
+                "batch": _build_config(
+                    tier, BATCH_INSTRUCTION, BATCH_SCHEMA, batch_tokens
+                ),
+            }
+            for tier in self.model_tiers
+        }
+        self.verdict_cache = VerdictCache()
+        self.scheduler = RateScheduler()
+        self.breaker = CircuitBreaker("gemini")
+        self.fallback = FallbackClassifier()
+        self.hedging = GEMINI_HEDGING_ENABLED
+        self.batcher = (
+            GeminiBatcher(self.analyze_batch) if GEMINI_BATCHING_ENABLED else None
+        )
 
-    async def analyze_content(self, text: str, image_data: bytes = None) -> float:
+    async def analyze_content(
+        self,
+        text: str,
+        image_data: bytes | list[bytes] = None,
+        image_id: str = None,
+        local_fallback: bool = True,
+        chat_id: int = None,
+        priority: int = PRIORITY_DEFAULT,
+        user_id: int = None,
+    ) -> tuple[float | None, str]:
         """
         Analyzes text and optional image using Gemini to determine scam probability.
-        Returns a float between 0.0 and 1.0.
+        image_data may also be a list of images (an album), scored as one message.
+        Returns (score, source): a float between 0.0 and 1.0 and where it came
+        from, "gemini", "cache" or "fallback". Fallback scores are guesses;
+        callers must not learn from them.
+        Identical content (same normalized text and image) is answered from the
+        verdict cache. Pass Telegram's file_unique_id as image_id to identify the
+        image without hashing its bytes.
+        With GEMINI_BATCHING_ENABLED, the request joins a micro-batch.
+        Calls wait for the rate scheduler; chat_id selects the per-chat bucket
+        and priority the queue order (see rate_scheduler).
+        Text-only Gemini verdicts with a chat_id are logged as training data
+        for the local classifier.
+        When Gemini can't answer (circuit breaker open, all tiers failed) the
+        local fallback classifier scores the text. The score is None if
+        local_fallback is False or there is no text to score (the caller
+        retries later).
         """
         if not self.client:
             logger.error("Gemini client not initialized.")
-            return 0.0
-
-        prompt = """
-        You are a scam detection expert. Analyze the following message (and image if provided) to determine if it is a scam, fraud, or spam.
-        
-        Return your answer strictly in this JSON format:
-        {
-            "scam": <double between 0.0 and 1.0>
-        }
-        
-        Do NOT return any other text, markdown formatting, or explanations. Return ONLY the JSON object.
-        
-        "scam" indicates the possibility of this message being a scam. 
-        0.0 means definitely safe.
-        1.0 means definitely a scam.
-        
-        Consider:
-        - Crypto giveaways
-        - Phishing links
-        - "You won a prize" messages
-        - Urgent requests for money
-        - Suspicious investment opportunities
+            return self._fallback_score(text, local_fallback)
+
+        if image_data and not image_id:
+            image_hash = hashlib.sha1()
+            for image in _as_image_list(image_data):
+                image_hash.update(image)
+            image_id = image_hash.hexdigest()
+        cache_key = self.verdict_cache.make_key(text, image_id)
+        cached_score = self.verdict_cache.get(cache_key)
+        if cached_score is not None:
+            logger.info(f"Verdict cache hit. Score: {cached_score}")
+            return cached_score, "cache"
+
+        if not self.breaker.allow_request():
+            logger.warning("Gemini circuit breaker open. Using the local fallback.")
+            return self._fallback_score(text, local_fallback)
+
+        try:
+            if self.batcher:
+                scam_score = await self.batcher.submit(text, image_data)
+            else:
+                scam_score = await self._analyze_single(
+                    text, image_data, chat_id=chat_id, priority=priority
+                )
+        except asyncio.CancelledError:
+            # Cancelled before a request went out (batch window, image preparation)
+            self.breaker.record_cancelled()
+            raise
+
+        if scam_score is None:
+            return self._fallback_score(text, local_fallback)
+        self.verdict_cache.set(cache_key, scam_score)
+        if text and not image_data and chat_id is not None:
+            await record_verdict(chat_id, user_id, text, scam_score, "gemini")
+        return scam_score, "gemini"
+
+    def _fallback_score(self, text: str, local_fallback: bool) -> tuple[float | None, str]:
+        # Without the model there is nothing to judge in an image-only message
+        if not local_fallback or not text:
+            return None, "fallback"
+        metrics.incr("gemini.fallback")
+        # The trained local classifier, if there is one, beats the keyword heuristics
+        if local_classifier.loaded:
+            scam_score = round(local_classifier.predict(text), 2)
+        else:
+            scam_score = self.fallback.score(text)
+        logger.info(f"Local fallback Scam Score: {scam_score}")
+        return scam_score, "fallback"
+
+    async def analyze_batch(
+        self, items: list[tuple[str, bytes]]
+    ) -> list[float | None]:
+        """
+        Scores several (text, image_data) messages with a single call to the
+        first model tier. Returns one score per item, None where it could not be scored.
+        Items missing from the response are retried one by one; ambiguous
+        scores escalate one by one to the next tier.
         """
+        if len(items) == 1:
+            return [await self._analyze_single(*items[0])]
 
         contents = []
-        if text:
-            # Combine prompt and text into one string or use multiple parts.
-            # Using single string for clarity in prompt structure.
-            full_prompt = f"{prompt}\n\nMessage Text: {text}"
-            contents.append(full_prompt)
-        else:
-            contents.append(prompt)
+        for message_id, (text, image_data) in enumerate(items):
+            contents.append(
+                f"Message {message_id}: {truncate_text(text) or '(no text)'}"
+            )
+            image_parts = await self._image_parts(image_data)
+            if image_parts:
+                contents.append(f"Message {message_id} image:")
+                contents.extend(image_parts)
+
+        scores: list[float | None] = [None] * len(items)
+        try:
+            response_text = await self._generate_with_tier(
+                self.model_tiers[0], contents, batch=True
+            )
+            if response_text:
+                for result in _extract_json(response_text, "[", "]"):
+                    message_id = int(result["id"])
+                    if 0 <= message_id < len(items):
+                        scores[message_id] = float(result.get("scam", 0.0))
+        except Exception as e:
+            logger.error(f"Error analyzing batch with Gemini: {e}")
+
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            logger.warning(
+                f"Batch response missing {len(missing)} of {len(items)} items. Retrying singly."
+            )
+            retried = await asyncio.gather(
+                *(self._analyze_single(*items[i]) for i in missing)
+            )
+            for i, score in zip(missing, retried):
+                scores[i] = score
+
+        # Retried items already went through the whole cascade
+        retried_ids = set(missing)
+        ambiguous = [
+            i
+            for i, score in enumerate(scores)
+            if i not in retried_ids and score is not None and self._is_ambiguous(score)
+        ]
+        if ambiguous and len(self.model_tiers) > 1:
+            first_model = self.model_tiers[0]["model"]
+            metrics.incr(f"gemini.escalations.{first_model}", len(ambiguous))
+            escalated = await asyncio.gather(
+                *(self._analyze_single(*items[i], start_tier=1) for i in ambiguous)
+            )
+            for i, score in zip(ambiguous, escalated):
+                if score is not None:
+                    scores[i] = score
+        return scores
+
+    async def _analyze_single(
+        self,
+        text: str,
+        image_data: bytes | list[bytes] = None,
+        start_tier: int = 0,
+        chat_id: int = None,
+        priority: int = PRIORITY_DEFAULT,
+    ) -> float | None:
+        """
+        Scores one message through the model cascade, starting at start_tier.
+        A tier's score is final unless it is ambiguous (close to SCAM_THRESHOLD)
+        or the tier failed, in which case the next tier is asked.
+        Returns None if no tier produced a score.
+        """
+        # The instructions travel as the system instruction, only the message is sent
+        contents = [
+            f"Message Text: {truncate_text(text)}" if text else "(Image only, no text)"
+        ]
 
-        if image_data:
+        contents.extend(await self._image_parts(image_data))
+
+        scam_score = None
+        last_tier = len(self.model_tiers) - 1
+        for index in range(start_tier, last_tier + 1):
+            tier = self.model_tiers[index]
             try:
-                # google-genai SDK handles PIL images
-                image = Image.open(io.BytesIO(image_data))
-                contents.append(image)
+                response_text = await self._generate_with_tier(
+                    tier, contents, chat_id=chat_id, priority=priority
+                )
+                if response_text:
+                    result = _extract_json(response_text, "{", "}")
+                    scam_score = float(result.get("scam", 0.0))
             except Exception as e:
-                logger.error(f"Error processing image: {e}")
-
-        # Configure safety settings
-        safety_settings = [
-            types.SafetySetting(
-                category=types.HarmCategory.HARM_CATEGORY_HARASSMENT,
-                threshold=types.HarmBlockThreshold.BLOCK_NONE,
-            ),
-            types.SafetySetting(
-                category=types.HarmCategory.HARM_CATEGORY_HATE_SPEECH,
-                threshold=types.HarmBlockThreshold.BLOCK_NONE,
-            ),
-            types.SafetySetting(
-                category=types.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
-                threshold=types.HarmBlockThreshold.BLOCK_NONE,
-            ),
-            types.SafetySetting(
-                category=types.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
-                threshold=types.HarmBlockThreshold.BLOCK_NONE,
-            ),
-        ]
+                logger.error(f"Error analyzing content with {tier['model']}: {e}")
 
-        config = types.GenerateContentConfig(safety_settings=safety_settings)
+            if index == last_tier:
+                break
+            if scam_score is not None and not self._is_ambiguous(scam_score):
+                break
+            logger.info(f"Escalating from {tier['model']} (Score: {scam_score})")
+            metrics.incr(f"gemini.escalations.{tier['model']}")
 
-        try:
-            # Use client.aio for async calls
-            response = await self.client.aio.models.generate_content(
-                model=self.model_name, contents=contents, config=config
-            )
+        return scam_score
 
-            if not response.text:
-                logger.warning("Gemini returned no text.")
-                return 0.0
+    @staticmethod
+    def _is_ambiguous(scam_score: float) -> bool:
+        return abs(scam_score - SCAM_THRESHOLD) <= GEMINI_ESCALATION_BAND
 
-            logger.info(f"Gemini Raw Response: {response.text}")
+    async def _generate_with_tier(
+        self,
+        tier: dict,
+        contents: list,
+        batch: bool = False,
+        chat_id: int = None,
+        priority: int = PRIORITY_DEFAULT,
+    ) -> str | None:
+        """
+        Calls one model tier with its timeout, recording latency metrics.
+        Waits for the rate scheduler first (not counted against the timeout);
+        a 429 pauses the scheduler and the request waits for its turn again.
+        Outcomes feed the circuit breaker.
+        """
+        model = tier["model"]
+        config = self.configs[model]["batch" if batch else "single"]
+        for attempt in range(GEMINI_RATE_LIMIT_RETRIES + 1):
+            try:
+                # Inside the try: a caller cancelled while queued must free the probe too
+                await self.scheduler.acquire(chat_id, priority)
+                metrics.incr(f"gemini.requests.{model}")
+                start = time.perf_counter()
+                response_text = await asyncio.wait_for(
+                    self._generate_hedged(contents, model, config, chat_id),
+                    timeout=tier["timeout"],
+                )
+                elapsed = time.perf_counter() - start
+                self.breaker.record_success(elapsed)
+                metrics.observe(f"gemini.latency.{model}", elapsed)
+                return response_text
+            except asyncio.TimeoutError:
+                metrics.incr(f"gemini.timeouts.{model}")
+                self.breaker.record_failure()
+                raise
+            except asyncio.CancelledError:
+                self.breaker.record_cancelled()
+                raise
+            except errors.APIError as e:
+                if e.code != 429 or attempt == GEMINI_RATE_LIMIT_RETRIES:
+                    self.breaker.record_failure()
+                    raise
+                metrics.incr(f"gemini.rate_limited.{model}")
+                self.scheduler.backoff(GEMINI_RATE_LIMIT_BACKOFF_SECONDS * 2**attempt)
+            except Exception:
+                self.breaker.record_failure()
+                raise
 
-            response_text = response.text.strip()
+    def _hedge_delay(self, model: str) -> float | None:
+        """The model's recent p95 latency, once there are enough samples."""
+        name = f"gemini.latency.{model}"
+        if not self.hedging or metrics.sample_count(name) < GEMINI_HEDGE_MIN_SAMPLES:
+            return None
+        return max(metrics.percentile(name, 95), GEMINI_HEDGE_MIN_DELAY_SECONDS)
 
-            # Robust JSON extraction
-            start_index = response_text.find("{")
-            end_index = response_text.rfind("}")
+    async def _generate_hedged(
+        self,
+        contents: list,
+        model: str,
+        config: types.GenerateContentConfig,
+        chat_id: int = None,
+    ) -> str | None:
+        """
+        Sends the request and, if it is slower than the model's p95 latency,
+        a duplicate (when the rate scheduler has a spare token). The first
+        successful answer wins, the other request is cancelled.
+        """
+        primary = asyncio.ensure_future(self._generate(contents, model, config))
+        primary.add_done_callback(_retrieve_exception)
+        hedge_delay = self._hedge_delay(model)
+        if hedge_delay is None:
+            return await primary
+
+        requests = [primary]
+        try:
+            done, _ = await asyncio.wait(requests, timeout=hedge_delay)
+            if not done and self.scheduler.try_acquire(chat_id):
+                metrics.incr(f"gemini.hedges.{model}")
+                hedge = asyncio.ensure_future(self._generate(contents, model, config))
+                hedge.add_done_callback(_retrieve_exception)
+                requests.append(hedge)
 
-            if start_index != -1 and end_index != -1:
-                response_text = response_text[start_index : end_index + 1]
+            pending = set(requests)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for request in done:
+                    if request.exception() is None:
+                        if request is not primary:
+                            metrics.incr(f"gemini.hedge_wins.{model}")
+                        return request.result()
+            # Every request failed
+            return primary.result()
+        finally:
+            for request in requests:
+                request.cancel()
 
-            result = json.loads(response_text)
-            return float(result.get("scam", 0.0))
+    async def _image_parts(self, image_data: bytes | list[bytes] | None) -> list:
+        """Image parts for one image or an album, skipping undecodable images."""
+        image_parts = await asyncio.gather(
+            *(self._image_part(image) for image in _as_image_list(image_data))
+        )
+        return [image_part for image_part in image_parts if image_part]
 
+    async def _image_part(self, image_data: bytes):
+        try:
+            # Decoding/downscaling is CPU-bound, keep it off the event loop
+            image_bytes, mime_type = await worker_pool.run(prepare_image, image_data)
+            return types.Part.from_bytes(data=image_bytes, mime_type=mime_type)
         except Exception as e:
-            logger.error(f"Error analyzing content with Gemini: {e}")
-            return 0.0
+            logger.error(f"Error processing image: {e}")
+            return None
+
+    async def _generate(
+        self, contents: list, model: str, config: types.GenerateContentConfig
+    ) -> str | None:
+        """Sends contents to Gemini and returns the stripped response text."""
+        # Use client.aio for async calls
+        response = await self.client.aio.models.generate_content(
+            model=model, contents=contents, config=config
+        )
+
+        if not response.text:
+            logger.warning("Gemini returned no text.")
+            return None
+
+        logger.info(f"Gemini Raw Response: {response.text}")
+        return response.text.strip()
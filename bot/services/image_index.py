@@ -0,0 +1,76 @@
+import io
+import logging
+from collections import OrderedDict
+from PIL import Image
+from config import SCAM_THRESHOLD, IMAGE_INDEX_MAX_SIZE, IMAGE_HASH_MAX_DISTANCE
+from bot.services.similarity_index import HammingIndex
+from bot.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DHASH_SIZE = 8
+
+
+def dhash(image_data: bytes) -> int:
+    """
+    64-bit difference hash: compares neighbouring pixels of a 9x8 grayscale
+    thumbnail, so re-encoded or resized copies hash to (nearly) the same value.
+    CPU-bound, run it in the worker pool.
+    """
+    with Image.open(io.BytesIO(image_data)) as image:
+        small = image.convert("L").resize(
+            (DHASH_SIZE + 1, DHASH_SIZE), Image.Resampling.LANCZOS
+        )
+        pixels = small.tobytes()
+
+    value = 0
+    for row in range(DHASH_SIZE):
+        offset = row * (DHASH_SIZE + 1)
+        for col in range(DHASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+class ImageVerdictIndex:
+    """
+    Remembers image verdicts by Telegram file_unique_id (exact reposts, no
+    download needed) and perceptual hashes of scam images (re-encoded copies).
+    """
+
+    def __init__(
+        self,
+        max_size: int = IMAGE_INDEX_MAX_SIZE,
+        max_distance: int = IMAGE_HASH_MAX_DISTANCE,
+    ):
+        self.max_size = max_size
+        self._by_file_id: OrderedDict[str, float] = OrderedDict()
+        self._scam_hashes = HammingIndex(max_distance, max_size)
+
+    def get(self, file_unique_id: str) -> float | None:
+        """Returns the recorded score for an exact image, or None."""
+        score = self._by_file_id.get(file_unique_id)
+        if score is None:
+            metrics.incr("image_index.file_id_miss")
+            return None
+        self._by_file_id.move_to_end(file_unique_id)
+        metrics.incr("image_index.file_id_hit")
+        return score
+
+    def match_scam(self, image_hash: int) -> float | None:
+        """Returns the score of a perceptually similar scam image, or None."""
+        result = self._scam_hashes.nearest(image_hash)
+        if result is None:
+            return None
+        distance, score = result
+        metrics.incr("image_index.hash_hit")
+        logger.info(f"Image matches known scam image (distance {distance}).")
+        return score
+
+    def record(self, file_unique_id: str, image_hash: int | None, score: float):
+        if file_unique_id:
+            self._by_file_id[file_unique_id] = score
+            self._by_file_id.move_to_end(file_unique_id)
+            while len(self._by_file_id) > self.max_size:
+                self._by_file_id.popitem(last=False)
+        if image_hash is not None and score > SCAM_THRESHOLD:
+            self._scam_hashes.add(image_hash, score)
@@ -1,10 +1,31 @@
 import logging
+import re
+from functools import lru_cache
 from lingua import Language, LanguageDetectorBuilder
+from config import (
+    LANGUAGE_CACHE_SIZE,
+    LANGUAGE_CONFIDENCE_MARGIN,
+    LANGUAGE_MAX_DETECT_CHARS,
+)
+from bot.services.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+_CYRILLIC = re.compile("[Ѐ-ӿ]")
+# Letters that exist in Ukrainian but not in Russian, and vice versa
+UKRAINIAN_ONLY_LETTERS = frozenset("іїєґ")
+RUSSIAN_ONLY_LETTERS = frozenset("ыэёъ")
+# Languages we treat as "Russian" (Bulgarian is often Russian misdetected)
+RUSSIAN_LIKE = (Language.RUSSIAN, Language.BULGARIAN)
+
+
+def _is_mostly_cyrillic(text: str) -> bool:
+    letters = sum(char.isalpha() for char in text)
+    return 2 * len(_CYRILLIC.findall(text)) > letters
+
+
 class LanguageService:
-    def __init__(self):
+    def __init__(self, preload: bool = False):
         # Initialize detector with relevant languages to improve accuracy
         languages = [
             Language.RUSSIAN, 
@@ -13,7 +34,58 @@ class LanguageService:
             Language.HEBREW,
             Language.BULGARIAN
         ]
-        self.detector = LanguageDetectorBuilder.from_languages(*languages).build()
+        fast_builder = LanguageDetectorBuilder.from_languages(
+            *languages
+        ).with_low_accuracy_mode()
+        full_builder = LanguageDetectorBuilder.from_languages(*languages)
+        if preload:
+            fast_builder = fast_builder.with_preloaded_language_models()
+            full_builder = full_builder.with_preloaded_language_models()
+        self.fast_detector = fast_builder.build()
+        self.detector = full_builder.build()
+        self._detect_cached = lru_cache(maxsize=LANGUAGE_CACHE_SIZE)(self._detect)
+
+    @staticmethod
+    def fast_path(text: str) -> bool | None:
+        """
+        Cheap character-class check.
+        Returns True/False when the script alone decides, None if lingua is needed.
+        """
+        if not _CYRILLIC.search(text):
+            return False
+
+        letters = set(text.casefold())
+        has_ukrainian = not UKRAINIAN_ONLY_LETTERS.isdisjoint(letters)
+        has_russian = not RUSSIAN_ONLY_LETTERS.isdisjoint(letters)
+        if has_ukrainian and not has_russian:
+            return False
+        # A Russian name in an English message is not a Russian message
+        if has_russian and not has_ukrainian and _is_mostly_cyrillic(text):
+            return True
+        return None
+
+    def _detect(self, text: str) -> bool:
+        """
+        Lingua tiers: the low accuracy model first, the full model only when the
+        low accuracy confidence is ambiguous (mostly short texts).
+        """
+        text = text[:LANGUAGE_MAX_DETECT_CHARS]
+
+        confidences = self.fast_detector.compute_language_confidence_values(text)
+        russian_confidence = sum(
+            c.value for c in confidences if c.language in RUSSIAN_LIKE
+        )
+        if russian_confidence >= 1 - LANGUAGE_CONFIDENCE_MARGIN:
+            metrics.incr("language.low_accuracy")
+            return True
+        if russian_confidence <= LANGUAGE_CONFIDENCE_MARGIN:
+            metrics.incr("language.low_accuracy")
+            return False
+
+        metrics.incr("language.full_model")
+        detected_language = self.detector.detect_language_of(text)
+        logger.info(f"Detected language: {detected_language}")
+        return detected_language in RUSSIAN_LIKE
 
     def is_russian(self, text: str) -> bool:
         """
@@ -21,17 +93,14 @@ class LanguageService:
         """
         if not text:
             return False
-            
+
         try:
-            detected_language = self.detector.detect_language_of(text)
-            logger.info(f"Detected language: {detected_language}")
-            
-            if detected_language == Language.RUSSIAN:
-                return True
-            if detected_language == Language.BULGARIAN:
-                return True
-                
-            return False
+            result = self.fast_path(text)
+            if result is not None:
+                metrics.incr("language.fast_path")
+                return result
+
+            return self._detect_cached(text)
         except Exception as e:
             logger.warning(f"Could not detect language: {e}")
             return False
@@ -0,0 +1,183 @@
+import logging
+from urllib.parse import urlsplit
+from telegram import Message, MessageEntity
+from config import LINK_BAD_MIN_BANS, LINK_GOOD_MIN_SAFE, TRUSTED_DOMAINS
+from db.async_core import get_link_reputations, get_link_bans, record_link_verdicts
+
+logger = logging.getLogger(__name__)
+
+LINK_ENTITY_TYPES = [MessageEntity.URL, MessageEntity.TEXT_LINK, MessageEntity.MENTION]
+
+# Suffixes under which names are registered one level deeper, a small
+# stand-in for the public suffix list covering the zones the bot sees.
+# Hosting platforms are included: their subdomains belong to different owners.
+MULTI_PART_SUFFIXES = frozenset(
+    {
+        "co.uk", "org.uk", "ac.uk", "gov.uk",
+        "com.ua", "net.ua", "org.ua", "in.ua", "kiev.ua", "kyiv.ua", "gov.ua",
+        "com.ru", "net.ru", "org.ru", "msk.ru", "spb.ru",
+        "co.il", "org.il", "ac.il", "gov.il",
+        "com.au", "com.br", "com.tr", "co.in", "co.jp", "com.cn",
+        "github.io", "blogspot.com", "netlify.app", "vercel.app", "pages.dev",
+        "web.app", "firebaseapp.com", "herokuapp.com", "glitch.me",
+    }
+)
+
+TELEGRAM_HOSTS = frozenset({"t.me", "telegram.me", "telegram.dog"})
+# t.me paths that are not a user, bot or channel name
+TELEGRAM_RESERVED_PATHS = frozenset({"c", "s", "share", "addstickers", "addemoji", "proxy", "socks"})
+
+GOOD = "good"
+BAD = "bad"
+
+# Keys that ban without Gemini once bad. Handles are often mentioned in scams
+# without belonging to the scammer (admins, exchanges), so a bad handle only
+# moves its messages to the front of the Gemini queue.
+BANNABLE_KEY_KINDS = ("domain:", "invite:")
+
+
+def registered_domain(host: str) -> str:
+    """Approximate eTLD+1 of a host name (sub.example.co.uk -> example.co.uk)."""
+    labels = host.strip(".").lower().split(".")
+    if len(labels) <= 2 or labels[-1].isdigit():
+        return ".".join(labels)
+    suffix_labels = 2 if ".".join(labels[-2:]) in MULTI_PART_SUFFIXES else 1
+    return ".".join(labels[-(suffix_labels + 1) :])
+
+
+def link_key(url: str) -> str | None:
+    """
+    Reputation key of a link: "domain:<eTLD+1>", or for Telegram links
+    "handle:<name>" / "invite:<code>" (t.me itself says nothing).
+    """
+    if "://" not in url:
+        url = f"http://{url}"
+    try:
+        parts = urlsplit(url)
+        host = parts.hostname
+    except ValueError:
+        return None
+    if not host:
+        return None
+
+    if host.removeprefix("www.") not in TELEGRAM_HOSTS:
+        return f"domain:{registered_domain(host)}"
+
+    path = [segment for segment in parts.path.split("/") if segment]
+    if not path or path[0].lower() in TELEGRAM_RESERVED_PATHS:
+        return None
+    if path[0].startswith("+"):
+        return f"invite:{path[0][1:]}"
+    if path[0] == "joinchat":
+        return f"invite:{path[1]}" if len(path) > 1 else None
+    return f"handle:{path[0].lower()}"
+
+
+def extract_link_keys(message: Message) -> set[str]:
+    """Reputation keys of the links, text links and @mentions in a message or caption."""
+    if message.text:
+        entities = message.parse_entities(LINK_ENTITY_TYPES)
+    elif message.caption:
+        entities = message.parse_caption_entities(LINK_ENTITY_TYPES)
+    else:
+        return set()
+
+    keys = set()
+    for entity, text in entities.items():
+        if entity.type == MessageEntity.MENTION:
+            keys.add(f"handle:{text.lstrip('@').lower()}")
+            continue
+        key = link_key(entity.url if entity.type == MessageEntity.TEXT_LINK else text)
+        if key:
+            keys.add(key)
+    return keys
+
+
+class LinkReputationIndex:
+    """
+    In-memory ban/safe counts and banned users per link key, persisted in
+    the LinkReputation and LinkBan tables. A key is bad after bans of
+    LINK_BAD_MIN_BANS distinct users outnumbering its safe verdicts (one
+    scammer repeating a link doesn't make it bad), good after
+    LINK_GOOD_MIN_SAFE safe verdicts and no bans.
+    TRUSTED_DOMAINS (and their subdomains) are always good.
+    """
+
+    def __init__(
+        self,
+        trusted_domains: list[str] = TRUSTED_DOMAINS,
+        min_bans: int = LINK_BAD_MIN_BANS,
+        min_safe: int = LINK_GOOD_MIN_SAFE,
+    ):
+        self.trusted_domains = frozenset(trusted_domains)
+        self.min_bans = min_bans
+        self.min_safe = min_safe
+        # key -> [bans, safe]
+        self._counts: dict[str, list[int]] = {}
+        # key -> ids of the users banned for it
+        self._banned_users: dict[str, set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def _is_trusted(self, key: str) -> bool:
+        if not key.startswith("domain:"):
+            return False
+        labels = key[len("domain:") :].split(".")
+        return any(".".join(labels[i:]) in self.trusted_domains for i in range(len(labels)))
+
+    def reputation(self, key: str) -> str | None:
+        if self._is_trusted(key):
+            return GOOD
+        bans, safe = self._counts.get(key, (0, 0))
+        banned_users = len(self._banned_users.get(key, ()))
+        if banned_users >= self.min_bans and banned_users > safe:
+            return BAD
+        if safe >= self.min_safe and not bans:
+            return GOOD
+        return None
+
+    def bad_links(self, keys) -> list[str]:
+        """Bad domains and invite links, the keys that ban on their own."""
+        return sorted(
+            key
+            for key in keys
+            if key.startswith(BANNABLE_KEY_KINDS) and self.reputation(key) == BAD
+        )
+
+    def any_bad(self, keys) -> bool:
+        """True if any key, handles included, is bad."""
+        return any(self.reputation(key) == BAD for key in keys)
+
+    def all_good(self, keys) -> bool:
+        """True if there are links and every one of them is known-good."""
+        return bool(keys) and all(self.reputation(key) == GOOD for key in keys)
+
+    def record(self, keys, banned: bool, user_id: int = None):
+        for key in keys:
+            counts = self._counts.setdefault(key, [0, 0])
+            counts[0 if banned else 1] += 1
+            if banned and user_id is not None:
+                self._banned_users.setdefault(key, set()).add(user_id)
+
+    async def learn(self, keys, banned: bool, user_id: int = None):
+        """Counts a ban of user_id (or a safe verdict) for every key, in memory and in the DB."""
+        if not keys:
+            return
+        self.record(keys, banned, user_id)
+        await record_link_verdicts(sorted(keys), banned, user_id)
+
+    async def warm_up(self):
+        """
+        Loads the persisted counts (startup). Bans recorded before the banned
+        users were kept still stop a link from turning good, but not count
+        towards turning it bad.
+        """
+        self._counts = {key: [bans, safe] for key, bans, safe in await get_link_reputations()}
+        self._banned_users = {}
+        for key, user_id in await get_link_bans():
+            self._banned_users.setdefault(key, set()).add(user_id)
+        logger.info(f"Loaded reputation of {len(self._counts)} links.")
+
+
+link_reputation = LinkReputationIndex()
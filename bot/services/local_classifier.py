@@ -0,0 +1,153 @@
+import json
+import logging
+import math
+import os
+import random
+import re
+import unicodedata
+import zlib
+from array import array
+from config import (
+    SCAM_THRESHOLD,
+    LOCAL_CLASSIFIER_PATH,
+    LOCAL_CLASSIFIER_FEATURE_BITS,
+    LOCAL_CLASSIFIER_MAX_CHARS,
+)
+
+logger = logging.getLogger(__name__)
+
+NGRAM_SIZES = (2, 3, 4)
+
+_DIGITS = re.compile(r"\d")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    NFKC + case folding, digits collapsed to 0 (amounts vary, their presence
+    doesn't) and whitespace collapsed. Punctuation, $, @ and links are kept.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = _DIGITS.sub("0", text)
+    return _SPACES.sub(" ", text).strip()[:LOCAL_CLASSIFIER_MAX_CHARS]
+
+
+def extract_features(text: str, bits: int = LOCAL_CLASSIFIER_FEATURE_BITS) -> set[int]:
+    """Hashed character n-grams (presence only) of the normalized text."""
+    normalized = f" {normalize_text(text)} ".encode()
+    mask = (1 << bits) - 1
+    features = set()
+    for size in NGRAM_SIZES:
+        for i in range(len(normalized) - size + 1):
+            features.add(zlib.crc32(normalized[i : i + size]) & mask)
+    return features
+
+
+def _sigmoid(z: float) -> float:
+    if z < -30:
+        return 0.0
+    if z > 30:
+        return 1.0
+    return 1 / (1 + math.exp(-z))
+
+
+class LocalClassifier:
+    """
+    Logistic regression over hashed character n-grams, trained offline from
+    logged verdicts (see train_classifier.py). Scores a message in well under
+    a millisecond, so confident cases skip the Gemini call.
+    """
+
+    def __init__(self, bits: int = LOCAL_CLASSIFIER_FEATURE_BITS):
+        self.bits = bits
+        self.weights = array("f", bytes(4 << bits))
+        self.bias = 0.0
+        self.loaded = False
+
+    def predict(self, text: str) -> float:
+        """Scam probability between 0.0 and 1.0."""
+        weights = self.weights
+        z = self.bias + sum(weights[f] for f in extract_features(text, self.bits))
+        return _sigmoid(z)
+
+    def train(
+        self,
+        samples: list[tuple[str, int]],
+        epochs: int = 8,
+        learning_rate: float = 0.2,
+        l2: float = 1e-5,
+        seed: int = 0,
+    ):
+        """SGD on (text, label) samples, classes weighted to balance scam/safe."""
+        data = [(extract_features(text, self.bits), label) for text, label in samples]
+        positives = sum(label for _, label in data) or 1
+        negatives = (len(data) - positives) or 1
+        class_weight = {1: len(data) / (2 * positives), 0: len(data) / (2 * negatives)}
+
+        weights = self.weights
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            rate = learning_rate / (1 + epoch)
+            for features, label in data:
+                z = self.bias + sum(weights[f] for f in features)
+                gradient = (_sigmoid(z) - label) * class_weight[label]
+                for f in features:
+                    weights[f] -= rate * (gradient + l2 * weights[f])
+                self.bias -= rate * gradient
+        self.loaded = True
+        return self
+
+    def save(self, path: str = LOCAL_CLASSIFIER_PATH):
+        # Only non-zero weights, keyed by feature index
+        model = {
+            "bits": self.bits,
+            "ngram_sizes": list(NGRAM_SIZES),
+            "bias": self.bias,
+            "weights": {str(i): w for i, w in enumerate(self.weights) if w},
+        }
+        with open(path, "w") as f:
+            json.dump(model, f)
+
+    def load(self, path: str = LOCAL_CLASSIFIER_PATH) -> bool:
+        """Loads a trained model. Returns False if there is none (or it is broken)."""
+        if not os.path.exists(path):
+            logger.info(f"No local classifier model at {path}.")
+            return False
+        try:
+            with open(path) as f:
+                model = json.load(f)
+            self.bits = model["bits"]
+            self.weights = array("f", bytes(4 << self.bits))
+            for index, weight in model["weights"].items():
+                self.weights[int(index)] = weight
+            self.bias = model["bias"]
+            self.loaded = True
+            logger.info(f"Loaded local classifier from {path}.")
+            return True
+        except Exception as e:
+            logger.error(f"Error loading local classifier: {e}")
+            return False
+
+
+def build_dataset(verdicts: list[dict], include_local: bool = False) -> list[tuple[str, int]]:
+    """
+    Turns logged Verdict rows into (text, label) samples, one per
+    (chat, user, text). An explicit label (bans, admin /ban_user and
+    /unban_user) wins over a Gemini score; later labels win over earlier ones.
+    Bans made by the local classifier itself are skipped unless include_local,
+    so the model doesn't learn from its own decisions.
+    """
+    samples: dict[tuple, tuple[int, bool]] = {}
+    for verdict in verdicts:
+        if not verdict["text"] or (verdict["source"] == "local" and not include_local):
+            continue
+        key = (verdict["chat_id"], verdict["user_id"], verdict["text"])
+        if verdict["label"] is not None:
+            samples[key] = (verdict["label"], True)
+        elif verdict["score"] is not None and not samples.get(key, (0, False))[1]:
+            samples[key] = (int(verdict["score"] > SCAM_THRESHOLD), False)
+    return [(key[2], label) for key, (label, _) in samples.items()]
+
+
+local_classifier = LocalClassifier()
@@ -0,0 +1,84 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Number of recent samples kept per timing for percentile estimates
+TIMING_WINDOW = 500
+
+
+class Metrics:
+    """
+    In-process counters, gauges and timings.
+    Exposed to the admin through the /metrics command.
+    """
+
+    def __init__(self):
+        self.counters: dict[str, int] = {}
+        self.gauges: dict[str, float] = {}
+        self.timings: dict[str, deque] = {}
+
+    def incr(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float):
+        self.gauges[name] = value
+
+    def observe(self, name: str, seconds: float):
+        samples = self.timings.get(name)
+        if samples is None:
+            samples = self.timings[name] = deque(maxlen=TIMING_WINDOW)
+        samples.append(seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def sample_count(self, name: str) -> int:
+        return len(self.timings.get(name, ()))
+
+    def percentile(self, name: str, pct: float) -> float | None:
+        """Returns the given percentile (0-100) of the recent samples, or None."""
+        samples = self.timings.get(name)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+        return ordered[index]
+
+    def snapshot(self) -> dict:
+        timings = {}
+        for name, samples in self.timings.items():
+            if samples:
+                timings[name] = {
+                    "count": len(samples),
+                    "p50": self.percentile(name, 50),
+                    "p95": self.percentile(name, 95),
+                    "max": max(samples),
+                }
+        return {
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+            "timings": timings,
+        }
+
+    def format(self) -> str:
+        """Renders the snapshot as plain text for Telegram."""
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"{name}: {value}")
+        for name, value in sorted(snapshot["gauges"].items()):
+            lines.append(f"{name}: {value:g}")
+        for name, t in sorted(snapshot["timings"].items()):
+            lines.append(
+                f"{name}: n={t['count']} p50={t['p50'] * 1000:.1f}ms "
+                f"p95={t['p95'] * 1000:.1f}ms max={t['max'] * 1000:.1f}ms"
+            )
+        return "\n".join(lines) or "No metrics recorded yet."
+
+
+metrics = Metrics()
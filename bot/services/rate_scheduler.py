@@ -0,0 +1,185 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from config import (
+    GEMINI_GLOBAL_RATE,
+    GEMINI_GLOBAL_BURST,
+    GEMINI_CHAT_RATE,
+    GEMINI_CHAT_BURST,
+)
+from bot.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Lower value = served first
+PRIORITY_NEW_USER = 0  # first messages of untrusted users
+PRIORITY_DEFAULT = 1
+PRIORITY_TRUSTED = 2  # language re-checks of older members
+
+# Idle per-chat buckets are dropped once there are more than this many
+MAX_CHAT_BUCKETS = 10000
+
+
+class TokenBucket:
+    """Refills rate tokens per second up to capacity."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def drain(self, now: float, seconds: float):
+        """Empties the bucket so the next token arrives only after seconds."""
+        self._refill(now)
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class RateScheduler:
+    """
+    Admission control for Gemini calls: a global token bucket (the API quota)
+    and one bucket per chat (a flooded chat can't starve the others).
+    Callers wait in a priority queue instead of failing; among waiting
+    requests the best priority whose chat has a token goes first, FIFO within
+    a priority.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = GEMINI_GLOBAL_RATE,
+        global_burst: float = GEMINI_GLOBAL_BURST,
+        chat_rate: float = GEMINI_CHAT_RATE,
+        chat_burst: float = GEMINI_CHAT_BURST,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._chat_buckets: dict[int, TokenBucket] = {}
+        # (priority, sequence, chat_id, enqueued_at, future)
+        self._queue: list = []
+        self._sequence = itertools.count()
+        self._dispatcher: asyncio.Task = None
+        self._wakeup: asyncio.Event = None
+
+    async def acquire(self, chat_id: int = None, priority: int = PRIORITY_DEFAULT):
+        """Waits until a request for chat_id may be sent (chat_id None = global only)."""
+        now = time.monotonic()
+        if not self._queue and self._wait_time(chat_id, now) == 0:
+            self._take(chat_id, now)
+            metrics.observe("rate_scheduler.wait", 0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._queue, (priority, next(self._sequence), chat_id, now, future)
+        )
+        metrics.set_gauge("rate_scheduler.queue_depth", len(self._queue))
+        self._ensure_dispatcher()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Let the dispatcher drop the entry (and stop if nothing else waits)
+            self._wakeup.set()
+            raise
+
+    def try_acquire(self, chat_id: int = None) -> bool:
+        """Takes a token only if one is free right now and nobody is waiting."""
+        now = time.monotonic()
+        if self._queue or self._wait_time(chat_id, now) > 0:
+            return False
+        self._take(chat_id, now)
+        return True
+
+    def backoff(self, seconds: float):
+        """Pauses all admissions (the API answered 429)."""
+        logger.warning(f"Gemini rate limited. Pausing requests for {seconds:.1f}s.")
+        metrics.incr("rate_scheduler.backoffs")
+        self.global_bucket.drain(time.monotonic(), seconds)
+
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= MAX_CHAT_BUCKETS:
+                now = time.monotonic()
+                self._chat_buckets = {
+                    key: value
+                    for key, value in self._chat_buckets.items()
+                    if not value.is_full(now)
+                }
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _wait_time(self, chat_id: int, now: float) -> float:
+        wait = self.global_bucket.wait_time(now)
+        if chat_id is not None:
+            wait = max(wait, self._chat_bucket(chat_id).wait_time(now))
+        return wait
+
+    def _take(self, chat_id: int, now: float):
+        self.global_bucket.take(now)
+        if chat_id is not None:
+            self._chat_bucket(chat_id).take(now)
+
+    def _ensure_dispatcher(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def _dispatch(self):
+        while self._queue:
+            self._wakeup.clear()
+            now = time.monotonic()
+            # Callers that gave up (cancelled) don't consume tokens
+            self._queue = [entry for entry in self._queue if not entry[4].done()]
+            heapq.heapify(self._queue)
+
+            delay = self.global_bucket.wait_time(now)
+            if delay == 0 and self._queue:
+                delay = None
+                for entry in sorted(self._queue):
+                    priority, _, chat_id, enqueued_at, future = entry
+                    chat_wait = self._wait_time(chat_id, now)
+                    if chat_wait == 0:
+                        self._queue.remove(entry)
+                        heapq.heapify(self._queue)
+                        self._take(chat_id, now)
+                        metrics.observe("rate_scheduler.wait", now - enqueued_at)
+                        future.set_result(None)
+                        delay = 0
+                        break
+                    delay = chat_wait if delay is None else min(delay, chat_wait)
+            metrics.set_gauge("rate_scheduler.queue_depth", len(self._queue))
+
+            if delay:
+                # New arrivals may fit earlier (e.g. a chat with tokens left)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
@@ -0,0 +1,303 @@
+import asyncio
+import logging
+import os
+import re
+import unicodedata
+from collections import deque
+from config import SCAM_THRESHOLD, RULES_PATH, RULES_RELOAD_INTERVAL_SECONDS
+from bot.services.metrics import metrics
+from bot.services.worker_pool import worker_pool
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+logger = logging.getLogger(__name__)
+
+# Telegram messages are at most 4096 characters; anything longer is cut
+MAX_RULE_TEXT_CHARS = 4096
+
+_ZERO_WIDTH = re.compile("[\u00ad\u180e\u200b-\u200f\u202a-\u202e\u2060-\u2064\ufeff]")
+_SPACES = re.compile(r"\s+")
+
+# Cyrillic and Greek letters that look like Latin ones. Phrase rules and
+# text are both folded, so mixed-script spellings (e.g. "UЅDТ" with
+# Cyrillic letters) match the plain phrase in either script.
+_HOMOGLYPHS = str.maketrans(
+    {
+        "а": "a", "в": "b", "е": "e", "ё": "e", "к": "k", "м": "m", "н": "h",
+        "о": "o", "р": "p", "с": "c", "т": "t", "у": "y", "х": "x", "і": "i",
+        "ї": "i", "ј": "j", "ѕ": "s", "ԁ": "d", "ԛ": "q", "ԝ": "w", "һ": "h",
+        "α": "a", "β": "b", "ε": "e", "ι": "i", "κ": "k", "ν": "v", "ο": "o",
+        "ρ": "p", "τ": "t", "υ": "u", "χ": "x",
+    }
+)
+
+
+def normalize_text(text: str) -> str:
+    """NFKC, zero-width/bidi control stripping, case folding, collapsed whitespace."""
+    text = unicodedata.normalize("NFKC", text[:MAX_RULE_TEXT_CHARS])
+    text = _ZERO_WIDTH.sub("", text).casefold()
+    return _SPACES.sub(" ", text).strip()
+
+
+def fold_homoglyphs(normalized: str) -> str:
+    return normalized.translate(_HOMOGLYPHS)
+
+
+# Case-insensitive regex matching pairs "i" with the dotless "ı", which case
+# folding keeps apart; regex anchors and the text they are looked up in both
+# use "i"
+_DOTLESS_I = str.maketrans("ı", "i")
+
+
+def _compile_regex(pattern: str) -> re.Pattern:
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def _required_literals(parsed) -> list[str]:
+    """Literal strings that every match of a parsed regex contains."""
+    literals, run = [], ""
+    for op, arg in parsed:
+        char = chr(arg).casefold() if op is sre_parse.LITERAL else ""
+        if len(char) == 1:
+            run += char
+            continue
+        literals.append(run)
+        run = ""
+        if op is sre_parse.SUBPATTERN and not arg[1] and not arg[2]:
+            literals.extend(_required_literals(arg[3]))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and arg[0] >= 1:
+            literals.extend(_required_literals(arg[2]))
+    literals.append(run)
+    return literals
+
+
+def literal_anchor(regex: re.Pattern) -> str:
+    """
+    The longest literal every match of regex contains, for looking it up in
+    normalized text ("" if there is none). Alternations and optional parts
+    are not searched.
+    """
+    literals = _required_literals(sre_parse.parse(regex.pattern, regex.flags))
+    return max(literals, key=len).translate(_DOTLESS_I)
+
+
+class AhoCorasick:
+    """
+    Multi-pattern substring matcher: one pass over the text finds every
+    occurrence of every pattern, however many patterns there are.
+    """
+
+    def __init__(self, patterns: list[tuple[str, object]]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list] = [[]]
+        for pattern, value in patterns:
+            if pattern:
+                self._insert(pattern, value)
+        self._build_failure_links()
+
+    def _insert(self, pattern: str, value):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append(value)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                # Patterns ending at the fallback state also end here
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def find(self, text: str):
+        """Yields the value of every pattern occurrence in text."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                yield from out[state]
+
+
+class Rule:
+    def __init__(self, kind: str, score: float, pattern: str, line: int):
+        self.kind = kind
+        self.score = score
+        self.pattern = pattern
+        self.line = line
+
+    def __repr__(self) -> str:
+        return f"{self.kind}:{self.line} {self.pattern!r}"
+
+
+class CompiledRules:
+    """
+    All phrase rules in one automaton. Regex rules are compiled one by one;
+    a second automaton over their literal anchors picks the few regexes
+    that can match a text, only rules without an anchor always run.
+    """
+
+    def __init__(self, rules: list[Rule]):
+        self.rules = rules
+        phrases = [rule for rule in rules if rule.kind == "phrase"]
+        self.automaton = AhoCorasick(
+            [(fold_homoglyphs(normalize_text(rule.pattern)), rule) for rule in phrases]
+        )
+        self.regexes = [
+            (rule, _compile_regex(rule.pattern)) for rule in rules if rule.kind == "regex"
+        ]
+        anchors = [(literal_anchor(regex), i) for i, (_, regex) in enumerate(self.regexes)]
+        self.anchors = AhoCorasick(anchors)
+        self.unanchored = [i for i, (anchor, _) in enumerate(anchors) if not anchor]
+
+    def match(self, text: str) -> Rule | None:
+        """Returns the highest scoring rule matching text, or None."""
+        normalized = normalize_text(text)
+        best = None
+        for rule in self.automaton.find(fold_homoglyphs(normalized)):
+            if best is None or rule.score > best.score:
+                best = rule
+        candidates = set(self.anchors.find(normalized.translate(_DOTLESS_I)))
+        candidates.update(self.unanchored)
+        for i in sorted(candidates):
+            rule, regex = self.regexes[i]
+            if (best is None or rule.score > best.score) and regex.search(normalized):
+                best = rule
+        return best
+
+
+def parse_rules(lines) -> list[Rule]:
+    """
+    Parses the rules file. One rule per line: <kind> <score> <pattern>
+    kind is "phrase" (substring, matched after normalization and homoglyph
+    folding) or "regex" (matched after normalization, without folding).
+    Blank lines and lines starting with # are ignored; invalid lines are
+    logged and skipped.
+    """
+    rules = []
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = line.split(None, 2)
+        try:
+            kind, score, pattern = parts[0], float(parts[1]), parts[2]
+            if kind not in ("phrase", "regex"):
+                raise ValueError(f"unknown rule kind {kind!r}")
+            if kind == "regex":
+                _compile_regex(pattern)
+        except (IndexError, ValueError, re.error) as e:
+            logger.error(f"Skipping invalid rule on line {number}: {e}")
+            continue
+        rules.append(Rule(kind, score, pattern, number))
+    return rules
+
+
+def compile_rules_file(path: str) -> CompiledRules:
+    with open(path, encoding="utf-8") as f:
+        return CompiledRules(parse_rules(f))
+
+
+class RuleEngine:
+    """
+    Hard scam rules from RULES_PATH, reloaded when the file changes.
+    A match scoring above SCAM_THRESHOLD is a scam verdict; lower scoring
+    rules only count their hits (to try a rule out before enforcing it).
+    """
+
+    def __init__(self, path: str = RULES_PATH):
+        self.path = path
+        self.compiled = CompiledRules([])
+        self._mtime: float = None
+        self._reloader: asyncio.Task = None
+
+    def _changed_mtime(self) -> float | None:
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return None
+        return mtime if mtime != self._mtime else None
+
+    def _swap(self, compiled: CompiledRules, mtime: float):
+        self.compiled = compiled
+        self._mtime = mtime
+        metrics.set_gauge("rules.count", len(compiled.rules))
+        # Regex rules without a literal anchor run on every message
+        metrics.set_gauge("rules.unanchored", len(compiled.unanchored))
+        logger.info(f"Loaded {len(compiled.rules)} scam rules from {self.path}.")
+
+    def load(self):
+        """Compiles the rules file now (startup)."""
+        mtime = self._changed_mtime()
+        if mtime is None:
+            return
+        try:
+            self._swap(compile_rules_file(self.path), mtime)
+        except Exception as e:
+            logger.error(f"Error loading scam rules: {e}")
+
+    async def reload_if_changed(self):
+        """Recompiles in the worker pool if the file changed; matching continues on the old rules meanwhile."""
+        mtime = self._changed_mtime()
+        if mtime is None:
+            return
+        try:
+            self._swap(await worker_pool.run(compile_rules_file, self.path), mtime)
+        except Exception as e:
+            # Keep the old rules, try again on the next change
+            self._mtime = mtime
+            logger.error(f"Error reloading scam rules: {e}")
+
+    def match(self, text: str) -> Rule | None:
+        """Returns the highest scoring matching rule above SCAM_THRESHOLD, or None."""
+        rule = self.compiled.match(text)
+        if rule is None:
+            return None
+        if rule.score <= SCAM_THRESHOLD:
+            metrics.incr("rules.shadow_hit")
+            logger.info(f"Shadow rule {rule} matched (Score: {rule.score}).")
+            return None
+        metrics.incr("rules.hit")
+        return rule
+
+    async def _reload_periodically(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            await self.reload_if_changed()
+
+    def start_reloader(self, interval: float = RULES_RELOAD_INTERVAL_SECONDS):
+        if self._reloader is None or self._reloader.done():
+            self._reloader = asyncio.create_task(self._reload_periodically(interval))
+
+    async def stop_reloader(self):
+        if self._reloader is not None:
+            self._reloader.cancel()
+            try:
+                await self._reloader
+            except asyncio.CancelledError:
+                pass
+            self._reloader = None
+
+
+rule_engine = RuleEngine()
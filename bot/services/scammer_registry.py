@@ -0,0 +1,80 @@
+import hashlib
+import logging
+import math
+from config import SCAMMER_BLOOM_CAPACITY, SCAMMER_BLOOM_ERROR_RATE
+from bot.services.metrics import metrics
+from db.async_core import add_scammer, remove_scammer, is_scammer, get_scammer_ids
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Set membership in a fixed bit array: no false negatives, false positives
+    at about error_rate while at most capacity items are added.
+    A million user ids at 0.1% take under 2 MB.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: int):
+        # Double hashing: k positions from two independent 64-bit hashes
+        digest = hashlib.blake2b(item.to_bytes(8, "little", signed=True), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: int):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: int) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+
+class ScammerRegistry:
+    """
+    Users banned as scammers in any chat, persisted in the Scammer table.
+    The Bloom filter answers "never banned" without touching the DB; its
+    hits are confirmed against the table, which also covers the filter's
+    false positives and users removed by /unban_user (bits can't be cleared).
+    """
+
+    def __init__(
+        self, capacity: int = SCAMMER_BLOOM_CAPACITY, error_rate: float = SCAMMER_BLOOM_ERROR_RATE
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bloom = BloomFilter(capacity, error_rate)
+
+    async def warm_up(self):
+        """Builds the filter from the persisted scammers (startup)."""
+        user_ids = await get_scammer_ids()
+        # Past capacity the false positive rate grows, leave room to double
+        bloom = BloomFilter(max(self.capacity, 2 * len(user_ids)), self.error_rate)
+        for user_id in user_ids:
+            bloom.add(user_id)
+        self.bloom = bloom
+        logger.info(f"Loaded {len(user_ids)} known scammers.")
+
+    async def is_scammer(self, user_id: int) -> bool:
+        if user_id not in self.bloom:
+            return False
+        confirmed = await is_scammer(user_id)
+        metrics.incr(f"scammer_registry.{'confirmed' if confirmed else 'false_positive'}")
+        return confirmed
+
+    async def add(self, user_id: int, chat_id: int, reason: str = None):
+        self.bloom.add(user_id)
+        await add_scammer(user_id, chat_id, reason)
+
+    async def remove(self, user_id: int):
+        await remove_scammer(user_id)
+
+
+scammer_registry = ScammerRegistry()
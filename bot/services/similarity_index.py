@@ -0,0 +1,162 @@
+import hashlib
+import logging
+import re
+import unicodedata
+from collections import OrderedDict
+from config import (
+    SCAM_INDEX_MAX_SIZE,
+    SCAM_SIMILARITY_MAX_DISTANCE,
+    SCAM_INDEX_MIN_LENGTH,
+)
+from bot.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_BITS = 64
+SHINGLE_SIZE = 4
+# Longer texts add little signal but cost hashing time
+MAX_FEATURE_CHARS = 2000
+
+_NON_LETTERS = re.compile(r"[\W\d_]+", re.UNICODE)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes text for template matching: NFKC, case folding, and dropping
+    digits, punctuation and emojis (the parts spammers usually vary).
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _NON_LETTERS.sub(" ", text).strip()
+
+
+def simhash(text: str) -> int | None:
+    """
+    Computes a 64-bit SimHash over character shingles of the normalized text.
+    Returns None if the text is too short to fingerprint reliably.
+    """
+    normalized = normalize_text(text)[:MAX_FEATURE_CHARS]
+    if len(normalized) < SCAM_INDEX_MIN_LENGTH:
+        return None
+
+    shingles = {
+        normalized[i : i + SHINGLE_SIZE]
+        for i in range(len(normalized) - SHINGLE_SIZE + 1)
+    }
+    # Bit strings let zip()/count() do the per-bit voting in C
+    bits = [
+        format(
+            int.from_bytes(
+                hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big"
+            ),
+            "064b",
+        )
+        for s in shingles
+    ]
+    threshold = len(bits) / 2
+    fingerprint = 0
+    for i, column in enumerate(zip(*bits)):
+        if column.count("1") > threshold:
+            fingerprint |= 1 << (FINGERPRINT_BITS - 1 - i)
+    return fingerprint
+
+
+class HammingIndex:
+    """
+    Bounded index of 64-bit fingerprints supporting "any stored fingerprint
+    within max_distance bits" lookups.
+
+    Fingerprints are split into max_distance + 1 bands; by the pigeonhole
+    principle a match shares at least one band exactly, so a lookup only
+    compares against the few fingerprints in the matching band buckets.
+    Oldest entries are evicted once max_size is reached.
+    """
+
+    def __init__(self, max_distance: int, max_size: int):
+        self.max_distance = max_distance
+        self.max_size = max_size
+        band_count = max_distance + 1
+        band_width = -(-FINGERPRINT_BITS // band_count)
+        self._bands = [
+            (shift, (1 << min(band_width, FINGERPRINT_BITS - shift)) - 1)
+            for shift in range(0, FINGERPRINT_BITS, band_width)
+        ]
+        self._tables: list[dict[int, set[int]]] = [{} for _ in self._bands]
+        self._entries: OrderedDict[int, float] = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, fingerprint: int, value: float):
+        if fingerprint in self._entries:
+            self._entries[fingerprint] = max(self._entries[fingerprint], value)
+            self._entries.move_to_end(fingerprint)
+            return
+
+        self._entries[fingerprint] = value
+        for table, (shift, mask) in zip(self._tables, self._bands):
+            table.setdefault((fingerprint >> shift) & mask, set()).add(fingerprint)
+
+        while len(self._entries) > self.max_size:
+            old, _ = self._entries.popitem(last=False)
+            self._discard(old)
+
+    def _discard(self, fingerprint: int):
+        for table, (shift, mask) in zip(self._tables, self._bands):
+            key = (fingerprint >> shift) & mask
+            bucket = table.get(key)
+            if bucket is not None:
+                bucket.discard(fingerprint)
+                if not bucket:
+                    del table[key]
+
+    def nearest(self, fingerprint: int) -> tuple[int, float] | None:
+        """Returns (distance, value) of the closest fingerprint within range, or None."""
+        best = None
+        for table, (shift, mask) in zip(self._tables, self._bands):
+            bucket = table.get((fingerprint >> shift) & mask)
+            if not bucket:
+                continue
+            for candidate in bucket:
+                distance = (candidate ^ fingerprint).bit_count()
+                if distance <= self.max_distance and (
+                    best is None or distance < best[0]
+                ):
+                    best = (distance, self._entries[candidate])
+                    if distance == 0:
+                        return best
+        return best
+
+
+class ScamTemplateIndex:
+    """
+    Near-duplicate index of texts already scored above SCAM_THRESHOLD.
+    Catches scam copies where only a few characters, emojis or amounts differ.
+    """
+
+    def __init__(
+        self,
+        max_distance: int = SCAM_SIMILARITY_MAX_DISTANCE,
+        max_size: int = SCAM_INDEX_MAX_SIZE,
+    ):
+        self.index = HammingIndex(max_distance, max_size)
+
+    def add(self, text: str, score: float):
+        fingerprint = simhash(text) if text else None
+        if fingerprint is None:
+            return
+        self.index.add(fingerprint, score)
+        metrics.set_gauge("scam_index.size", len(self.index))
+
+    def match(self, text: str) -> float | None:
+        """Returns the score of a near-identical known scam, or None."""
+        fingerprint = simhash(text) if text else None
+        if fingerprint is None:
+            return None
+        result = self.index.nearest(fingerprint)
+        if result is None:
+            metrics.incr("scam_index.miss")
+            return None
+        distance, score = result
+        metrics.incr("scam_index.hit")
+        logger.info(f"Near-duplicate scam template match (distance {distance}).")
+        return score
@@ -3,7 +3,8 @@ import logging
 from telegram.ext import ContextTypes
 from telegram.constants import ChatMemberStatus
 from config import NEW_USER_THRESHOLD_DAYS
-from db.core import get_user, add_user, set_user_safe
+from db.async_core import get_user, add_user, set_user_safe
+from db.trust_index import trust_index
 
 logger = logging.getLogger(__name__)
 
@@ -17,13 +18,17 @@ class UserService:
         Returns True if new (needs checking), False if safe.
         """
         try:
+            # Members marked safe are known without a DB read
+            if trust_index.is_safe(user_id, chat_id):
+                return False
+
             # Check DB
-            user_record = get_user(user_id, chat_id)
+            user_record = await get_user(user_id, chat_id)
 
             if not user_record:
                 # Case A: User NOT in DB -> Old User (Safe)
                 logger.info(f"User {user_id} not in DB. Marking as safe (Old User).")
-                add_user(user_id, chat_id, join_date=None, is_safe=True)
+                await add_user(user_id, chat_id, join_date=None, is_safe=True)
                 return False
 
             # Case B: User IN DB
@@ -57,7 +62,7 @@ class UserService:
                 logger.info(
                     f"User {user_id} passed threshold ({time_diff.days} days). Marking safe."
                 )
-                set_user_safe(user_id, chat_id, True)
+                await set_user_safe(user_id, chat_id, True)
                 return False
 
             # User is still new
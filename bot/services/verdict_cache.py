@@ -0,0 +1,64 @@
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from config import VERDICT_CACHE_SIZE, VERDICT_CACHE_TTL_SECONDS
+from bot.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class VerdictCache:
+    """
+    Bounded LRU cache of Gemini scam scores with a TTL.
+    Keyed on normalized message text plus the identity of the attached image,
+    so the same scam posted in many chats is only sent to Gemini once.
+    """
+
+    def __init__(
+        self, max_size: int = VERDICT_CACHE_SIZE, ttl: float = VERDICT_CACHE_TTL_SECONDS
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text: str | None, image_id: str | None = None) -> str:
+        """Builds a cache key from whitespace/case-normalized text and an image id."""
+        normalized = " ".join((text or "").casefold().split())
+        raw = f"{normalized}\x00{image_id or ''}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> float | None:
+        """Returns the cached score or None if missing/expired."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            score, expires_at = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.incr("verdict_cache.hit")
+                return score
+            del self._entries[key]
+
+        self.misses += 1
+        metrics.incr("verdict_cache.miss")
+        return None
+
+    def set(self, key: str, score: float):
+        self._entries[key] = (score, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        metrics.set_gauge("verdict_cache.size", len(self._entries))
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._entries),
+        }
@@ -0,0 +1,101 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from config import (
+    WORKER_POOL_KIND,
+    WORKER_POOL_SIZE,
+    WORKER_POOL_MAX_PENDING,
+)
+from bot.services.language_service import LanguageService
+from bot.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# One LanguageService per worker process (shared by all threads in thread mode)
+_language_service: LanguageService = None
+_language_service_lock = threading.Lock()
+
+
+def get_language_service() -> LanguageService:
+    global _language_service
+    if _language_service is None:
+        with _language_service_lock:
+            if _language_service is None:
+                _language_service = LanguageService(preload=True)
+    return _language_service
+
+
+def _init_worker():
+    """Preloads the lingua models once per worker."""
+    get_language_service()
+
+
+# Worker tasks. Module-level so they can be pickled for the process pool.
+
+
+def detect_russian(text: str) -> bool:
+    return get_language_service().is_russian(text)
+
+
+class WorkerPool:
+    """
+    Runs CPU-bound work (language detection, image decoding) off the event loop.
+    kind is "thread" or "process"; size defaults to the number of CPU cores.
+    At most max_pending tasks are submitted at once, further callers wait,
+    so a photo flood queues here instead of piling up in the executor.
+    """
+
+    def __init__(
+        self,
+        kind: str = WORKER_POOL_KIND,
+        size: int = WORKER_POOL_SIZE,
+        max_pending: int = WORKER_POOL_MAX_PENDING,
+    ):
+        self.kind = kind
+        self.size = size or os.cpu_count() or 1
+        if kind == "process":
+            # spawn: forking a process that already runs threads can deadlock
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.size,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.size,
+                thread_name_prefix="cpu",
+                initializer=_init_worker,
+            )
+        self._slots = asyncio.Semaphore(max_pending or self.size * 2)
+        self._in_flight = 0
+
+    async def run(self, func, *args, **kwargs):
+        """Runs func(*args, **kwargs) in the pool and awaits the result."""
+        if self._slots.locked():
+            metrics.incr("worker_pool.saturated")
+        async with self._slots:
+            self._in_flight += 1
+            metrics.set_gauge("worker_pool.in_flight", self._in_flight)
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(
+                    self._executor, functools.partial(func, *args, **kwargs)
+                )
+            finally:
+                self._in_flight -= 1
+                metrics.set_gauge("worker_pool.in_flight", self._in_flight)
+
+    async def warm_up(self):
+        """Starts every worker so models are loaded before the first message."""
+        await asyncio.gather(*(self.run(_init_worker) for _ in range(self.size)))
+        logger.info(f"Worker pool ready ({self.kind}, {self.size} workers).")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+worker_pool = WorkerPool()
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+from typing import Any, Awaitable
+from telegram.ext import BaseUpdateProcessor
+from bot.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Processes updates from different chats concurrently while keeping strict
+    arrival order within each chat, so one slow Gemini call only delays its own chat.
+
+    - max_concurrent_updates: updates actually running at the same time.
+    - max_chat_queue_depth: updates a single chat may have waiting; further
+      updates of that chat are dropped so a flood in one chat can't starve the rest.
+    - max_pending_updates: total updates admitted (running + waiting their turn).
+    """
+
+    def __init__(
+        self,
+        max_concurrent_updates: int,
+        max_chat_queue_depth: int,
+        max_pending_updates: int,
+    ):
+        # The base class semaphore bounds admitted updates. Execution is bounded
+        # by our own semaphore, acquired only once it's the chat's turn, so
+        # updates queued behind a slow one don't hold slots other chats could use.
+        super().__init__(max(max_pending_updates, max_concurrent_updates))
+        self.max_running_updates = max_concurrent_updates
+        self.max_chat_queue_depth = max_chat_queue_depth
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        # chat_id -> future resolved when the chat's latest update finishes
+        self._tails: dict[int, asyncio.Future] = {}
+        self._depths: dict[int, int] = {}
+
+    @staticmethod
+    def _chat_key(update: object) -> int | None:
+        chat = getattr(update, "effective_chat", None)
+        return chat.id if chat else None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]):
+        chat_id = self._chat_key(update)
+        if chat_id is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        depth = self._depths.get(chat_id, 0)
+        if depth >= self.max_chat_queue_depth:
+            logger.warning(
+                f"Chat {chat_id} has {depth} queued updates. Dropping update."
+            )
+            metrics.incr("updates.dropped")
+            coroutine.close()
+            return
+
+        # Chain onto the chat's previous update before yielding to the loop,
+        # so the order is exactly the order updates were handed to us.
+        previous = self._tails.get(chat_id)
+        done = asyncio.get_running_loop().create_future()
+        self._tails[chat_id] = done
+        self._depths[chat_id] = depth + 1
+        metrics.set_gauge("updates.active_chats", len(self._depths))
+
+        started = False
+        try:
+            if previous is not None:
+                # asyncio.wait doesn't cancel `previous` if we get cancelled
+                await asyncio.wait([previous])
+            async with self._slots:
+                started = True
+                await coroutine
+        finally:
+            if not started:
+                coroutine.close()
+            done.set_result(None)
+            self._depths[chat_id] -= 1
+            if not self._depths[chat_id]:
+                del self._depths[chat_id]
+            if self._tails.get(chat_id) is done:
+                del self._tails[chat_id]
+            metrics.set_gauge("updates.active_chats", len(self._depths))
+
+    async def initialize(self):
+        """Nothing to allocate."""
+
+    async def shutdown(self):
+        """Nothing to free."""
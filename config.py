@@ -9,9 +9,147 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 DATABASE_URL = os.getenv("DATABASE_URL")
 SCAM_THRESHOLD = 0.75
 NEW_USER_THRESHOLD_DAYS = 2
+# Users with at least this many checked messages are trusted
+TRUSTED_MESSAGE_COUNT = 2
 
 # Startup Cleanup Variables
 CLEANUP_CHAT_ID = os.getenv("CLEANUP_CHAT_ID")
 CLEANUP_MESSAGE_ID = os.getenv("CLEANUP_MESSAGE_ID")
 CLEANUP_USER_ID = os.getenv("CLEANUP_USER_ID")
 ADMIN_ID = os.getenv("ADMIN_ID")
+
+# Verdict Cache (identical messages reuse the Gemini score)
+VERDICT_CACHE_SIZE = 10000
+VERDICT_CACHE_TTL_SECONDS = 6 * 60 * 60
+
+# Near-duplicate Scam Template Index (SimHash)
+SCAM_SIMILARITY_MAX_DISTANCE = 3  # max differing bits out of 64
+SCAM_INDEX_MAX_SIZE = 200000
+SCAM_INDEX_MIN_LENGTH = 30  # shorter texts are too generic to fingerprint
+
+# Update Processing (concurrent across chats, ordered within a chat)
+MAX_CONCURRENT_UPDATES = 64
+MAX_CHAT_QUEUE_DEPTH = 200
+MAX_PENDING_UPDATES = 5000
+
+# Database thread pool (used for Postgres; SQLite always uses a single writer thread)
+DB_EXECUTOR_WORKERS = 8
+
+# Write-behind flush interval for message/ban counters
+COUNTER_FLUSH_INTERVAL_SECONDS = 5
+
+# Language Detection
+LANGUAGE_CACHE_SIZE = 20000
+# Low accuracy result is accepted if Russian confidence is within this margin of 0 or 1
+LANGUAGE_CONFIDENCE_MARGIN = 0.2
+LANGUAGE_MAX_DETECT_CHARS = 500
+
+# CPU Worker Pool (language detection, image decoding)
+WORKER_POOL_KIND = os.getenv("WORKER_POOL_KIND", "thread")  # "thread" or "process"
+WORKER_POOL_SIZE = None  # None = number of CPU cores
+WORKER_POOL_MAX_PENDING = None  # None = 2 x pool size
+
+# Fetch trust and language concurrently for each message, and the photo once the
+# message needs analysis (cancelled when not needed)
+SPECULATIVE_PREFETCH = True
+
+# Gemini Micro-batching (opt-in): pending analyses share one request
+GEMINI_BATCHING_ENABLED = os.getenv("GEMINI_BATCHING_ENABLED", "false").lower() == "true"
+GEMINI_BATCH_MAX_SIZE = 10
+GEMINI_BATCH_WINDOW_SECONDS = 0.05
+
+# Gemini Model Cascade: cheapest model first, each tier with its own timeout.
+# Scores within GEMINI_ESCALATION_BAND of SCAM_THRESHOLD go to the next tier.
+# thinking_budget 0 disables thinking so the small output budget goes to the answer.
+GEMINI_MODEL_TIERS = [
+    {"model": "gemini-flash-lite-latest", "timeout": 5.0, "thinking_budget": 0},
+    {"model": "gemini-flash-latest", "timeout": 10.0, "thinking_budget": 0},
+]
+GEMINI_ESCALATION_BAND = 0.15
+# Output budget per scored message ({"scam": 0.85} is ~10 tokens)
+GEMINI_MAX_OUTPUT_TOKENS = 24
+
+# Gemini Input Size Reduction
+IMAGE_TARGET_SIDE = 800  # longest side in px; Telegram offers 90/320/800/1280
+IMAGE_JPEG_QUALITY = 80
+GEMINI_MAX_TEXT_CHARS = 1500
+
+# Image Verdict Index (file_unique_id + perceptual hash)
+IMAGE_INDEX_MAX_SIZE = 100000
+IMAGE_HASH_MAX_DISTANCE = 6  # max differing dHash bits out of 64
+
+# Media Group (album) Aggregation: parts are analyzed together in one request.
+# The window restarts with every part, but a group never waits longer than the max delay.
+MEDIA_GROUP_WINDOW_SECONDS = 1.0
+MEDIA_GROUP_MAX_DELAY_SECONDS = 3.0
+MEDIA_GROUP_MAX_SIZE = 10  # Telegram albums have at most 10 items
+
+# Burst Coalescing: rapid consecutive messages of one user in one chat share one analysis.
+# Messages are already visible while they wait, so the window only delays moderation.
+BURST_COALESCING = True
+BURST_WINDOW_SECONDS = 0.5
+BURST_MAX_DELAY_SECONDS = 1.5
+BURST_MAX_SIZE = 6
+
+# Allow-then-retract mode (opt-in): messages are allowed immediately and analyzed by a
+# background worker from a persistent queue; scams are deleted and banned afterwards.
+ASYNC_VERDICTS = os.getenv("ASYNC_VERDICTS", "false").lower() == "true"
+ANALYSIS_QUEUE_POLL_SECONDS = 1.0
+ANALYSIS_QUEUE_BATCH_SIZE = 20
+ANALYSIS_QUEUE_MAX_ATTEMPTS = 5
+ANALYSIS_QUEUE_RETRY_SECONDS = 30  # doubled after every failed attempt
+
+# Gemini Admission Scheduler: token buckets (requests per second, burst size).
+# Requests over the limit wait in a priority queue instead of failing.
+GEMINI_GLOBAL_RATE = float(os.getenv("GEMINI_GLOBAL_RATE", "4"))
+GEMINI_GLOBAL_BURST = 10
+GEMINI_CHAT_RATE = 0.5
+GEMINI_CHAT_BURST = 5
+# 429 responses pause admissions and the request is queued again
+GEMINI_RATE_LIMIT_RETRIES = 3
+GEMINI_RATE_LIMIT_BACKOFF_SECONDS = 5.0
+
+# Gemini Hedging (opt-in): a duplicate request is sent once a call runs longer than
+# the model's recent p95 latency; the first answer wins
+GEMINI_HEDGING_ENABLED = os.getenv("GEMINI_HEDGING_ENABLED", "false").lower() == "true"
+GEMINI_HEDGE_MIN_SAMPLES = 20  # latency samples needed before hedging
+GEMINI_HEDGE_MIN_DELAY_SECONDS = 0.3
+
+# Gemini Circuit Breaker: the local fallback classifier answers while it is open
+BREAKER_WINDOW = 20  # recent calls considered
+BREAKER_MIN_CALLS = 10
+BREAKER_FAILURE_RATE = 0.5  # errors and timeouts
+BREAKER_SLOW_CALL_SECONDS = 8.0
+BREAKER_SLOW_CALL_RATE = 0.8
+BREAKER_OPEN_SECONDS = 30
+
+# Local Scam Classifier (hashed char n-gram logistic regression, see train_classifier.py).
+# Scores at or beyond these confidences are final; everything in between goes to Gemini.
+LOCAL_CLASSIFIER_PATH = os.getenv("LOCAL_CLASSIFIER_PATH", "scam_classifier.json")
+LOCAL_CLASSIFIER_SCAM_CONFIDENCE = 0.97
+LOCAL_CLASSIFIER_SAFE_CONFIDENCE = 0.03
+LOCAL_CLASSIFIER_FEATURE_BITS = 18
+LOCAL_CLASSIFIER_MAX_CHARS = 400
+
+# Scam rules (phrase/regex file, reloaded on change)
+RULES_PATH = os.getenv("RULES_PATH", "scam_rules.txt")
+RULES_RELOAD_INTERVAL_SECONDS = 10
+
+# Link reputation (domains and Telegram handles learned from verdicts)
+# Bans of distinct users needed before a domain or invite link bans without Gemini
+LINK_BAD_MIN_BANS = 3
+LINK_GOOD_MIN_SAFE = 5
+TRUSTED_DOMAINS = [
+    "telegram.org",
+    "google.com",
+    "youtube.com",
+    "youtu.be",
+    "wikipedia.org",
+    "github.com",
+    "gov.ua",
+    "gov.il",
+]
+
+# Cross-chat scammer registry (Bloom filter sized for this many user ids)
+SCAMMER_BLOOM_CAPACITY = 1_000_000
+SCAMMER_BLOOM_ERROR_RATE = 0.001
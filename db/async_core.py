@@ -0,0 +1,246 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from peewee import SqliteDatabase
+from config import DB_EXECUTOR_WORKERS, COUNTER_FLUSH_INTERVAL_SECONDS, TRUSTED_MESSAGE_COUNT
+from db import core
+from db.models import db
+from db.counter_buffer import counter_buffer
+from db.trust_index import trust_index
+
+logger = logging.getLogger(__name__)
+
+# Async wrappers around db.core for use inside handlers.
+# Peewee is synchronous, so every call runs on a small bounded thread pool
+# instead of blocking the event loop. Peewee connection state is thread-local,
+# so each worker keeps its own connection (SQLite file or DATABASE_URL Postgres).
+
+# SQLite allows a single writer at a time; extra threads would only contend on its lock
+_max_workers = 1 if isinstance(db, SqliteDatabase) else DB_EXECUTOR_WORKERS
+_executor = ThreadPoolExecutor(max_workers=_max_workers, thread_name_prefix="db")
+_flusher_task: asyncio.Task = None
+
+# chat_id -> excluded thread ids, loaded lazily and dropped when they change
+_excluded_threads: dict[int, frozenset[int]] = {}
+
+
+async def run_db(func, *args, **kwargs):
+    """Runs a blocking DB function on the DB thread pool and awaits the result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _executor, functools.partial(func, *args, **kwargs)
+    )
+
+
+def shutdown_executor():
+    """Stops the DB thread pool, waiting for queued calls to finish."""
+    _executor.shutdown(wait=True)
+
+
+async def flush_counters():
+    """Writes buffered message/ban counters to the database."""
+    if counter_buffer.is_empty():
+        return
+    messages, chat_bans, global_bans = counter_buffer.take()
+    success = await run_db(core.flush_counters, messages, chat_bans, global_bans)
+    if success:
+        counter_buffer.commit()
+        logger.info(
+            f"Flushed counters: {len(messages)} members, {len(chat_bans)} chats, {global_bans} bans"
+        )
+    else:
+        # Keep the counts and retry on the next flush
+        counter_buffer.restore()
+
+
+async def _flush_periodically(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await flush_counters()
+        except Exception as e:
+            logger.error(f"Error in counter flusher: {e}")
+
+
+def start_counter_flusher(interval: float = COUNTER_FLUSH_INTERVAL_SECONDS):
+    """Starts the background task that periodically flushes buffered counters."""
+    global _flusher_task
+    if _flusher_task is None or _flusher_task.done():
+        _flusher_task = asyncio.create_task(_flush_periodically(interval))
+
+
+async def stop_counter_flusher():
+    """Stops the periodic flusher and writes whatever is still buffered."""
+    global _flusher_task
+    if _flusher_task is not None:
+        _flusher_task.cancel()
+        try:
+            await _flusher_task
+        except asyncio.CancelledError:
+            pass
+        _flusher_task = None
+    await flush_counters()
+
+
+async def get_user(user_id: int, chat_id: int):
+    return await run_db(core.get_user, user_id, chat_id)
+
+
+async def add_user(
+    user_id: int, chat_id: int, join_date: datetime = None, is_safe: bool = False
+):
+    added = await run_db(core.add_user, user_id, chat_id, join_date, is_safe)
+    # add_user only ever sets is_safe, never clears it
+    if added and is_safe:
+        trust_index.set_safe(user_id, chat_id)
+    return added
+
+
+async def set_user_safe(user_id: int, chat_id: int, is_safe: bool = True):
+    result = await run_db(core.set_user_safe, user_id, chat_id, is_safe)
+    trust_index.set_safe(user_id, chat_id, is_safe)
+    return result
+
+
+async def get_message_count(user_id: int, chat_id: int) -> int:
+    """Returns the stored message count plus increments not yet flushed."""
+    user = await get_user(user_id, chat_id)
+    stored = user.messages_count if user else 0
+    return stored + counter_buffer.pending_messages(user_id, chat_id)
+
+
+async def is_trusted_member(user_id: int, chat_id: int) -> bool:
+    """
+    True if the user has at least TRUSTED_MESSAGE_COUNT messages in the chat.
+    Answered from the trust index; the DB is read only before it is loaded.
+    """
+    if trust_index.is_active(user_id, chat_id):
+        return True
+    if trust_index.loaded:
+        return False
+    return await get_message_count(user_id, chat_id) >= TRUSTED_MESSAGE_COUNT
+
+
+async def increment_message_count(user_id: int, chat_id: int):
+    """Buffers a message count increment (written by the periodic flush)."""
+    counter_buffer.add_message(user_id, chat_id)
+    # Members that are already trusted (the common case) skip the count lookup
+    if not trust_index.is_active(user_id, chat_id):
+        if await get_message_count(user_id, chat_id) >= TRUSTED_MESSAGE_COUNT:
+            trust_index.mark_active(user_id, chat_id)
+
+
+async def warm_up_trust_index():
+    """Loads the safe and active members into the trust index (startup)."""
+    rows = await run_db(core.get_trusted_members, TRUSTED_MESSAGE_COUNT)
+    if rows is None:
+        # Not loaded: lookups keep falling back to the DB
+        return
+    trust_index.load(rows)
+    logger.info(f"Loaded {len(trust_index)} trusted members.")
+
+
+async def increment_blocked_count(chat_id: int = None):
+    """Buffers a blocked-bots increment (written by the periodic flush)."""
+    counter_buffer.add_ban(chat_id)
+
+
+async def get_blocked_count() -> int:
+    return await run_db(core.get_blocked_count) + counter_buffer.pending_bans()
+
+
+async def get_excluded_threads(chat_id: int) -> list[int]:
+    return await run_db(core.get_excluded_threads, chat_id)
+
+
+async def update_excluded_threads(chat_id: int, thread_ids: list[int]):
+    success = await run_db(core.update_excluded_threads, chat_id, thread_ids)
+    invalidate_excluded_threads(chat_id)
+    return success
+
+
+async def is_thread_excluded(chat_id: int, thread_id: int) -> bool:
+    """
+    Checks thread exclusion against the in-memory per-chat set.
+    Only the first check for a chat reads the database.
+    """
+    threads = _excluded_threads.get(chat_id)
+    if threads is None:
+        threads = frozenset(await get_excluded_threads(chat_id))
+        _excluded_threads[chat_id] = threads
+    return thread_id in threads
+
+
+def invalidate_excluded_threads(chat_id: int):
+    _excluded_threads.pop(chat_id, None)
+
+
+async def enqueue_analysis(
+    chat_id: int,
+    user_id: int,
+    user_name: str,
+    messages: list[dict],
+    text: str,
+    images: list[dict],
+):
+    return await run_db(
+        core.enqueue_analysis,
+        chat_id,
+        user_id,
+        user_name,
+        messages,
+        text,
+        images,
+    )
+
+
+async def get_due_analyses(limit: int):
+    return await run_db(core.get_due_analyses, limit)
+
+
+async def delete_analysis(analysis_id: int):
+    return await run_db(core.delete_analysis, analysis_id)
+
+
+async def reschedule_analysis(analysis_id: int, attempts: int, next_attempt_at: datetime):
+    return await run_db(core.reschedule_analysis, analysis_id, attempts, next_attempt_at)
+
+
+async def record_verdict(
+    chat_id: int, user_id: int, text: str, score: float, source: str, label: int = None
+):
+    return await run_db(core.record_verdict, chat_id, user_id, text, score, source, label)
+
+
+async def label_verdicts(user_id: int, chat_id: int, label: int):
+    return await run_db(core.label_verdicts, user_id, chat_id, label)
+
+
+async def record_link_verdicts(keys: list[str], banned: bool, user_id: int = None):
+    return await run_db(core.record_link_verdicts, keys, banned, user_id)
+
+
+async def get_link_reputations() -> list[tuple[str, int, int]]:
+    return await run_db(core.get_link_reputations)
+
+
+async def get_link_bans() -> list[tuple[str, int]]:
+    return await run_db(core.get_link_bans)
+
+
+async def add_scammer(user_id: int, chat_id: int, reason: str = None):
+    return await run_db(core.add_scammer, user_id, chat_id, reason)
+
+
+async def remove_scammer(user_id: int):
+    return await run_db(core.remove_scammer, user_id)
+
+
+async def is_scammer(user_id: int) -> bool:
+    return await run_db(core.is_scammer, user_id)
+
+
+async def get_scammer_ids() -> list[int]:
+    return await run_db(core.get_scammer_ids)
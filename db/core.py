@@ -2,12 +2,15 @@ import logging
 import json
 from datetime import datetime
 from datetime import datetime
-from db.models import db, GroupMember, BotStats, Chat
+from db.models import db, GroupMember, BotStats, Chat, ExcludedThread, PendingAnalysis, Verdict, LinkReputation, LinkBan, Scammer
 
 logger = logging.getLogger(__name__)
 
 
-from peewee import fn
+from peewee import fn, chunked, EXCLUDED
+
+# Rows per bulk upsert statement (keeps SQLite under its bound-variable limit)
+UPSERT_BATCH_SIZE = 100
 
 
 import json
@@ -16,24 +19,17 @@ import json
 
 
 def update_excluded_threads(chat_id: int, thread_ids: list[int]):
-    """Updates the list of excluded threads for a chat."""
+    """Adds threads to the excluded threads of a chat. Returns True if successful."""
     try:
-        chat, created = Chat.get_or_create(chat_id=chat_id)
-
-        try:
-            current_threads = json.loads(chat.threads_to_exclude)
-        except json.JSONDecodeError:
-            current_threads = []
-
-        # Use set for uniqueness then convert back to list
-        updated_threads = list(set(current_threads + thread_ids))
-
-        chat.threads_to_exclude = json.dumps(updated_threads)
-        chat.save()
-        logger.info(f"Updated excluded threads for Chat {chat_id}: {updated_threads}")
-        return True
-    except Exception as e:
-        logger.error(f"Error updating excluded threads: {e}")
+        with db.atomic():
+            Chat.get_or_create(chat_id=chat_id)
+            rows = [
+                {"chat_id": chat_id, "thread_id": thread_id}
+                for thread_id in set(thread_ids)
+            ]
+            for batch in chunked(rows, UPSERT_BATCH_SIZE):
+                ExcludedThread.insert_many(batch).on_conflict_ignore().execute()
+        logger.info(f"Updated excluded threads for Chat {chat_id}: {thread_ids}")
         return True
     except Exception as e:
         logger.error(f"Error updating excluded threads: {e}")
@@ -43,15 +39,37 @@ def update_excluded_threads(chat_id: int, thread_ids: list[int]):
 def get_excluded_threads(chat_id: int) -> list[int]:
     """Retrieves the list of excluded threads for a chat."""
     try:
-        chat = Chat.get_or_none(Chat.chat_id == chat_id)
-        if chat and chat.threads_to_exclude:
-            return json.loads(chat.threads_to_exclude)
-        return []
+        query = ExcludedThread.select(ExcludedThread.thread_id).where(
+            ExcludedThread.chat_id == chat_id
+        )
+        return [row.thread_id for row in query]
     except Exception as e:
         logger.error(f"Error getting excluded threads: {e}")
         return []
 
 
+def migrate_excluded_threads():
+    """Moves excluded threads from the legacy Chat JSON column into ExcludedThread."""
+    try:
+        query = Chat.select().where(
+            Chat.threads_to_exclude.is_null(False) & (Chat.threads_to_exclude != "[]")
+        )
+        for chat in query:
+            try:
+                thread_ids = json.loads(chat.threads_to_exclude)
+            except json.JSONDecodeError:
+                thread_ids = []
+
+            with db.atomic():
+                if thread_ids:
+                    update_excluded_threads(chat.chat_id, thread_ids)
+                chat.threads_to_exclude = "[]"
+                chat.save()
+            logger.info(f"Migrated excluded threads for Chat {chat.chat_id}: {thread_ids}")
+    except Exception as e:
+        logger.error(f"Error migrating excluded threads: {e}")
+
+
 def migrate_chats():
     """Migrates existing GroupMembers to populates the Chat table."""
     try:
@@ -90,10 +108,23 @@ def init_db():
         db.connect()
         # User commented out drop_tables to preserve data for migration
         # db.drop_tables([GroupMember, BotStats, Chat], safe=True)
-        db.create_tables([GroupMember, BotStats, Chat])
+        db.create_tables(
+            [
+                GroupMember,
+                BotStats,
+                Chat,
+                ExcludedThread,
+                PendingAnalysis,
+                Verdict,
+                LinkReputation,
+                LinkBan,
+                Scammer,
+            ]
+        )
 
         # Run migration to populate Chat table from existing GroupMembers
         migrate_chats()
+        migrate_excluded_threads()
 
         logger.info("Database initialized successfully.")
         db.close()
@@ -196,6 +227,56 @@ def increment_blocked_count(chat_id: int = None):
         logger.error(f"Error incrementing blocked count: {e}")
 
 
+def flush_counters(
+    messages: dict[tuple[int, int], int], chat_bans: dict[int, int], global_bans: int
+) -> bool:
+    """
+    Applies buffered counter increments as bulk upserts in one transaction.
+    messages maps (user_id, chat_id) -> new messages, chat_bans maps chat_id -> new bans.
+    Returns True if successful.
+    """
+    try:
+        with db.atomic():
+            now = datetime.now()
+            member_rows = [
+                {
+                    "user_id": user_id,
+                    "chat_id": chat_id,
+                    "messages_count": count,
+                    "join_date": now,
+                }
+                for (user_id, chat_id), count in messages.items()
+            ]
+            for batch in chunked(member_rows, UPSERT_BATCH_SIZE):
+                GroupMember.insert_many(batch).on_conflict(
+                    conflict_target=[GroupMember.user_id, GroupMember.chat_id],
+                    update={
+                        GroupMember.messages_count: GroupMember.messages_count
+                        + EXCLUDED.messages_count
+                    },
+                ).execute()
+
+            chat_rows = [
+                {"chat_id": chat_id, "banned_users": count}
+                for chat_id, count in chat_bans.items()
+            ]
+            for batch in chunked(chat_rows, UPSERT_BATCH_SIZE):
+                Chat.insert_many(batch).on_conflict(
+                    conflict_target=[Chat.chat_id],
+                    update={Chat.banned_users: Chat.banned_users + EXCLUDED.banned_users},
+                ).execute()
+
+            if global_bans:
+                BotStats.insert(key="blocked_bots", value=global_bans).on_conflict(
+                    conflict_target=[BotStats.key],
+                    update={BotStats.value: BotStats.value + EXCLUDED.value},
+                ).execute()
+        return True
+    except Exception as e:
+        logger.error(f"Error flushing counters: {e}")
+        return False
+
+
 def get_blocked_count() -> int:
     """Returns the total number of blocked bots."""
     try:
@@ -204,3 +285,204 @@ def get_blocked_count() -> int:
     except Exception as e:
         logger.error(f"Error getting blocked count: {e}")
         return 0
+
+
+def enqueue_analysis(
+    chat_id: int,
+    user_id: int,
+    user_name: str,
+    messages: list[dict],
+    text: str,
+    images: list[dict],
+):
+    """Persists a pending scam analysis. Returns True if successful."""
+    try:
+        PendingAnalysis.create(
+            chat_id=chat_id,
+            user_id=user_id,
+            user_name=user_name,
+            messages=json.dumps(messages),
+            text=text,
+            images=json.dumps(images),
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Error enqueueing analysis: {e}")
+        return False
+
+
+def get_due_analyses(limit: int) -> list[PendingAnalysis]:
+    """Returns the oldest pending analyses whose next attempt is due."""
+    try:
+        return list(
+            PendingAnalysis.select()
+            .where(PendingAnalysis.next_attempt_at <= datetime.now())
+            .order_by(PendingAnalysis.id)
+            .limit(limit)
+        )
+    except Exception as e:
+        logger.error(f"Error getting pending analyses: {e}")
+        return []
+
+
+def delete_analysis(analysis_id: int):
+    try:
+        PendingAnalysis.delete_by_id(analysis_id)
+    except Exception as e:
+        logger.error(f"Error deleting pending analysis: {e}")
+
+
+def reschedule_analysis(analysis_id: int, attempts: int, next_attempt_at: datetime):
+    """Records a failed attempt and when to try again."""
+    try:
+        PendingAnalysis.update(
+            attempts=attempts, next_attempt_at=next_attempt_at
+        ).where(PendingAnalysis.id == analysis_id).execute()
+    except Exception as e:
+        logger.error(f"Error rescheduling pending analysis: {e}")
+
+
+def record_verdict(
+    chat_id: int, user_id: int, text: str, score: float, source: str, label: int = None
+):
+    """Logs a verdict for training the local classifier."""
+    try:
+        Verdict.create(
+            chat_id=chat_id,
+            user_id=user_id,
+            text=text,
+            score=score,
+            source=source,
+            label=label,
+        )
+    except Exception as e:
+        logger.error(f"Error recording verdict: {e}")
+
+
+def label_verdicts(user_id: int, chat_id: int, label: int):
+    """Sets the label of every logged verdict of a user in a chat (admin decision)."""
+    try:
+        return (
+            Verdict.update(label=label)
+            .where((Verdict.user_id == user_id) & (Verdict.chat_id == chat_id))
+            .execute()
+        )
+    except Exception as e:
+        logger.error(f"Error labeling verdicts: {e}")
+        return 0
+
+
+def get_verdicts() -> list[dict]:
+    """All logged verdicts, oldest first."""
+    try:
+        return list(Verdict.select().order_by(Verdict.id).dicts())
+    except Exception as e:
+        logger.error(f"Error getting verdicts: {e}")
+        return []
+
+
+def record_link_verdicts(keys: list[str], banned: bool, user_id: int = None):
+    """
+    Adds one ban (or one safe verdict) to the reputation of each link key.
+    Bans also record the banned user_id per key.
+    """
+    try:
+        now = datetime.now()
+        rows = [
+            {"key": key, "bans": int(banned), "safe": int(not banned), "updated_at": now}
+            for key in keys
+        ]
+        with db.atomic():
+            if banned and user_id is not None:
+                ban_rows = [{"key": key, "user_id": user_id, "created_at": now} for key in keys]
+                for batch in chunked(ban_rows, UPSERT_BATCH_SIZE):
+                    LinkBan.insert_many(batch).on_conflict_ignore().execute()
+            for batch in chunked(rows, UPSERT_BATCH_SIZE):
+                LinkReputation.insert_many(batch).on_conflict(
+                    conflict_target=[LinkReputation.key],
+                    update={
+                        LinkReputation.bans: LinkReputation.bans + EXCLUDED.bans,
+                        LinkReputation.safe: LinkReputation.safe + EXCLUDED.safe,
+                        LinkReputation.updated_at: EXCLUDED.updated_at,
+                    },
+                ).execute()
+    except Exception as e:
+        logger.error(f"Error recording link verdicts: {e}")
+
+
+def get_link_reputations() -> list[tuple[str, int, int]]:
+    """(key, bans, safe) of every link seen in a verdict."""
+    try:
+        return list(
+            LinkReputation.select(
+                LinkReputation.key, LinkReputation.bans, LinkReputation.safe
+            ).tuples()
+        )
+    except Exception as e:
+        logger.error(f"Error getting link reputations: {e}")
+        return []
+
+
+def get_link_bans() -> list[tuple[str, int]]:
+    """(key, user_id) of every user banned for a message with the link."""
+    try:
+        return list(LinkBan.select(LinkBan.key, LinkBan.user_id).tuples())
+    except Exception as e:
+        logger.error(f"Error getting link bans: {e}")
+        return []
+
+
+def add_scammer(user_id: int, chat_id: int, reason: str = None):
+    """Registers a banned scammer (the first ban is kept)."""
+    try:
+        Scammer.insert(
+            user_id=user_id, chat_id=chat_id, reason=reason[:255] if reason else None
+        ).on_conflict_ignore().execute()
+    except Exception as e:
+        logger.error(f"Error adding scammer: {e}")
+
+
+def remove_scammer(user_id: int):
+    try:
+        return Scammer.delete().where(Scammer.user_id == user_id).execute()
+    except Exception as e:
+        logger.error(f"Error removing scammer: {e}")
+        return 0
+
+
+def is_scammer(user_id: int) -> bool:
+    try:
+        return Scammer.select().where(Scammer.user_id == user_id).exists()
+    except Exception as e:
+        logger.error(f"Error checking scammer: {e}")
+        return False
+
+
+def get_scammer_ids() -> list[int]:
+    try:
+        return [user_id for (user_id,) in Scammer.select(Scammer.user_id).tuples().iterator()]
+    except Exception as e:
+        logger.error(f"Error getting scammers: {e}")
+        return []
+
+
+def get_trusted_members(min_messages: int) -> list[tuple[int, int, bool, int]] | None:
+    """
+    (user_id, chat_id, is_safe, messages_count) of members that are safe or
+    have at least min_messages messages. None on error.
+    """
+    try:
+        return list(
+            GroupMember.select(
+                GroupMember.user_id,
+                GroupMember.chat_id,
+                GroupMember.is_safe,
+                GroupMember.messages_count,
+            )
+            .where(GroupMember.is_safe | (GroupMember.messages_count >= min_messages))
+            .tuples()
+            .iterator()
+        )
+    except Exception as e:
+        logger.error(f"Error getting trusted members: {e}")
+        return None
@@ -0,0 +1,61 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CounterBuffer:
+    """
+    Write-behind buffer for message and ban counters.
+    Increments are merged in memory per (user_id, chat_id) and per chat, then
+    written as bulk upserts by db.async_core.flush_counters.
+    Counts taken for a flush stay visible to readers until the write commits.
+    """
+
+    def __init__(self):
+        self.messages: dict[tuple[int, int], int] = {}
+        self.chat_bans: dict[int, int] = {}
+        self.global_bans = 0
+        self._in_flight = ({}, {}, 0)
+
+    def add_message(self, user_id: int, chat_id: int):
+        key = (user_id, chat_id)
+        self.messages[key] = self.messages.get(key, 0) + 1
+
+    def add_ban(self, chat_id: int = None):
+        self.global_bans += 1
+        if chat_id:
+            self.chat_bans[chat_id] = self.chat_bans.get(chat_id, 0) + 1
+
+    def pending_messages(self, user_id: int, chat_id: int) -> int:
+        key = (user_id, chat_id)
+        return self.messages.get(key, 0) + self._in_flight[0].get(key, 0)
+
+    def pending_bans(self) -> int:
+        return self.global_bans + self._in_flight[2]
+
+    def is_empty(self) -> bool:
+        return not (self.messages or self.chat_bans or self.global_bans)
+
+    def take(self) -> tuple[dict, dict, int]:
+        """Moves the buffered counts to the in-flight batch and returns it."""
+        batch = (self.messages, self.chat_bans, self.global_bans)
+        self._in_flight = batch
+        self.messages, self.chat_bans, self.global_bans = {}, {}, 0
+        return batch
+
+    def commit(self):
+        """Drops the in-flight batch once it has been written."""
+        self._in_flight = ({}, {}, 0)
+
+    def restore(self):
+        """Merges a failed in-flight batch back into the buffer."""
+        messages, chat_bans, global_bans = self._in_flight
+        for key, count in messages.items():
+            self.messages[key] = self.messages.get(key, 0) + count
+        for chat_id, count in chat_bans.items():
+            self.chat_bans[chat_id] = self.chat_bans.get(chat_id, 0) + count
+        self.global_bans += global_bans
+        self.commit()
+
+
+counter_buffer = CounterBuffer()
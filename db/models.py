@@ -37,6 +37,78 @@ class BotStats(BaseModel):
 
 class Chat(BaseModel):
     chat_id = BigIntegerField(primary_key=True)
-    threads_to_exclude = TextField(default="[]")  # stored as JSON
+    # Legacy JSON list, migrated into ExcludedThread by init_db
+    threads_to_exclude = TextField(default="[]")
     known_users = IntegerField(default=0)
     banned_users = IntegerField(default=0)
+
+
+class ExcludedThread(BaseModel):
+    chat_id = BigIntegerField()
+    thread_id = BigIntegerField()
+
+    class Meta:
+        primary_key = CompositeKey("chat_id", "thread_id")
+
+
+class PendingAnalysis(BaseModel):
+    """Scam analysis queued by ASYNC_VERDICTS mode (the messages are already allowed)."""
+
+    chat_id = BigIntegerField()
+    user_id = BigIntegerField()
+    user_name = CharField(null=True)
+    # JSON list of {"id": message_id, "russian": bool}
+    messages = TextField()
+    text = TextField(null=True)
+    # JSON list of {"file_id": ..., "image_id": file_unique_id}, downloaded by the worker
+    images = TextField(default="[]")
+    attempts = IntegerField(default=0)
+    next_attempt_at = DateTimeField(default=datetime.now)
+    created_at = DateTimeField(default=datetime.now)
+
+
+class Verdict(BaseModel):
+    """Logged scam verdicts, the training data of the local classifier."""
+
+    chat_id = BigIntegerField()
+    user_id = BigIntegerField(null=True)
+    text = TextField()
+    # Gemini score, if the verdict came from Gemini
+    score = FloatField(null=True)
+    # 1 = scam, 0 = safe; set by bans and the admin /ban_user, /unban_user commands
+    label = IntegerField(null=True)
+    source = CharField()  # "gemini", "ban" or "local"
+    created_at = DateTimeField(default=datetime.now)
+
+    class Meta:
+        indexes = ((("user_id", "chat_id"), False),)
+
+
+class LinkReputation(BaseModel):
+    """Ban and safe verdict counts per link ("domain:example.com", "handle:name", "invite:code")."""
+
+    key = CharField(primary_key=True)
+    bans = IntegerField(default=0)
+    safe = IntegerField(default=0)
+    updated_at = DateTimeField(default=datetime.now)
+
+
+class LinkBan(BaseModel):
+    """Users banned for a message with the link; a link turns bad on bans of distinct users."""
+
+    key = CharField()
+    user_id = BigIntegerField()
+    created_at = DateTimeField(default=datetime.now)
+
+    class Meta:
+        primary_key = CompositeKey("key", "user_id")
+
+
+class Scammer(BaseModel):
+    """Users banned as scammers, banned again on join or first message in any chat."""
+
+    user_id = BigIntegerField(primary_key=True)
+    # Chat of the first ban
+    chat_id = BigIntegerField(null=True)
+    reason = CharField(null=True)
+    created_at = DateTimeField(default=datetime.now)
@@ -0,0 +1,81 @@
+import bisect
+import logging
+from array import array
+from config import TRUSTED_MESSAGE_COUNT
+
+logger = logging.getLogger(__name__)
+
+
+class SortedIdSet:
+    """User ids in a sorted array('q'): 8 bytes per id, binary search lookups."""
+
+    def __init__(self, ids=()):
+        self.ids = array("q", sorted(set(ids)))
+
+    def __contains__(self, user_id: int) -> bool:
+        i = bisect.bisect_left(self.ids, user_id)
+        return i < len(self.ids) and self.ids[i] == user_id
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, user_id: int):
+        i = bisect.bisect_left(self.ids, user_id)
+        if i == len(self.ids) or self.ids[i] != user_id:
+            self.ids.insert(i, user_id)
+
+    def discard(self, user_id: int):
+        i = bisect.bisect_left(self.ids, user_id)
+        if i < len(self.ids) and self.ids[i] == user_id:
+            del self.ids[i]
+
+
+class TrustIndex:
+    """
+    Per-chat members that are trusted without a DB read: active members
+    (at least TRUSTED_MESSAGE_COUNT counted messages) and safe members (is_safe).
+    Warm-loaded from GroupMember at startup, then kept current by the
+    db.async_core writers (add_user, set_user_safe, increment_message_count).
+    Until it is loaded only positive answers can be trusted.
+    """
+
+    def __init__(self):
+        self._active: dict[int, SortedIdSet] = {}
+        self._safe: dict[int, SortedIdSet] = {}
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return sum(map(len, self._active.values())) + sum(map(len, self._safe.values()))
+
+    def load(self, rows):
+        """rows: (user_id, chat_id, is_safe, messages_count) of the trusted members."""
+        active: dict[int, list[int]] = {}
+        safe: dict[int, list[int]] = {}
+        for user_id, chat_id, is_safe, messages_count in rows:
+            if messages_count >= TRUSTED_MESSAGE_COUNT:
+                active.setdefault(chat_id, []).append(user_id)
+            if is_safe:
+                safe.setdefault(chat_id, []).append(user_id)
+        self._active = {chat_id: SortedIdSet(ids) for chat_id, ids in active.items()}
+        self._safe = {chat_id: SortedIdSet(ids) for chat_id, ids in safe.items()}
+        self.loaded = True
+
+    def is_active(self, user_id: int, chat_id: int) -> bool:
+        members = self._active.get(chat_id)
+        return members is not None and user_id in members
+
+    def is_safe(self, user_id: int, chat_id: int) -> bool:
+        members = self._safe.get(chat_id)
+        return members is not None and user_id in members
+
+    def mark_active(self, user_id: int, chat_id: int):
+        self._active.setdefault(chat_id, SortedIdSet()).add(user_id)
+
+    def set_safe(self, user_id: int, chat_id: int, is_safe: bool = True):
+        if is_safe:
+            self._safe.setdefault(chat_id, SortedIdSet()).add(user_id)
+        elif chat_id in self._safe:
+            self._safe[chat_id].discard(user_id)
+
+
+trust_index = TrustIndex()
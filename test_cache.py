@@ -0,0 +1,44 @@
+import unittest
+from unittest.mock import patch
+from bot.services.verdict_cache import VerdictCache
+
+
+class TestVerdictCache(unittest.TestCase):
+    def test_normalized_key(self):
+        key_a = VerdictCache.make_key("Free  Crypto\nGiveaway", "img1")
+        key_b = VerdictCache.make_key("free crypto giveaway", "img1")
+        key_c = VerdictCache.make_key("free crypto giveaway", "img2")
+        self.assertEqual(key_a, key_b)
+        self.assertNotEqual(key_b, key_c)
+
+    def test_hit_and_miss(self):
+        cache = VerdictCache(max_size=10, ttl=60)
+        key = cache.make_key("hello")
+        self.assertIsNone(cache.get(key))
+        cache.set(key, 0.9)
+        self.assertEqual(cache.get(key), 0.9)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_lru_eviction(self):
+        cache = VerdictCache(max_size=2, ttl=60)
+        cache.set("a", 0.1)
+        cache.set("b", 0.2)
+        cache.get("a")  # "b" is now least recently used
+        cache.set("c", 0.3)
+        self.assertEqual(cache.get("a"), 0.1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 0.3)
+
+    def test_ttl_expiry(self):
+        cache = VerdictCache(max_size=10, ttl=5)
+        with patch("bot.services.verdict_cache.time.monotonic", return_value=100):
+            cache.set("a", 0.5)
+        with patch("bot.services.verdict_cache.time.monotonic", return_value=104):
+            self.assertEqual(cache.get("a"), 0.5)
+        with patch("bot.services.verdict_cache.time.monotonic", return_value=106):
+            self.assertIsNone(cache.get("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import asyncio
+from bot.services.coalescer import Coalescer
+
+
+class TestCoalescer(unittest.TestCase):
+    def run_async(self, coro):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+    def test_groups_by_key_after_window(self):
+        flushed = []
+
+        async def flush(key, items):
+            flushed.append((key, items))
+
+        async def run():
+            coalescer = Coalescer("test", flush, 0.05, 1.0, 10)
+            coalescer.add("a", 1)
+            coalescer.add("b", 2)
+            await asyncio.sleep(0.02)
+            coalescer.add("a", 3)
+            self.assertEqual(flushed, [])
+            await asyncio.sleep(0.1)
+
+        self.run_async(run())
+        self.assertEqual(sorted(flushed), [("a", [1, 3]), ("b", [2])])
+
+    def test_max_size_flushes_immediately(self):
+        flushed = []
+
+        async def flush(key, items):
+            flushed.append(items)
+
+        async def run():
+            coalescer = Coalescer("test", flush, 10.0, 10.0, 2)
+            coalescer.add("a", 1)
+            coalescer.add("a", 2)
+            await asyncio.sleep(0)
+            self.assertEqual(coalescer.pending(), 0)
+
+        self.run_async(run())
+        self.assertEqual(flushed, [[1, 2]])
+
+    def test_max_delay_bounds_window(self):
+        flushed = []
+
+        async def flush(key, items):
+            flushed.append(items)
+
+        async def run():
+            coalescer = Coalescer("test", flush, 0.05, 0.1, 100)
+            # Keeps the key busy for longer than max_delay
+            for i in range(6):
+                coalescer.add("a", i)
+                await asyncio.sleep(0.03)
+            await asyncio.sleep(0.1)
+
+        self.run_async(run())
+        self.assertGreater(len(flushed), 1)
+        self.assertEqual(sum(flushed, []), list(range(6)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,14 @@
 import unittest
+import asyncio
 import os
+from unittest.mock import AsyncMock, patch
 from datetime import datetime, timezone
-from db.core import init_db, add_user, get_user, set_user_safe
+from db.core import init_db, add_user, get_user, set_user_safe, get_excluded_threads
+from db.models import Chat
 from db.models import db
+from db import async_core
+from db.trust_index import TrustIndex
+from bot.services.link_reputation import LinkReputationIndex
 
 class TestDB(unittest.TestCase):
     def setUp(self):
@@ -37,5 +43,119 @@ class TestDB(unittest.TestCase):
         user = get_user(2, 100)
         self.assertEqual(user.is_safe, True)
 
+    def test_async_wrappers(self):
+        async def run():
+            await async_core.add_user(3, 100, datetime.now(timezone.utc), False)
+            user = await async_core.get_user(3, 100)
+            # Release the DB worker thread's connection to the test file
+            await async_core.run_db(db.close)
+            return user
+
+        loop = asyncio.new_event_loop()
+        user = loop.run_until_complete(run())
+        loop.close()
+
+        self.assertEqual(user.user_id, 3)
+
+    def test_link_bans_count_distinct_users(self):
+        async def run():
+            for user_id in (1, 1, 2, 3):
+                await async_core.record_link_verdicts(["invite:abc"], True, user_id)
+            await async_core.record_link_verdicts(["invite:abc"], False)
+            index = LinkReputationIndex(min_bans=3)
+            await index.warm_up()
+            await async_core.run_db(db.close)
+            return index
+
+        loop = asyncio.new_event_loop()
+        index = loop.run_until_complete(run())
+        loop.close()
+
+        self.assertEqual(index.bad_links({"invite:abc"}), ["invite:abc"])
+        index.record({"invite:abc"}, banned=False)
+        index.record({"invite:abc"}, banned=False)
+        # Three banned users no longer outnumber three safe verdicts
+        self.assertEqual(index.bad_links({"invite:abc"}), [])
+
+    def test_buffered_counters(self):
+        async def run():
+            await async_core.add_user(4, 100, datetime.now(timezone.utc), False)
+            await async_core.increment_message_count(4, 100)
+            await async_core.increment_message_count(4, 100)
+            await async_core.increment_message_count(5, 100)
+            await async_core.increment_blocked_count(chat_id=100)
+
+            # Buffered increments are visible before the flush
+            pending = await async_core.get_message_count(4, 100)
+            await async_core.flush_counters()
+            flushed = await async_core.get_message_count(4, 100)
+            new_user = await async_core.get_user(5, 100)
+            blocked = await async_core.get_blocked_count()
+            await async_core.run_db(db.close)
+            return pending, flushed, new_user, blocked
+
+        loop = asyncio.new_event_loop()
+        pending, flushed, new_user, blocked = loop.run_until_complete(run())
+        loop.close()
+
+        self.assertEqual(pending, 2)
+        self.assertEqual(flushed, 2)
+        self.assertEqual(new_user.messages_count, 1)
+        self.assertEqual(blocked, 1)
+
+    def test_trust_index(self):
+        async def run():
+            await async_core.add_user(6, 100, datetime.now(timezone.utc), False)
+            await async_core.add_user(7, 100, None, True)
+            await async_core.increment_message_count(6, 100)
+            await async_core.flush_counters()
+            await async_core.warm_up_trust_index()
+
+            with patch.object(
+                async_core, "get_user", AsyncMock(side_effect=async_core.get_user)
+            ) as get_user_mock:
+                # Second message makes user 6 trusted, without a DB read after the flush
+                await async_core.increment_message_count(6, 100)
+                trusted = await async_core.is_trusted_member(6, 100)
+                unknown = await async_core.is_trusted_member(8, 100)
+                db_reads = get_user_mock.await_count
+            safe = trust_index.is_safe(7, 100)
+            await async_core.run_db(db.close)
+            return trusted, unknown, db_reads, safe
+
+        loop = asyncio.new_event_loop()
+        with patch.object(async_core, "trust_index", TrustIndex()) as trust_index:
+            trusted, unknown, db_reads, safe = loop.run_until_complete(run())
+        loop.close()
+
+        self.assertTrue(trusted)
+        self.assertFalse(unknown)
+        # Only the count lookup of the increment that made user 6 trusted
+        self.assertEqual(db_reads, 1)
+        self.assertTrue(safe)
+
+    def test_excluded_threads_migration(self):
+        Chat.create(chat_id=200, threads_to_exclude="[12, 34]")
+        db.close()
+        init_db()
+
+        self.assertEqual(sorted(get_excluded_threads(200)), [12, 34])
+        self.assertEqual(Chat.get_by_id(200).threads_to_exclude, "[]")
+
+    def test_excluded_threads_cache(self):
+        async def run():
+            before = await async_core.is_thread_excluded(300, 7)
+            await async_core.update_excluded_threads(300, [7, 8])
+            after = await async_core.is_thread_excluded(300, 7)
+            await async_core.run_db(db.close)
+            return before, after
+
+        loop = asyncio.new_event_loop()
+        before, after = loop.run_until_complete(run())
+        loop.close()
+
+        self.assertFalse(before)
+        self.assertTrue(after)
+
 if __name__ == '__main__':
     unittest.main()
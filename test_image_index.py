@@ -0,0 +1,50 @@
+import unittest
+import io
+from PIL import Image, ImageDraw
+from bot.services.image_index import ImageVerdictIndex, dhash
+
+
+def make_image(size=(400, 300), fmt="PNG", **save_args) -> bytes:
+    image = Image.new("RGB", (400, 300), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((50, 50, 200, 200), fill="red")
+    draw.ellipse((220, 80, 380, 260), fill="blue")
+    buffer = io.BytesIO()
+    image.resize(size).save(buffer, fmt, **save_args)
+    return buffer.getvalue()
+
+
+def make_other_image() -> bytes:
+    buffer = io.BytesIO()
+    Image.linear_gradient("L").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class TestImageIndex(unittest.TestCase):
+    def test_dhash_survives_reencoding(self):
+        original = dhash(make_image())
+        reencoded = dhash(make_image((390, 290), "JPEG", quality=40))
+        self.assertLessEqual(bin(original ^ reencoded).count("1"), 6)
+        self.assertGreater(bin(original ^ dhash(make_other_image())).count("1"), 6)
+
+    def test_file_id_lookup(self):
+        index = ImageVerdictIndex(max_size=2, max_distance=6)
+        self.assertIsNone(index.get("A"))
+        index.record("A", None, 0.1)
+        self.assertEqual(index.get("A"), 0.1)
+
+        index.record("B", None, 0.2)
+        index.record("C", None, 0.3)
+        self.assertIsNone(index.get("A"))
+
+    def test_only_scam_hashes_matched(self):
+        index = ImageVerdictIndex(max_size=10, max_distance=6)
+        index.record("safe", dhash(make_other_image()), 0.1)
+        index.record("scam", dhash(make_image()), 0.95)
+
+        self.assertEqual(index.match_scam(dhash(make_image((390, 290), "JPEG", quality=40))), 0.95)
+        self.assertIsNone(index.match_scam(dhash(make_other_image())))
+
+
+if __name__ == "__main__":
+    unittest.main()
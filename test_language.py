@@ -21,5 +21,28 @@ class TestLanguageService(unittest.TestCase):
         # Mixed/Ambiguous (should default to False or whatever langdetect says, usually robust)
         self.assertFalse(service.is_russian("12345")) # Numbers usually not detected as RU
 
+    def test_fast_path(self):
+        # No Cyrillic at all
+        self.assertFalse(LanguageService.fast_path("Hello, how are you?"))
+        self.assertFalse(LanguageService.fast_path("שלום לכולם"))
+        # Letters unique to Ukrainian
+        self.assertFalse(LanguageService.fast_path("Привіт, як справи?"))
+        # Letters unique to Russian
+        self.assertTrue(LanguageService.fast_path("Это русский текст."))
+        # Russian-only letters in a name don't make an English message Russian
+        self.assertIsNone(
+            LanguageService.fast_path("Hey all, anyone selling a bike? Contact Катя Соловьёва")
+        )
+        # Undecided by script alone
+        self.assertIsNone(LanguageService.fast_path("Привет, как дела?"))
+
+    def test_lingua_tiers(self):
+        service = LanguageService()
+
+        self.assertTrue(service.is_russian("Привет, как дела?"))
+        self.assertTrue(service.is_russian("Привет, как дела?"))
+        # Second call is served from the cache
+        self.assertEqual(service._detect_cached.cache_info().hits, 1)
+
 if __name__ == '__main__':
     unittest.main()
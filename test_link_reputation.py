@@ -0,0 +1,74 @@
+import unittest
+from datetime import datetime
+from telegram import Chat, Message, MessageEntity
+from bot.services.link_reputation import (
+    LinkReputationIndex,
+    extract_link_keys,
+    link_key,
+    registered_domain,
+)
+
+
+def make_message(text: str, entities: list[MessageEntity], caption: bool = False) -> Message:
+    chat = Chat(id=1, type="supergroup")
+    if caption:
+        return Message(1, datetime.now(), chat, caption=text, caption_entities=entities)
+    return Message(1, datetime.now(), chat, text=text, entities=entities)
+
+
+class TestLinkReputation(unittest.TestCase):
+    def test_registered_domain(self):
+        self.assertEqual(registered_domain("www.Example.com"), "example.com")
+        self.assertEqual(registered_domain("a.b.example.co.uk"), "example.co.uk")
+        self.assertEqual(registered_domain("scam.github.io"), "scam.github.io")
+        self.assertEqual(registered_domain("10.0.0.1"), "10.0.0.1")
+
+    def test_link_key(self):
+        self.assertEqual(link_key("https://promo.bonus-usdt.com/claim?id=1"), "domain:bonus-usdt.com")
+        self.assertEqual(link_key("t.me/Claim_Bot"), "handle:claim_bot")
+        self.assertEqual(link_key("https://t.me/+AbCdEf"), "invite:AbCdEf")
+        self.assertEqual(link_key("https://t.me/joinchat/AbCdEf"), "invite:AbCdEf")
+        self.assertIsNone(link_key("https://t.me/c/123/45"))
+
+    def test_extract_link_keys(self):
+        text = "Bonus at site.example.com, ask @Helper or click here"
+        entities = [
+            MessageEntity(MessageEntity.URL, 9, 16),
+            MessageEntity(MessageEntity.MENTION, 31, 7),
+            MessageEntity(MessageEntity.TEXT_LINK, 48, 4, url="https://t.me/prize_bot"),
+        ]
+        expected = {"domain:example.com", "handle:helper", "handle:prize_bot"}
+
+        self.assertEqual(extract_link_keys(make_message(text, entities)), expected)
+        self.assertEqual(extract_link_keys(make_message(text, entities, caption=True)), expected)
+        self.assertEqual(extract_link_keys(make_message("no links", [])), set())
+
+    def test_reputation(self):
+        index = LinkReputationIndex(trusted_domains=["google.com"], min_bans=2, min_safe=3)
+
+        index.record({"domain:scam.com"}, banned=True, user_id=1)
+        # The same scammer again is still one user
+        index.record({"domain:scam.com"}, banned=True, user_id=1)
+        self.assertEqual(index.bad_links({"domain:scam.com"}), [])
+        index.record({"domain:scam.com", "handle:claim_bot"}, banned=True, user_id=2)
+        index.record({"handle:claim_bot"}, banned=True, user_id=1)
+        self.assertEqual(index.bad_links({"domain:scam.com", "domain:other.com"}), ["domain:scam.com"])
+
+        # Bad handles don't ban on their own
+        self.assertEqual(index.bad_links({"handle:claim_bot"}), [])
+        self.assertTrue(index.any_bad({"handle:claim_bot"}))
+        self.assertFalse(index.any_bad({"domain:other.com"}))
+
+        for _ in range(3):
+            index.record({"domain:news.com"}, banned=False)
+        self.assertTrue(index.all_good({"domain:news.com", "domain:docs.google.com"}))
+        self.assertFalse(index.all_good({"domain:news.com", "handle:claim_bot"}))
+        self.assertFalse(index.all_good(set()))
+
+        # Trusted domains never turn bad
+        index.record({"domain:google.com"}, banned=True, user_id=1)
+        index.record({"domain:google.com"}, banned=True, user_id=2)
+        self.assertEqual(index.bad_links({"domain:google.com"}), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import os
+import tempfile
+from bot.services.local_classifier import LocalClassifier, build_dataset
+
+SCAM = [
+    "Congratulations! You won {} USDT in our giveaway, write to @claim_bot",
+    "Earn {}$ a day from home, no experience needed, DM me",
+    "Удаленная работа, доход от {}$ в неделю, пишите в лс",
+]
+SAFE = [
+    "Does anyone know a good dentist near station {}?",
+    "Привіт всім, хто йде на зустріч о {}?",
+    "The bus number {} is late again today",
+]
+
+
+def make_samples():
+    samples = []
+    for i in range(60):
+        samples.append((SCAM[i % 3].format(i * 7), 1))
+        samples.append((SAFE[i % 3].format(i), 0))
+    return samples
+
+
+class TestLocalClassifier(unittest.TestCase):
+    def test_train_and_predict(self):
+        model = LocalClassifier(bits=16).train(make_samples())
+
+        self.assertGreater(model.predict("You won 900 USDT, write to @prize_bot now"), 0.9)
+        self.assertLess(model.predict("Is the bus number 5 late today?"), 0.1)
+
+    def test_save_load_roundtrip(self):
+        model = LocalClassifier(bits=16).train(make_samples())
+        text = "Earn 500$ a day, DM me"
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "model.json")
+            model.save(path)
+            loaded = LocalClassifier()
+            self.assertTrue(loaded.load(path))
+
+        self.assertEqual(loaded.bits, 16)
+        self.assertAlmostEqual(loaded.predict(text), model.predict(text), places=5)
+
+    def test_missing_model(self):
+        model = LocalClassifier()
+        self.assertFalse(model.load("/nonexistent/model.json"))
+        self.assertFalse(model.loaded)
+
+    def test_build_dataset_labels(self):
+        def verdict(user_id, text, score, label, source):
+            return {
+                "chat_id": 1,
+                "user_id": user_id,
+                "text": text,
+                "score": score,
+                "label": label,
+                "source": source,
+            }
+
+        verdicts = [
+            # Admin /unban_user overrides the Gemini verdict
+            verdict(1, "selling my bike", 0.9, 0, "gemini"),
+            verdict(2, "free usdt", 0.95, None, "gemini"),
+            verdict(2, "free usdt", None, 1, "ban"),
+            verdict(3, "hello", 0.1, None, "gemini"),
+            verdict(4, "banned by the model", None, 1, "local"),
+        ]
+
+        dataset = sorted(build_dataset(verdicts))
+
+        self.assertEqual(dataset, [("free usdt", 1), ("hello", 0), ("selling my bike", 0)])
+        self.assertEqual(len(build_dataset(verdicts, include_local=True)), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
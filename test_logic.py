@@ -1,7 +1,10 @@
 import unittest
 import asyncio
-from unittest.mock import MagicMock, patch
+import io
+from PIL import Image
+from unittest.mock import AsyncMock, MagicMock, patch
 from bot.services.gemini_service import GeminiService
+from bot.services.gemini_batcher import GeminiBatcher
 
 class TestGeminiService(unittest.TestCase):
     def test_gemini_parsing(self):
@@ -19,7 +22,7 @@ class TestGeminiService(unittest.TestCase):
         result = loop.run_until_complete(service.analyze_content("test"))
         loop.close()
         
-        self.assertEqual(result, 0.8)
+        self.assertEqual(result, (0.8, "gemini"))
 
     def test_gemini_parsing_markdown(self):
         service = GeminiService()
@@ -34,7 +37,140 @@ class TestGeminiService(unittest.TestCase):
         result = loop.run_until_complete(service.analyze_content("test"))
         loop.close()
         
-        self.assertEqual(result, 0.2)
+        self.assertEqual(result, (0.2, "gemini"))
+
+
+class TestGeminiBatching(unittest.TestCase):
+    def make_service(self, *response_texts):
+        service = GeminiService(model_tiers=[{"model": "cheap", "timeout": 1.0}])
+        service.client = MagicMock()
+        responses = [MagicMock(text=text) for text in response_texts]
+        service.client.aio.models.generate_content = AsyncMock(side_effect=responses)
+        service.batcher = GeminiBatcher(service.analyze_batch, max_size=3, window_seconds=0.05)
+        return service
+
+    def test_batch_routes_scores(self):
+        service = self.make_service(
+            '[{"id": 0, "scam": 0.1}, {"id": 1, "scam": 0.9}, {"id": 2, "scam": 0.5}]'
+        )
+
+        async def run():
+            return await asyncio.gather(
+                service.analyze_content("hello"),
+                service.analyze_content("free crypto"),
+                service.analyze_content("maybe"),
+            )
+
+        loop = asyncio.new_event_loop()
+        scores = loop.run_until_complete(run())
+        loop.close()
+
+        self.assertEqual([score for score, _ in scores], [0.1, 0.9, 0.5])
+        self.assertEqual(service.client.aio.models.generate_content.await_count, 1)
+
+    def test_missing_item_retried_singly(self):
+        service = self.make_service(
+            '```json\n[{"id": 0, "scam": 0.2}]\n```',
+            '{"scam": 0.8}',
+        )
+
+        async def run():
+            return await asyncio.gather(
+                service.analyze_content("first"),
+                service.analyze_content("second"),
+            )
+
+        loop = asyncio.new_event_loop()
+        scores = loop.run_until_complete(run())
+        loop.close()
+
+        self.assertEqual([score for score, _ in scores], [0.2, 0.8])
+        self.assertEqual(service.client.aio.models.generate_content.await_count, 2)
+
+
+class TestGeminiCascade(unittest.TestCase):
+    def make_service(self, scores_by_model):
+        service = GeminiService(
+            model_tiers=[
+                {"model": "cheap", "timeout": 1.0},
+                {"model": "strong", "timeout": 1.0},
+            ]
+        )
+        service.client = MagicMock()
+        service.batcher = None
+
+        async def generate_content(model, contents, config):
+            return MagicMock(text='{"scam": %s}' % scores_by_model[model])
+
+        service.client.aio.models.generate_content = AsyncMock(side_effect=generate_content)
+        return service
+
+    def test_clear_result_not_escalated(self):
+        service = self.make_service({"cheap": 0.05, "strong": 0.9})
+
+        loop = asyncio.new_event_loop()
+        score, _ = loop.run_until_complete(service.analyze_content("hello"))
+        loop.close()
+
+        self.assertEqual(score, 0.05)
+        self.assertEqual(service.client.aio.models.generate_content.await_count, 1)
+
+    def test_ambiguous_result_escalated(self):
+        service = self.make_service({"cheap": 0.7, "strong": 0.95})
+
+        loop = asyncio.new_event_loop()
+        score, _ = loop.run_until_complete(service.analyze_content("maybe scam"))
+        loop.close()
+
+        self.assertEqual(score, 0.95)
+        self.assertEqual(service.client.aio.models.generate_content.await_count, 2)
+
+class TestGeminiRequestConfig(unittest.TestCase):
+    def test_structured_request(self):
+        service = GeminiService(
+            model_tiers=[{"model": "cheap", "timeout": 1.0, "thinking_budget": 0}]
+        )
+        service.client = MagicMock()
+        service.batcher = None
+        service.client.aio.models.generate_content = AsyncMock(
+            return_value=MagicMock(text='{"scam": 0.3}')
+        )
+
+        loop = asyncio.new_event_loop()
+        score, _ = loop.run_until_complete(service.analyze_content("hello there"))
+        loop.close()
+
+        self.assertEqual(score, 0.3)
+        kwargs = service.client.aio.models.generate_content.await_args.kwargs
+        # Instructions live in the prebuilt config, only the message is sent
+        self.assertEqual(kwargs["contents"], ["Message Text: hello there"])
+        self.assertIs(kwargs["config"], service.configs["cheap"]["single"])
+        self.assertEqual(kwargs["config"].response_mime_type, "application/json")
+        self.assertIsNotNone(kwargs["config"].response_schema)
+
+    def test_album_single_request(self):
+        service = GeminiService(
+            model_tiers=[{"model": "cheap", "timeout": 1.0, "thinking_budget": 0}]
+        )
+        service.client = MagicMock()
+        service.batcher = None
+        service.client.aio.models.generate_content = AsyncMock(
+            return_value=MagicMock(text='{"scam": 0.9}')
+        )
+        buffer = io.BytesIO()
+        Image.new("RGB", (100, 100), "red").save(buffer, "PNG")
+        images = [buffer.getvalue()] * 3
+
+        loop = asyncio.new_event_loop()
+        score, _ = loop.run_until_complete(
+            service.analyze_content("album", images, image_id="a,b,c")
+        )
+        loop.close()
+
+        self.assertEqual(score, 0.9)
+        service.client.aio.models.generate_content.assert_awaited_once()
+        contents = service.client.aio.models.generate_content.await_args.kwargs["contents"]
+        self.assertEqual(len(contents), 4)
 
 if __name__ == '__main__':
     unittest.main()
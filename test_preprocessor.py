@@ -0,0 +1,46 @@
+import unittest
+import io
+from types import SimpleNamespace
+from PIL import Image
+from bot.services.content_preprocessor import select_photo, prepare_image, truncate_text
+
+
+class TestContentPreprocessor(unittest.TestCase):
+    def test_select_photo(self):
+        photos = [
+            SimpleNamespace(width=90, height=67),
+            SimpleNamespace(width=320, height=240),
+            SimpleNamespace(width=800, height=600),
+            SimpleNamespace(width=1280, height=960),
+        ]
+        self.assertEqual(select_photo(photos).width, 800)
+        # Nothing large enough -> largest available
+        self.assertEqual(select_photo(photos[:2]).width, 320)
+
+    def test_prepare_image_downscales(self):
+        buffer = io.BytesIO()
+        Image.new("RGB", (2000, 1000), "blue").save(buffer, "PNG")
+
+        image_bytes, mime_type = prepare_image(buffer.getvalue())
+
+        image = Image.open(io.BytesIO(image_bytes))
+        self.assertEqual(mime_type, "image/jpeg")
+        self.assertEqual(image.size, (800, 400))
+
+    def test_truncate_text_keeps_links(self):
+        text = "Start " + "blah " * 500 + "visit https://scam.example/win and @claim_bot " + "blah " * 500 + "End"
+
+        truncated = truncate_text(text, max_chars=300)
+
+        self.assertLess(len(truncated), 450)
+        self.assertTrue(truncated.startswith("Start"))
+        self.assertTrue(truncated.endswith("@claim_bot"))
+        self.assertIn("https://scam.example/win", truncated)
+        self.assertIn("End", truncated)
+
+    def test_short_text_untouched(self):
+        self.assertEqual(truncate_text("hello", max_chars=300), "hello")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+from google.genai import errors
+from bot.services.rate_scheduler import (
+    RateScheduler,
+    PRIORITY_NEW_USER,
+    PRIORITY_TRUSTED,
+)
+from bot.services.gemini_service import GeminiService
+
+
+class TestRateScheduler(unittest.TestCase):
+    def run_async(self, coro):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+    def test_priority_order(self):
+        scheduler = RateScheduler(global_rate=20, global_burst=1, chat_rate=100, chat_burst=100)
+        served = []
+
+        async def request(name, priority):
+            await scheduler.acquire(1, priority)
+            served.append(name)
+
+        async def run():
+            await scheduler.acquire(1)  # uses the only token
+            await asyncio.gather(
+                request("trusted", PRIORITY_TRUSTED),
+                request("new", PRIORITY_NEW_USER),
+            )
+
+        self.run_async(run())
+        self.assertEqual(served, ["new", "trusted"])
+
+    def test_flooded_chat_does_not_block_others(self):
+        scheduler = RateScheduler(global_rate=100, global_burst=100, chat_rate=1, chat_burst=1)
+        served = []
+
+        async def request(chat_id):
+            await scheduler.acquire(chat_id)
+            served.append(chat_id)
+
+        async def run():
+            await scheduler.acquire(1)
+            waiting = asyncio.ensure_future(request(1))
+            await asyncio.wait_for(request(2), timeout=0.2)
+            self.assertFalse(waiting.done())
+            waiting.cancel()
+            await asyncio.sleep(0.01)
+            self.assertEqual(scheduler.queue_depth(), 0)
+
+        self.run_async(run())
+        self.assertEqual(served, [2])
+
+    def test_rate_limited_request_is_retried(self):
+        service = GeminiService(
+            model_tiers=[{"model": "cheap", "timeout": 1.0, "thinking_budget": 0}]
+        )
+        service.client = MagicMock()
+        service.batcher = None
+        service.client.aio.models.generate_content = AsyncMock(
+            side_effect=[
+                errors.APIError(429, {"error": {"message": "quota"}}),
+                MagicMock(text='{"scam": 0.9}'),
+            ]
+        )
+
+        with patch("bot.services.gemini_service.GEMINI_RATE_LIMIT_BACKOFF_SECONDS", 0.01), patch(
+            "bot.services.gemini_service.record_verdict", AsyncMock()
+        ):
+            score = self.run_async(service.analyze_content("hello", chat_id=1))
+
+        self.assertEqual(score, (0.9, "gemini"))
+        self.assertEqual(service.client.aio.models.generate_content.await_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
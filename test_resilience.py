@@ -0,0 +1,136 @@
+import unittest
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+from bot.services.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from bot.services.fallback_classifier import FallbackClassifier
+from bot.services.gemini_service import GeminiService
+from bot.services.metrics import metrics
+
+
+def make_service(timeout=1.0):
+    service = GeminiService(
+        model_tiers=[{"model": "cheap", "timeout": timeout, "thinking_budget": 0}]
+    )
+    service.client = MagicMock()
+    service.batcher = None
+    return service
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_on_failures_and_recovers(self):
+        breaker = CircuitBreaker("test", window=4, min_calls=4, failure_rate=0.5, open_seconds=0)
+        for _ in range(2):
+            breaker.record_success(0.1)
+        for _ in range(2):
+            breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+
+        # open_seconds elapsed -> one probe only
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertFalse(breaker.allow_request())
+
+        breaker.record_success(0.1)
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertTrue(breaker.allow_request())
+
+    def test_opens_on_slow_calls(self):
+        breaker = CircuitBreaker(
+            "test", window=4, min_calls=4, slow_call_seconds=1.0, slow_call_rate=0.75
+        )
+        for _ in range(3):
+            breaker.record_success(2.0)
+        breaker.record_success(0.1)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow_request())
+
+
+class TestGeminiResilience(unittest.TestCase):
+    def run_async(self, coro):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+    def test_open_breaker_uses_fallback(self):
+        service = make_service()
+        service.client.aio.models.generate_content = AsyncMock()
+        service.breaker.state = OPEN
+        service.breaker._opened_at = float("inf")
+        text = "Congratulations! You won 500 USDT in our giveaway, write to @claim_bot"
+
+        score, source = self.run_async(service.analyze_content(text))
+
+        service.client.aio.models.generate_content.assert_not_awaited()
+        self.assertEqual(score, FallbackClassifier().score(text))
+        self.assertEqual(source, "fallback")
+        self.assertEqual(
+            self.run_async(service.analyze_content(text, local_fallback=False)),
+            (None, "fallback"),
+        )
+        # Nothing to score without the model
+        self.assertEqual(
+            self.run_async(service.analyze_content(None, b"image", image_id="photo")),
+            (None, "fallback"),
+        )
+
+    def test_cancelled_probe_frees_breaker(self):
+        service = make_service()
+        service.client.aio.models.generate_content = AsyncMock(
+            return_value=MagicMock(text='{"scam": 0.1}')
+        )
+        service.breaker.state = OPEN
+        service.breaker._opened_at = float("-inf")
+        queued = asyncio.Event()
+
+        async def acquire(chat_id, priority):
+            queued.set()
+            await asyncio.sleep(10)
+
+        async def run():
+            # The half-open probe is cancelled while it waits for the rate scheduler
+            with patch.object(service.scheduler, "acquire", acquire):
+                probe = asyncio.ensure_future(service.analyze_content("probe"))
+                await queued.wait()
+                probe.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await probe
+            return await service.analyze_content("next")
+
+        self.assertEqual(self.run_async(run()), (0.1, "gemini"))
+        self.assertEqual(service.breaker.state, CLOSED)
+
+    def test_timeout_falls_back(self):
+        service = make_service(timeout=0.05)
+
+        async def slow(**kwargs):
+            await asyncio.sleep(1)
+
+        service.client.aio.models.generate_content = slow
+        score, _ = self.run_async(service.analyze_content("Earn 300$ a day, write me in pm"))
+        self.assertGreater(score, 0.0)
+
+    def test_hedged_request_wins(self):
+        service = make_service()
+        service.hedging = True
+        for _ in range(30):
+            metrics.observe("gemini.latency.cheap", 0.01)
+        calls = []
+
+        async def generate(**kwargs):
+            calls.append(None)
+            # The first request is stuck, the hedge answers quickly
+            await asyncio.sleep(5 if len(calls) == 1 else 0.01)
+            return MagicMock(text='{"scam": 0.2}')
+
+        service.client.aio.models.generate_content = generate
+        with patch("bot.services.gemini_service.GEMINI_HEDGE_MIN_DELAY_SECONDS", 0.05):
+            score, _ = self.run_async(service.analyze_content("hedge me"))
+
+        self.assertEqual(score, 0.2)
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+import asyncio
+import os
+import re
+import tempfile
+from bot.services.rule_engine import (
+    AhoCorasick,
+    CompiledRules,
+    RuleEngine,
+    normalize_text,
+    fold_homoglyphs,
+    literal_anchor,
+    parse_rules,
+)
+
+
+class TestRuleEngine(unittest.TestCase):
+    def test_normalization(self):
+        # Zero-width space, fullwidth letters, Cyrillic "С" and "Т"
+        text = "FREE\u200b \uff35\uff33D\u0422   gift"
+        self.assertEqual(fold_homoglyphs(normalize_text(text)), "free usdt gift")
+
+    def test_aho_corasick_finds_all_patterns(self):
+        automaton = AhoCorasick([("he", 1), ("she", 2), ("his", 3), ("hers", 4)])
+        self.assertEqual(sorted(automaton.find("ushers")), [1, 2, 4])
+        self.assertEqual(list(automaton.find("nothing here?")), [1])
+        self.assertEqual(list(AhoCorasick([]).find("text")), [])
+
+    def test_compiled_rules_best_match(self):
+        rules = CompiledRules(
+            parse_rules(
+                [
+                    "# comment",
+                    "phrase 0.6 usdt giveaway",
+                    "phrase 0.95 write to the admin",
+                    r"regex 0.9 \bt[1-9a-hj-np-z]{33}\b",
+                    "regex 0.5 (",
+                    "unknown 0.5 x",
+                ]
+            )
+        )
+
+        self.assertEqual(len(rules.rules), 3)
+        self.assertEqual(rules.match("Big USDT gi\u200bveaway").score, 0.6)
+        self.assertEqual(rules.match("USDT giveaway, wr\u0456te to the \u0430dmin").score, 0.95)
+        self.assertEqual(
+            rules.match("send to TQ5NMJNk1EZvrXMU1mW2ZU6PdHtE1pMFNq now").score, 0.9
+        )
+        self.assertIsNone(rules.match("hello everyone"))
+
+    def test_regex_rules_compile_separately(self):
+        rules = CompiledRules(
+            parse_rules(
+                [
+                    "regex 0.9 (?i)airdrop",
+                    r"regex 0.8 (?P<amount>\d+) usdt",
+                    r"regex 0.85 (?P<amount>\d+)\$ a day",
+                    "regex 0.9 a(?i)b",
+                ]
+            )
+        )
+
+        # Only the rule with a misplaced flag is skipped
+        self.assertEqual(len(rules.rules), 3)
+        self.assertEqual(rules.match("Claim the AIRDROP").score, 0.9)
+        self.assertEqual(rules.match("Send 500 USDT").score, 0.8)
+        self.assertEqual(rules.match("Earn 300$ a day").score, 0.85)
+
+    def test_regex_prefilter(self):
+        self.assertEqual(literal_anchor(re.compile(r"FREE\s+(usdt|btc)", re.I)), "free")
+        self.assertEqual(literal_anchor(re.compile(r"win (?:big )?prize")), "prize")
+        self.assertEqual(literal_anchor(re.compile(r"(bonus|gift)")), "")
+
+        lines = [rf"regex 0.9 \bpromo{i}x\b" for i in range(2000)] + ["regex 0.8 (bonus|gift)"]
+        rules = CompiledRules(parse_rules(lines))
+        self.assertEqual(rules.unanchored, [2000])
+        self.assertEqual(rules.match("use code PROMO1234X today").line, 1235)
+        self.assertEqual(rules.match("a gift for you").score, 0.8)
+        self.assertIsNone(rules.match("promo codes"))
+
+    def test_shadow_rules_do_not_ban(self):
+        engine = RuleEngine(path="/nonexistent/rules.txt")
+        engine.compiled = CompiledRules(parse_rules(["phrase 0.5 usdt giveaway"]))
+        self.assertIsNone(engine.match("usdt giveaway"))
+
+    def test_hot_reload(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "rules.txt")
+            with open(path, "w") as f:
+                f.write("phrase 0.95 free crypto\n")
+            engine = RuleEngine(path=path)
+            engine.load()
+            self.assertIsNotNone(engine.match("Free crypto here"))
+
+            with open(path, "w") as f:
+                f.write("phrase 0.95 easy money\n")
+            os.utime(path, (engine._mtime + 1, engine._mtime + 1))
+
+            loop = asyncio.new_event_loop()
+            loop.run_until_complete(engine.reload_if_changed())
+            loop.close()
+
+            self.assertIsNone(engine.match("Free crypto here"))
+            self.assertIsNotNone(engine.match("Easy money!"))
+
+
+if __name__ == "__main__":
+    unittest.main()
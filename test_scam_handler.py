@@ -0,0 +1,273 @@
+import unittest
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+from bot.handlers import scam_handler
+from bot.handlers.scam_pipeline import MessageCheck
+from bot.services.image_index import ImageVerdictIndex
+from db.trust_index import TrustIndex
+
+
+def make_update(text=None, photo_id=None, user_id=1, message_id=1, caption=None):
+    update = MagicMock()
+    message = update.message
+    message.text = text
+    message.caption = caption
+    message.message_id = message_id
+    message.message_thread_id = None
+    message.media_group_id = None
+    message.from_user.id = user_id
+    message.chat.id = 100
+    message.chat.type = "group"
+    message.photo = [MagicMock(file_unique_id=photo_id, width=800, height=600)] if photo_id else []
+    context = MagicMock()
+    context.bot.delete_messages = AsyncMock()
+    context.bot.ban_chat_member = AsyncMock()
+    return update, context
+
+
+def make_check(text=None, photo_id=None, user_id=1, message_id=1) -> MessageCheck:
+    update, context = make_update(text, photo_id, user_id, message_id)
+    return MessageCheck(update, context, scam_handler.INPUT_LOADERS)
+
+
+class TestScamHandler(unittest.TestCase):
+    def run_async(self, coro):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+    def setUp(self):
+        self.image_index = ImageVerdictIndex(max_size=10, max_distance=6)
+        self.ban = AsyncMock()
+        self.registry_add = AsyncMock()
+        self.patches = [
+            patch.object(scam_handler, "image_index", self.image_index),
+            patch.object(scam_handler, "_ban_and_delete", self.ban),
+            patch.object(
+                scam_handler,
+                "_get_image_data",
+                AsyncMock(side_effect=lambda update: b"image" if update.message.photo else None),
+            ),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def analyze(self, check, score, source="gemini"):
+        async def run():
+            with patch.object(
+                scam_handler.gemini_service, "analyze_content", AsyncMock(return_value=(score, source))
+            ), patch.object(scam_handler.scam_index, "add"):
+                return await scam_handler._llm(check)
+
+        return self.run_async(run())
+
+    def test_image_verdict_needs_an_image_only_message(self):
+        self.analyze(make_check("Win free USDT", photo_id="meme"), 0.95)
+        self.assertIsNone(self.image_index.get("meme"))
+
+        self.analyze(make_check(photo_id="flyer"), 0.95)
+        self.assertEqual(self.image_index.get("flyer"), 0.95)
+
+    def test_known_scam_image_with_text_is_analyzed(self):
+        self.image_index.record("flyer", None, 0.95)
+
+        with_text = make_check("Look at this", photo_id="flyer")
+        image_only = make_check(photo_id="flyer")
+
+        self.assertFalse(self.run_async(scam_handler._known_image(with_text)))
+        self.assertTrue(self.run_async(scam_handler._known_image(image_only)))
+        # The image goes to Gemini together with the text
+        self.assertEqual(self.run_async(with_text.get("image_data")), b"image")
+
+    def analyze_burst(self, checks, score, source="gemini"):
+        async def run():
+            with patch.object(
+                scam_handler.gemini_service, "analyze_content", AsyncMock(return_value=(score, source))
+            ) as analyze_content, patch.object(
+                scam_handler, "_post_analysis", AsyncMock()
+            ) as post_analysis, patch.object(
+                scam_handler, "scam_index", MagicMock()
+            ) as scam_index, patch.object(
+                scam_handler, "increment_blocked_count", AsyncMock()
+            ), patch.object(
+                scam_handler, "record_verdict", AsyncMock()
+            ), patch.object(
+                scam_handler.scammer_registry, "add", self.registry_add
+            ):
+                await scam_handler._analyze_group(("burst", 100, 1), checks)
+            return analyze_content, post_analysis, scam_index
+
+        return self.run_async(run())
+
+    def make_burst(self):
+        texts = ["Hello everyone, nice to meet all of you here", "Free USDT", "write @claim_bot"]
+        return [make_check(text, message_id=i + 1) for i, text in enumerate(texts)]
+
+    def test_safe_burst_allows_every_message(self):
+        checks = self.make_burst()
+
+        analyze_content, post_analysis, _ = self.analyze_burst(checks, 0.1)
+
+        analyze_content.assert_awaited_once()
+        self.assertEqual(analyze_content.await_args.args[0], "\n".join(c.text for c in checks))
+        self.assertEqual([call.args[0] for call in post_analysis.await_args_list], checks)
+
+    def test_scam_burst_deletes_all_messages_at_once(self):
+        checks = self.make_burst()
+        bot = checks[0].context.bot
+
+        _, post_analysis, scam_index = self.analyze_burst(checks, 0.95)
+
+        bot.delete_messages.assert_awaited_once_with(chat_id=100, message_ids=[1, 2, 3])
+        bot.ban_chat_member.assert_awaited_once_with(chat_id=100, user_id=1)
+        self.registry_add.assert_awaited_once()
+        post_analysis.assert_not_awaited()
+        # Only the combined text becomes a template, not the greeting alone
+        scam_index.add.assert_called_once_with("\n".join(c.text for c in checks), 0.95)
+
+    def test_fallback_scores_are_not_learned(self):
+        checks = self.make_burst()
+
+        with patch.object(scam_handler.link_reputation, "learn", AsyncMock()) as learn:
+            _, post_analysis, _ = self.analyze_burst(checks, 0.1, source="fallback")
+            _, _, scam_index = self.analyze_burst(checks, 0.95, source="fallback")
+
+        # The ban happens, but neither the sender nor the links are marked as scam
+        checks[0].context.bot.ban_chat_member.assert_awaited()
+        learn.assert_not_awaited()
+        self.registry_add.assert_not_awaited()
+        self.assertEqual(post_analysis.await_count, 3)
+        scam_index.add.assert_not_called()
+
+    def test_unscored_image_is_queued(self):
+        check = make_check(photo_id="flyer")
+        enqueue = AsyncMock(return_value=True)
+
+        with patch.object(scam_handler, "enqueue_analysis", enqueue), patch.object(
+            scam_handler, "_is_russian", AsyncMock(return_value=False)
+        ):
+            self.assertTrue(self.analyze(check, None, source="fallback"))
+
+        enqueue.assert_awaited_once()
+        self.assertIsNone(self.image_index.get("flyer"))
+
+    def test_local_ban_is_not_a_template(self):
+        check = make_check("Win 300 USDT now, write to @giveaway_bot")
+        classifier = MagicMock(loaded=True, predict=MagicMock(return_value=0.99))
+
+        with patch.object(scam_handler, "local_classifier", classifier), patch.object(
+            scam_handler.scam_index, "add"
+        ) as add:
+            self.assertTrue(self.run_async(scam_handler._local_model(check)))
+
+        add.assert_not_called()
+        self.assertEqual(self.ban.await_args.kwargs["verdict_source"], "local")
+        self.assertFalse(self.ban.await_args.kwargs["learn"])
+
+    def handle_deferred(self, update, context, download):
+        analyze_content = AsyncMock(return_value=(0.95, "gemini"))
+
+        async def run():
+            with patch.object(scam_handler, "SPECULATIVE_PREFETCH", True), patch.object(
+                scam_handler, "BURST_COALESCING", True
+            ), patch.object(scam_handler, "_get_image_data", download), patch.object(
+                scam_handler.scammer_registry, "is_scammer", AsyncMock(return_value=False)
+            ), patch.object(
+                scam_handler, "is_trusted_member", AsyncMock(return_value=False)
+            ), patch.object(
+                scam_handler, "_is_russian", AsyncMock(return_value=False)
+            ), patch.object(
+                scam_handler.gemini_service, "analyze_content", analyze_content
+            ), patch.object(
+                scam_handler.bursts, "window_seconds", 0.05
+            ), patch.object(
+                scam_handler.media_groups, "window_seconds", 0.05
+            ):
+                await scam_handler.handle_scam(update, context)
+                await asyncio.sleep(0.3)
+
+        self.run_async(run())
+        return analyze_content
+
+    def test_captioned_photo_is_analyzed_after_coalescing(self):
+        # Prefetch and burst coalescing on: the photo is still downloading
+        # when the message is deferred and handle_scam returns
+        async def download(update):
+            await asyncio.sleep(0.1)
+            return b"image"
+
+        for media_group_id in (None, "album"):
+            with self.subTest(media_group_id=media_group_id):
+                self.ban.reset_mock()
+                update, context = make_update(photo_id="flyer", caption="Look at this")
+                update.message.media_group_id = media_group_id
+                analyze_content = self.handle_deferred(update, context, download)
+
+                self.assertEqual(
+                    analyze_content.await_args.args[:2], ("Look at this", b"image")
+                )
+                self.ban.assert_awaited_once()
+
+    def test_failed_ban_is_not_registered(self):
+        bot = MagicMock()
+        bot.delete_messages = AsyncMock()
+        bot.ban_chat_member = AsyncMock(side_effect=Exception("Not enough rights"))
+
+        async def run():
+            with patch.object(scam_handler.scammer_registry, "add", AsyncMock()) as add, patch.object(
+                scam_handler.link_reputation, "learn", AsyncMock()
+            ) as learn:
+                await scam_handler._ban_and_delete_messages(
+                    bot, 100, 1, [1], "Scam", link_keys={"domain:scam.com"}
+                )
+            return add, learn
+
+        add, learn = self.run_async(run())
+
+        add.assert_not_awaited()
+        learn.assert_not_awaited()
+
+    def test_known_scammer_trusted_here_is_not_banned(self):
+        index = TrustIndex()
+        index.set_safe(1, 100)
+        index.mark_active(2, 100)
+
+        async def run():
+            results = []
+            with patch.object(scam_handler, "trust_index", index), patch.object(
+                scam_handler.scammer_registry, "is_scammer", AsyncMock(return_value=True)
+            ):
+                for user_id in (1, 2, 3):
+                    check = make_check("hi", user_id=user_id)
+                    results.append(await scam_handler._known_scammer(check))
+            return results
+
+        self.assertEqual(self.run_async(run()), [False, False, True])
+        self.ban.assert_awaited_once()
+
+    def test_async_verdicts_queue_photos_without_downloading(self):
+        check = make_check(photo_id="flyer")
+        check.message.photo[0].file_id = "F"
+        enqueue = AsyncMock(return_value=True)
+
+        async def run():
+            with patch.object(scam_handler, "ASYNC_VERDICTS", True), patch.object(
+                scam_handler, "enqueue_analysis", enqueue
+            ), patch.object(scam_handler, "_is_russian", AsyncMock(return_value=False)):
+                self.assertFalse(await scam_handler._media(check))
+                self.assertTrue(await scam_handler._enqueue(check))
+
+        self.run_async(run())
+
+        scam_handler._get_image_data.assert_not_awaited()
+        self.assertEqual(enqueue.await_args.args[5], [{"file_id": "F", "image_id": "flyer"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import asyncio
+from unittest.mock import MagicMock
+from bot.handlers.scam_pipeline import MessageCheck, run_pipeline
+
+
+class TestScamPipeline(unittest.TestCase):
+    def test_short_circuit_and_lazy_inputs(self):
+        loads = []
+
+        async def load_cheap(check):
+            loads.append("cheap")
+            return 1
+
+        async def load_expensive(check):
+            loads.append("expensive")
+            return b"image"
+
+        async def _first(check):
+            return await check.get("cheap") == 1
+
+        async def _second(check):
+            await check.get("expensive")
+            return True
+
+        update = MagicMock()
+        check = MessageCheck(
+            update, MagicMock(), {"cheap": load_cheap, "expensive": load_expensive}
+        )
+
+        loop = asyncio.new_event_loop()
+        finished_at = loop.run_until_complete(run_pipeline(check, [_first, _second]))
+        loop.close()
+
+        self.assertEqual(finished_at, "first")
+        self.assertEqual(loads, ["cheap"])
+        self.assertIn("first", check.timings)
+        self.assertNotIn("second", check.timings)
+
+    def test_prefetch_and_cancel(self):
+        started = []
+
+        async def load_slow(check):
+            started.append("slow")
+            await asyncio.sleep(10)
+
+        async def load_fast(check):
+            started.append("fast")
+            return True
+
+        async def _decide(check):
+            return await check.get("fast")
+
+        check = MessageCheck(
+            MagicMock(), MagicMock(), {"slow": load_slow, "fast": load_fast}
+        )
+
+        async def run():
+            check.prefetch(["slow", "fast"])
+            finished_at = await run_pipeline(check, [_decide])
+            check.cancel_pending()
+            await asyncio.sleep(0)
+            return finished_at
+
+        loop = asyncio.new_event_loop()
+        finished_at = loop.run_until_complete(run())
+        loop.close()
+
+        self.assertEqual(finished_at, "decide")
+        self.assertEqual(sorted(started), ["fast", "slow"])
+        self.assertTrue(check.load("slow").cancelled())
+
+
+if __name__ == "__main__":
+    unittest.main()
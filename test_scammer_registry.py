@@ -0,0 +1,63 @@
+import unittest
+import asyncio
+from unittest.mock import AsyncMock, patch
+from bot.services.scammer_registry import BloomFilter, ScammerRegistry
+
+
+class TestScammerRegistry(unittest.TestCase):
+    def run_async(self, coro):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(capacity=10000, error_rate=0.01)
+        added = range(1_000_000_000, 1_000_000_000 + 10000 * 7, 7)
+        for user_id in added:
+            bloom.add(user_id)
+
+        self.assertTrue(all(user_id in bloom for user_id in added))
+        false_positives = sum(user_id in bloom for user_id in range(1, 20001))
+        self.assertLess(false_positives / 20000, 0.03)
+        self.assertLess(len(bloom.bits), 13000)
+
+    def test_bloom_hits_are_confirmed(self):
+        registry = ScammerRegistry(capacity=1000, error_rate=0.01)
+        db_is_scammer = AsyncMock(return_value=True)
+
+        async def run():
+            with patch("bot.services.scammer_registry.add_scammer", AsyncMock()), patch(
+                "bot.services.scammer_registry.remove_scammer", AsyncMock()
+            ), patch("bot.services.scammer_registry.is_scammer", db_is_scammer):
+                await registry.add(42, 1, "Scam detected")
+                self.assertFalse(await registry.is_scammer(7))
+                # Unknown users never reach the DB
+                self.assertEqual(db_is_scammer.await_count, 0)
+                self.assertTrue(await registry.is_scammer(42))
+
+                # Removed (/unban_user): the bit stays, the DB says no
+                await registry.remove(42)
+                db_is_scammer.return_value = False
+                self.assertFalse(await registry.is_scammer(42))
+
+        self.run_async(run())
+
+    def test_warm_up(self):
+        registry = ScammerRegistry(capacity=10, error_rate=0.01)
+
+        async def run():
+            with patch(
+                "bot.services.scammer_registry.get_scammer_ids",
+                AsyncMock(return_value=list(range(100))),
+            ):
+                await registry.warm_up()
+
+        self.run_async(run())
+        self.assertEqual(registry.bloom.count, 100)
+        self.assertTrue(all(user_id in registry.bloom for user_id in range(100)))
+
+
+if __name__ == "__main__":
+    unittest.main()
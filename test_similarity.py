@@ -0,0 +1,38 @@
+import random
+import unittest
+from bot.services.similarity_index import HammingIndex, ScamTemplateIndex, simhash
+
+SCAM = "Congratulations! You won 500 USDT in our crypto giveaway. Write to @claim_bot to get your prize now!"
+VARIANT = "🎉 Congratulations!! You won 1000 USDT in our crypto giveaway. Write to @claim_bot to get your prize now"
+UNRELATED = "Hi everyone, does anyone know a good dentist near the central station? Thanks in advance"
+
+
+class TestSimilarityIndex(unittest.TestCase):
+    def test_short_text_not_fingerprinted(self):
+        self.assertIsNone(simhash("hi there"))
+
+    def test_near_duplicate_matches(self):
+        index = ScamTemplateIndex(max_distance=3, max_size=100)
+        index.add(SCAM, 0.95)
+        self.assertEqual(index.match(VARIANT), 0.95)
+        self.assertIsNone(index.match(UNRELATED))
+
+    def test_hamming_index_distance(self):
+        index = HammingIndex(max_distance=3, max_size=100)
+        fingerprint = random.getrandbits(64)
+        index.add(fingerprint, 0.8)
+        self.assertEqual(index.nearest(fingerprint ^ 0b111), (3, 0.8))
+        self.assertIsNone(index.nearest(fingerprint ^ 0b1111))
+
+    def test_size_bound(self):
+        index = HammingIndex(max_distance=3, max_size=2)
+        first = random.getrandbits(64)
+        index.add(first, 0.9)
+        index.add(random.getrandbits(64), 0.9)
+        index.add(random.getrandbits(64), 0.9)
+        self.assertEqual(len(index), 2)
+        self.assertIsNone(index.nearest(first))
+
+
+if __name__ == "__main__":
+    unittest.main()
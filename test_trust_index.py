@@ -0,0 +1,44 @@
+import unittest
+from db.trust_index import SortedIdSet, TrustIndex
+
+
+class TestTrustIndex(unittest.TestCase):
+    def test_sorted_id_set(self):
+        ids = SortedIdSet([5, 3, 9, 3])
+        self.assertEqual(list(ids.ids), [3, 5, 9])
+
+        ids.add(7)
+        ids.add(7)
+        ids.add(-100123)
+        ids.discard(5)
+        ids.discard(42)
+
+        self.assertEqual(list(ids.ids), [-100123, 3, 7, 9])
+        self.assertIn(7, ids)
+        self.assertNotIn(5, ids)
+        self.assertEqual(ids.ids.itemsize, 8)
+
+    def test_load_and_updates(self):
+        index = TrustIndex()
+        index.load([(1, 100, False, 2), (2, 100, True, 0), (3, 200, True, 5), (4, 100, False, 1)])
+
+        self.assertTrue(index.loaded)
+        self.assertTrue(index.is_active(1, 100))
+        self.assertFalse(index.is_active(1, 200))
+        self.assertTrue(index.is_safe(2, 100))
+        self.assertFalse(index.is_active(2, 100))
+        self.assertTrue(index.is_active(3, 200) and index.is_safe(3, 200))
+        self.assertFalse(index.is_active(4, 100))
+
+        index.mark_active(4, 100)
+        index.set_safe(1, 300)
+        index.set_safe(2, 100, False)
+
+        self.assertTrue(index.is_active(4, 100))
+        self.assertTrue(index.is_safe(1, 300))
+        self.assertFalse(index.is_safe(2, 100))
+        self.assertEqual(len(index), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
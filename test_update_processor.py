@@ -0,0 +1,100 @@
+import unittest
+import asyncio
+from types import SimpleNamespace
+from bot.update_processor import ChatOrderedUpdateProcessor
+
+
+def make_update(chat_id):
+    return SimpleNamespace(effective_chat=SimpleNamespace(id=chat_id))
+
+
+class TestChatOrderedUpdateProcessor(unittest.TestCase):
+    def test_order_within_chat(self):
+        processor = ChatOrderedUpdateProcessor(8, 100, 100)
+        events = []
+
+        async def work(name, delay):
+            await asyncio.sleep(delay)
+            events.append(name)
+
+        async def run():
+            await asyncio.gather(
+                processor.process_update(make_update(1), work("a1", 0.03)),
+                processor.process_update(make_update(1), work("a2", 0.0)),
+                processor.process_update(make_update(1), work("a3", 0.01)),
+            )
+
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(run())
+        loop.close()
+
+        self.assertEqual(events, ["a1", "a2", "a3"])
+
+    def test_chats_run_concurrently(self):
+        processor = ChatOrderedUpdateProcessor(8, 100, 100)
+        events = []
+
+        async def work(name, delay):
+            await asyncio.sleep(delay)
+            events.append(name)
+
+        async def run():
+            await asyncio.gather(
+                processor.process_update(make_update(1), work("slow", 0.05)),
+                processor.process_update(make_update(2), work("fast", 0.0)),
+            )
+
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(run())
+        loop.close()
+
+        self.assertEqual(events, ["fast", "slow"])
+
+    def test_queue_depth_limit(self):
+        processor = ChatOrderedUpdateProcessor(8, 2, 100)
+        events = []
+
+        async def work(name):
+            await asyncio.sleep(0.01)
+            events.append(name)
+
+        async def run():
+            await asyncio.gather(
+                *[
+                    processor.process_update(make_update(1), work(i))
+                    for i in range(4)
+                ]
+            )
+
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(run())
+        loop.close()
+
+        self.assertEqual(events, [0, 1])
+
+    def test_global_concurrency_limit(self):
+        processor = ChatOrderedUpdateProcessor(2, 100, 100)
+        running = 0
+        peak = 0
+
+        async def work():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        async def run():
+            await asyncio.gather(
+                *[processor.process_update(make_update(i), work()) for i in range(6)]
+            )
+
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(run())
+        loop.close()
+
+        self.assertEqual(peak, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
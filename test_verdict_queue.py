@@ -0,0 +1,87 @@
+import unittest
+import asyncio
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+from db.core import init_db, enqueue_analysis
+from db.models import db, PendingAnalysis
+from db import async_core
+from bot.handlers import verdict_queue
+from bot.services.image_index import ImageVerdictIndex
+from test_image_index import make_image
+
+
+class TestVerdictQueue(unittest.TestCase):
+    def setUp(self):
+        self.test_db = "test_verdict_queue.db"
+        db.init(self.test_db)
+        init_db()
+        self.bot = MagicMock()
+        self.bot.delete_messages = AsyncMock()
+        self.bot.ban_chat_member = AsyncMock()
+
+    def tearDown(self):
+        db.close()
+        if os.path.exists(self.test_db):
+            os.remove(self.test_db)
+
+    def process(self, score):
+        async def run():
+            with patch.object(
+                verdict_queue.gemini_service,
+                "analyze_content",
+                AsyncMock(return_value=(score, "gemini")),
+            ):
+                await verdict_queue.process_due(self.bot)
+            await async_core.run_db(db.close)
+
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(run())
+        loop.close()
+
+    def test_scam_is_retracted(self):
+        messages = [{"id": 7, "russian": False}, {"id": 8, "russian": False}]
+        enqueue_analysis(100, 1, "spammer", messages, "Win free USDT", [])
+
+        self.process(0.95)
+
+        self.bot.delete_messages.assert_awaited_once_with(chat_id=100, message_ids=[7, 8])
+        self.bot.ban_chat_member.assert_awaited_once_with(chat_id=100, user_id=1)
+        self.assertEqual(PendingAnalysis.select().count(), 0)
+
+    def test_failure_is_retried_later(self):
+        enqueue_analysis(100, 2, "user", [{"id": 9, "russian": False}], "hello", [])
+
+        self.process(None)
+
+        analysis = PendingAnalysis.get()
+        self.assertEqual(analysis.attempts, 1)
+        self.assertGreater(analysis.next_attempt_at, analysis.created_at)
+        self.bot.ban_chat_member.assert_not_awaited()
+
+        # Not due yet
+        self.process(0.95)
+        self.assertEqual(PendingAnalysis.get().attempts, 1)
+
+    def test_worker_downloads_and_matches_images(self):
+        image = make_image()
+        index = ImageVerdictIndex(max_size=10, max_distance=6)
+        index.record("seen", verdict_queue.dhash(image), 0.95)
+        photo_file = MagicMock()
+        photo_file.download_as_bytearray = AsyncMock(return_value=bytearray(image))
+        self.bot.get_file = AsyncMock(return_value=photo_file)
+        enqueue_analysis(
+            100, 3, "spammer", [{"id": 10, "russian": False}], None,
+            [{"file_id": "F", "image_id": "repost"}],
+        )
+
+        with patch.object(verdict_queue, "image_index", index):
+            self.process(0.1)
+
+        self.bot.get_file.assert_awaited_once_with("F")
+        # Copy of a known scam image: banned without asking Gemini (which says 0.1)
+        self.bot.delete_messages.assert_awaited_once_with(chat_id=100, message_ids=[10])
+        self.assertEqual(index.get("repost"), 0.95)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+import asyncio
+import io
+from PIL import Image
+from bot.services.worker_pool import WorkerPool, detect_russian
+from bot.services.content_preprocessor import prepare_image
+
+
+class TestWorkerPool(unittest.TestCase):
+    def test_run_tasks(self):
+        pool = WorkerPool(kind="thread", size=2, max_pending=1)
+
+        buffer = io.BytesIO()
+        Image.new("RGBA", (32, 32), "red").save(buffer, "PNG")
+
+        async def run():
+            return await asyncio.gather(
+                pool.run(detect_russian, "Это русский текст."),
+                pool.run(detect_russian, "Hello, how are you?"),
+                pool.run(prepare_image, buffer.getvalue()),
+            )
+
+        loop = asyncio.new_event_loop()
+        is_ru, is_en, (image_bytes, mime_type) = loop.run_until_complete(run())
+        loop.close()
+        pool.shutdown()
+
+        self.assertTrue(is_ru)
+        self.assertFalse(is_en)
+        self.assertEqual(mime_type, "image/jpeg")
+        self.assertEqual(Image.open(io.BytesIO(image_bytes)).format, "JPEG")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+Offline training and evaluation of the local scam classifier.
+
+    python train_classifier.py train [--epochs 8] [--output scam_classifier.json]
+    python train_classifier.py evaluate [--model scam_classifier.json]
+
+Samples come from the Verdict table (Gemini verdicts, bans, admin
+/ban_user and /unban_user labels). Every fifth sample (by text hash) is held
+out for evaluation, so train and evaluate report on the same split.
+The bot loads the model from LOCAL_CLASSIFIER_PATH at startup.
+"""
+import argparse
+import logging
+import sys
+import zlib
+from config import (
+    LOCAL_CLASSIFIER_PATH,
+    LOCAL_CLASSIFIER_SCAM_CONFIDENCE,
+    LOCAL_CLASSIFIER_SAFE_CONFIDENCE,
+)
+from db.core import init_db, get_verdicts
+from db.models import db
+from bot.services.local_classifier import LocalClassifier, build_dataset
+
+logger = logging.getLogger(__name__)
+
+HOLDOUT_BUCKETS = 5
+
+
+def split(samples: list[tuple[str, int]]):
+    train, test = [], []
+    for text, label in samples:
+        if zlib.crc32(text.encode()) % HOLDOUT_BUCKETS == 0:
+            test.append((text, label))
+        else:
+            train.append((text, label))
+    return train, test
+
+
+def evaluate(model: LocalClassifier, samples: list[tuple[str, int]]) -> dict:
+    """
+    Accuracy/precision/recall at 0.5, plus how many messages the confidence
+    thresholds would decide locally (skipping Gemini) and how many of those are wrong.
+    """
+    tp = fp = tn = fn = 0
+    local_decisions = local_errors = 0
+    for text, label in samples:
+        score = model.predict(text)
+        predicted = int(score >= 0.5)
+        tp += predicted and label
+        fp += predicted and not label
+        tn += not predicted and not label
+        fn += not predicted and label
+        if score >= LOCAL_CLASSIFIER_SCAM_CONFIDENCE:
+            local_decisions += 1
+            local_errors += not label
+        elif score <= LOCAL_CLASSIFIER_SAFE_CONFIDENCE:
+            local_decisions += 1
+            local_errors += label
+    total = len(samples) or 1
+    return {
+        "samples": len(samples),
+        "accuracy": (tp + tn) / total,
+        "precision": tp / (tp + fp) if tp + fp else 0.0,
+        "recall": tp / (tp + fn) if tp + fn else 0.0,
+        "decided_locally": local_decisions / total,
+        "local_error_rate": local_errors / local_decisions if local_decisions else 0.0,
+    }
+
+
+def print_report(title: str, report: dict):
+    print(f"{title}:")
+    for key, value in report.items():
+        print(f"  {key}: {value:.3f}" if isinstance(value, float) else f"  {key}: {value}")
+
+
+def load_samples(include_local: bool) -> list[tuple[str, int]]:
+    init_db()
+    db.connect(reuse_if_open=True)
+    try:
+        return build_dataset(get_verdicts(), include_local=include_local)
+    finally:
+        db.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = commands.add_parser("train", help="train and save a model")
+    train_parser.add_argument("--output", default=LOCAL_CLASSIFIER_PATH)
+    train_parser.add_argument("--epochs", type=int, default=8)
+    train_parser.add_argument(
+        "--include-local",
+        action="store_true",
+        help="also learn from bans made by the local classifier itself",
+    )
+
+    evaluate_parser = commands.add_parser("evaluate", help="evaluate a saved model")
+    evaluate_parser.add_argument("--model", default=LOCAL_CLASSIFIER_PATH)
+
+    args = parser.parse_args(argv)
+    samples = load_samples(getattr(args, "include_local", False))
+    train, test = split(samples)
+    positives = sum(label for _, label in samples)
+    print(f"{len(samples)} samples ({positives} scam), {len(train)} train / {len(test)} held out")
+
+    if args.command == "train":
+        if not train:
+            print("No training data yet.")
+            return 1
+        model = LocalClassifier().train(train, epochs=args.epochs)
+        print_report("Held-out evaluation", evaluate(model, test))
+        model.save(args.output)
+        print(f"Saved model to {args.output}")
+        return 0
+
+    model = LocalClassifier()
+    if not model.load(args.model):
+        print(f"No model at {args.model}.")
+        return 1
+    print_report("Held-out evaluation", evaluate(model, test))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())